@@ -0,0 +1,50 @@
+# Benchmark: quest import through save_quest() one by one vs bulk save_quests(),
+# plus streaming export to JSON Lines / CSV.
+# Run from the project root: python benchmarks/bench_bulk.py [count]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import bulk, database  # noqa: E402
+from core.template_engine import TemplateEngine  # noqa: E402
+
+SINGLE = 2000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as tmp:
+        single_path = os.path.join(tmp, "single.db")
+        start = time.perf_counter()
+        for i in range(SINGLE):
+            database.save_quest(None, TemplateEngine.generate_dummy_quest(i), path=single_path)
+        single = SINGLE / (time.perf_counter() - start)
+
+        bulk_path = os.path.join(tmp, "bulk.db")
+        quests = (TemplateEngine.generate_dummy_quest(i) for i in range(count))
+        start = time.perf_counter()
+        report = bulk.save_quests(quests, path=bulk_path)
+        batched = report.processed / (time.perf_counter() - start)
+
+        quests = (TemplateEngine.generate_dummy_quest(i) for i in range(count))
+        start = time.perf_counter()
+        bulk.save_quests(quests, path=bulk_path, record_versions=False)
+        upserts = count / (time.perf_counter() - start)
+
+        timings = {}
+        for fmt in bulk.FORMATS:
+            start = time.perf_counter()
+            bulk.export_quests(os.path.join(tmp, f"quests.{fmt}"), path=bulk_path)
+            timings[fmt] = count / (time.perf_counter() - start)
+        database.close_pools()
+    print(f"save_quest, one transaction each:   {single:8.0f} quests/s")
+    print(f"save_quests, batched (+versions):   {batched:8.0f} quests/s  (x{batched / single:.1f})")
+    print(f"save_quests, upsert, no versions:   {upserts:8.0f} quests/s")
+    for fmt, rate in timings.items():
+        print(f"export_quests {fmt:5}:                {rate:8.0f} quests/s")
+
+
+if __name__ == "__main__":
+    main()
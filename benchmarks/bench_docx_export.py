@@ -0,0 +1,47 @@
+# Benchmark: DOCX exports per second, old raw-HTML paragraph dump vs the
+# structured exporter (single files and one multi-section bundle).
+# Run from the project root: python benchmarks/bench_docx_export.py
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import docx_export  # noqa: E402
+from core.batch_export import dummy_quests, export_docx_bundle  # noqa: E402
+from core.template_engine import TemplateEngine  # noqa: E402
+
+N = 100
+
+
+def _legacy(html, path):
+    from docx import Document
+    doc = Document()
+    doc.add_paragraph(html)
+    doc.save(path)
+
+
+def _rate(fn):
+    start = time.perf_counter()
+    fn()
+    return N / (time.perf_counter() - start)
+
+
+def main():
+    te = TemplateEngine.shared()
+    te.prewarm()
+    htmls = [te.qr_img_tag(q["id"], "png") + te.render("ancient_scroll.html", q) for q in dummy_quests(range(1, N + 1))]
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(write):
+            return lambda: [write(html, os.path.join(tmp, f"q{i}.docx")) for i, html in enumerate(htmls)]
+
+        legacy = _rate(run(_legacy))
+        structured = _rate(run(docx_export.write_docx))
+        bundle = _rate(lambda: export_docx_bundle(dummy_quests(range(1, N + 1)), os.path.join(tmp, "all.docx")))
+    print(f"legacy raw-HTML paragraph : {legacy:7.1f} quests/s")
+    print(f"structured, one file each : {structured:7.1f} quests/s")
+    print(f"structured, one bundle    : {bundle:7.1f} quests/s")
+
+
+if __name__ == "__main__":
+    main()
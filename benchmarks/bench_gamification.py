@@ -0,0 +1,58 @@
+# Benchmark: cost of persisting one XP event as the history grows, for the
+# legacy full-file rewrite and for the journal (one append per flush).
+# Run from the project root: python benchmarks/bench_gamification.py
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.gamification import Gamification  # noqa: E402
+
+HISTORY = (1_000, 10_000, 100_000)
+EVENTS = 200
+
+
+def legacy_save(g, path):
+    # the previous Gamification.save(): rewrite everything on every event
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"xp": g.xp, "achievements": g.achievements}, ensure_ascii=False))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()) as quiet:
+        results = []
+        for size in HISTORY:
+            path = os.path.join(tmp, f"g{size}.json")
+            g = Gamification()
+            for i in range(size):
+                g.add_xp(1, "SAVE_QUEST")
+            g.snapshot(path, fsync=False)
+            quiet.truncate(0)
+            timings = {}
+            start = time.perf_counter()
+            for _ in range(EVENTS):
+                g.add_xp(1, "SAVE_QUEST")
+                legacy_save(g, path + ".legacy")
+            timings["legacy rewrite"] = time.perf_counter() - start
+            for name, fsync in (("journal", False), ("journal+fsync", True)):
+                start = time.perf_counter()
+                for _ in range(EVENTS):
+                    g.add_xp(1, "SAVE_QUEST")
+                    g.flush(path, fsync=fsync)
+                timings[name] = time.perf_counter() - start
+            start = time.perf_counter()
+            Gamification.load(path)
+            timings["load (once)"] = (time.perf_counter() - start) * EVENTS
+            results.append((size, timings))
+    for size, timings in results:
+        print(f"history {size:>7}: " + ", ".join(f"{name} {t / EVENTS * 1e6:9.1f} us" for name, t in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
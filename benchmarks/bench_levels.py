@@ -0,0 +1,43 @@
+# Micro-benchmark: level lookup by re-sorting the level dict on every call
+# (the previous get_level) vs bisect over a precomputed LevelCurve.
+# Run from the project root: python benchmarks/bench_levels.py
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.gamification import Gamification  # noqa: E402
+from core.levels import LevelCurve  # noqa: E402
+
+PLAYERS = 10_000
+
+
+def legacy_level(levels, xp):
+    for name, threshold in sorted(levels.items(), key=lambda kv: kv[1], reverse=True):
+        if xp >= threshold:
+            return name
+    return None
+
+
+def main():
+    rng = random.Random(1)
+    for label, curve in (("3 levels", LevelCurve.from_mapping(Gamification.LEVELS)),
+                         ("5000 levels", LevelCurve.formula(5000))):
+        levels = dict(zip(curve.names, curve.thresholds))
+        top = curve.thresholds[-1]
+        xps = [rng.randint(0, top + 100) for _ in range(PLAYERS)]
+        assert [legacy_level(levels, xp) for xp in xps[:200]] == [curve.name(xp) for xp in xps[:200]]
+        runs = 3 if len(curve) > 100 else 100
+        legacy = min(timeit.repeat(lambda: [legacy_level(levels, xp) for xp in xps], number=1, repeat=runs))
+        bisect = min(timeit.repeat(lambda: [curve.name(xp) for xp in xps], number=1, repeat=runs))
+        batch = min(timeit.repeat(lambda: curve.indexes(xps), number=1, repeat=runs))
+        info = min(timeit.repeat(lambda: [curve.info(xp) for xp in xps], number=1, repeat=runs))
+        print(f"{label:12} per lookup: sorted {legacy / PLAYERS * 1e6:9.2f} us, bisect {bisect / PLAYERS * 1e6:5.2f} us, "
+              f"indexes() {batch / PLAYERS * 1e6:5.2f} us, info() {info / PLAYERS * 1e6:5.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Benchmark: export a 16000x12000 map the old way (QGraphicsScene.render on
+# the GUI thread) and through MapExportQueue (snapshot painted by a worker),
+# measuring how long the GUI event loop is blocked.
+# Run from the project root: python benchmarks/bench_map_export.py
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "gui")]
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtGui import QColor, QImage, QPainter  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from core.map_format import MapScene, Marker, Stroke  # noqa: E402
+from map_export import ExportOptions, MapExportQueue  # noqa: E402
+from map_editor import MapEditor  # noqa: E402
+
+WORLD = (16000, 12000)
+STROKES = 300
+MARKERS = 2000
+
+
+def _snapshot():
+    rng = random.Random(1)
+    scene = MapScene((0, 0, *WORLD))
+    for _ in range(STROKES):
+        x, y = rng.uniform(0, WORLD[0]), rng.uniform(0, WORLD[1])
+        points = []
+        for _ in range(200):
+            x, y = x + rng.uniform(-20, 20), y + rng.uniform(-20, 20)
+            points += (x, y)
+        scene.strokes.append(Stroke(points))
+    for _ in range(MARKERS):
+        scene.markers.append(Marker(rng.uniform(0, WORLD[0]), rng.uniform(0, WORLD[1]), QColor("red").rgba()))
+    return scene
+
+
+def legacy(editor, path):
+    # the previous save_map: one full-size QImage rendered on the GUI thread
+    image = QImage(editor.scene.sceneRect().size().toSize(), QImage.Format.Format_ARGB32)
+    painter = QPainter(image)
+    editor.scene.render(painter)
+    painter.end()
+    image.save(path)
+
+
+def main():
+    app = QApplication.instance() or QApplication([])
+    snapshot = _snapshot()
+    editor = MapEditor()
+    editor.apply_map(snapshot)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        legacy(editor, os.path.join(tmp, "legacy.png"))
+        elapsed = time.perf_counter() - start
+        print(f"GUI thread render+save   {elapsed:6.2f} s, GUI blocked {elapsed * 1000:8.0f} ms")
+
+        for fmt in ("png", "jpg", "webp"):
+            queue = MapExportQueue()
+            done = []
+            queue.job_finished.connect(lambda *args: done.append(args))
+            start = time.perf_counter()
+            queue.submit(editor.scene_snapshot(), os.path.join(tmp, f"map.{fmt}"), ExportOptions(fmt, quality=90))
+            worst, last = 0.0, time.perf_counter()
+            while not done:
+                app.processEvents()
+                time.sleep(0.001)
+                now = time.perf_counter()
+                worst, last = max(worst, now - last), now
+            queue.shutdown(wait=True)
+            print(f"background {fmt:4}          {time.perf_counter() - start:6.2f} s, "
+                  f"GUI blocked {worst * 1000:8.0f} ms, {done[0][1]}")
+
+
+if __name__ == "__main__":
+    main()
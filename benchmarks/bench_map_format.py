@@ -0,0 +1,85 @@
+# Benchmark: saving/reopening a map as .qmap vectors vs an 800x600 PNG.
+# Run from the project root: python benchmarks/bench_map_format.py
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import map_format  # noqa: E402
+from core.map_format import Label, MapScene, Marker, Stroke  # noqa: E402
+
+# (strokes, points per stroke): a typical hand-drawn map and a very dense one
+SCENES = ((40, 250), (200, 500))
+
+
+def _scene(strokes_count, points_count):
+    rng = random.Random(3)
+    strokes = []
+    for _ in range(strokes_count):
+        x, y, points = rng.uniform(0, 800), rng.uniform(0, 600), []
+        for _ in range(points_count):
+            x, y = x + rng.randint(-3, 3), y + rng.randint(-3, 3)
+            points += (x, y)
+        strokes.append(Stroke(points, 0xFFA52A2A, 3.0))
+    markers = [Marker(rng.uniform(0, 800), rng.uniform(0, 600), 0xFFFF0000) for _ in range(300)]
+    labels = [Label(rng.uniform(0, 800), rng.uniform(0, 600), f"Локация {i}") for i in range(50)]
+    return MapScene(strokes=strokes, markers=markers, labels=labels)
+
+
+def _time(action, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = action()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        QApplication = None
+    for counts in SCENES:
+        _compare(_scene(*counts), QApplication)
+
+
+def _compare(scene, qapplication):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"\n{scene.point_count} stroke points, {len(scene.markers)} markers, {len(scene.labels)} labels")
+        for compress in (False, True):
+            path = os.path.join(tmp, "map.qmap")
+            save_ms, size = _time(lambda: map_format.write_map(scene, path, compress))
+            load_ms, _ = _time(lambda: map_format.read_map(path))
+            name = ".qmap deflated:" if compress else ".qmap in place:"
+            print(f"{name:16} save {save_ms:6.1f} ms, load {load_ms:6.1f} ms, {size / 1024:7.1f} KiB")
+        if qapplication is None:
+            print("PyQt6 не установлен: сравнение с PNG пропущено")
+            return
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui"))
+        app = qapplication.instance() or qapplication([])  # noqa: F841
+        from PyQt6.QtGui import QImage, QPainter
+        from map_editor import MapEditor
+
+        editor = MapEditor()
+        apply_ms, _ = _time(lambda: editor.apply_map(map_format.read_map(path)), repeat=1)
+        png = os.path.join(tmp, "map.png")
+
+        def save_png():
+            image = QImage(800, 600, QImage.Format.Format_ARGB32)
+            painter = QPainter(image)
+            editor.scene.render(painter)
+            painter.end()
+            image.save(png)
+
+        png_ms, _ = _time(save_png, repeat=1)
+        png_load_ms, _ = _time(lambda: QImage(png), repeat=1)
+        print(f"{'PNG 800x600:':16} save {png_ms:6.1f} ms, load {png_load_ms:6.1f} ms, "
+              f"{os.path.getsize(png) / 1024:7.1f} KiB"
+              " (pixels only: strokes and labels are lost)")
+        print(f"reopen .qmap into the editor scene: {apply_ms:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
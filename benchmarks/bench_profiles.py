@@ -0,0 +1,69 @@
+# Benchmark: profile store with 100k users and 2M achievement events.
+# Measures profile load, a batched save, leaderboard pages and rank lookups.
+# Run from the project root: python benchmarks/bench_profiles.py
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import database  # noqa: E402
+from core.profiles import ProfileStore  # noqa: E402
+
+USERS = 100_000
+EVENTS = 2_000_000
+REPEAT = 200
+
+
+def _fill(path):
+    rng = random.Random(1)
+    with database.connection(path) as conn:
+        conn.executemany("INSERT INTO profiles (name) VALUES (?)", ((f"user{i}",) for i in range(USERS)))
+        conn.executemany(
+            "INSERT INTO achievements (profile_id, amount, reason, created_at) VALUES (?, ?, 'SAVE_QUEST', '2026-01-01')",
+            ((rng.randint(1, USERS), rng.randint(1, 10)) for _ in range(EVENTS)))
+        conn.execute("UPDATE profiles SET xp = (SELECT COALESCE(SUM(amount), 0) FROM achievements "
+                     "WHERE profile_id = profiles.id)")
+        conn.execute("ANALYZE")
+
+
+def _timed(label, action, repeat=REPEAT):
+    start = time.perf_counter()
+    for i in range(repeat):
+        action(i)
+    print(f"{label:32} {(time.perf_counter() - start) / repeat * 1000:8.3f} ms")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "quests.db")
+        start = time.perf_counter()
+        _fill(path)
+        print(f"filled {USERS} users / {EVENTS} events in {time.perf_counter() - start:.1f} s")
+        rng = random.Random(2)
+        _timed("load profile (uncached)", lambda i: ProfileStore(path).profile(f"user{rng.randrange(USERS)}"))
+        store = ProfileStore(path)
+
+        def save(i):
+            g = store.profile(f"user{i % 50}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(10):
+                    g.add_xp(5, "SAVE_MAP")
+            store.save(g)
+
+        _timed("save batch of 10 events", save)
+        _timed("leaderboard top 10 (after write)", lambda i: (store.profile("user0").pending.append(
+            {"seq": 0, "ts": "", "amount": 1, "reason": ""}), store.save(store.profile("user0")), store.leaderboard()))
+        _timed("leaderboard top 10 (cached)", lambda i: store.leaderboard())
+        _timed("leaderboard page 500", lambda i: store.leaderboard(50, offset=25_000 + i))
+        _timed("rank of a user", lambda i: store.rank(f"user{rng.randrange(USERS)}"))
+        database.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Benchmark: single-quest exports per second (render + QR + write HTML)
+# with a fresh QR per export vs the content-addressed QR cache.
+# Run from the project root: python benchmarks/bench_qr_export.py
+import os
+import sys
+import tempfile
+import time
+from base64 import b64encode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import qr_cache  # noqa: E402
+from core.template_engine import TemplateEngine  # noqa: E402
+
+N = 300
+QUESTS = 20  # the same few quests are exported over and over, as in the GUI
+
+
+def _export(te, out_dir, i, qr_tag):
+    q = TemplateEngine.generate_dummy_quest(i % QUESTS + 1)
+    html = qr_tag(q["id"]) + te.render("ancient_scroll.html", q)
+    with open(os.path.join(out_dir, f"quest_{q['id']}.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+def _run(te, out_dir, qr_tag):
+    start = time.perf_counter()
+    for i in range(N):
+        _export(te, out_dir, i, qr_tag)
+    return N / (time.perf_counter() - start)
+
+
+def main():
+    te = TemplateEngine.shared()
+    te.prewarm()
+    with tempfile.TemporaryDirectory() as tmp:
+        def uncached_png(qid):
+            # what QuestWizard.export_pdf did before: new QRCode + PNG + base64 per export
+            b64 = b64encode(qr_cache.render_qr(qr_cache.quest_url(qid), "png")).decode("ascii")
+            return f'<img src="data:image/png;base64,{b64}" alt="QR" />'
+
+        cache = qr_cache.QRCache(directory=os.path.join(tmp, "qr"))
+        results = {
+            "uncached PNG": _run(te, tmp, uncached_png),
+            "cached PNG": _run(te, tmp, lambda qid: cache.img_tag(qr_cache.quest_url(qid), "png")),
+            "cached SVG": _run(te, tmp, lambda qid: cache.img_tag(qr_cache.quest_url(qid), "svg")),
+        }
+        results["uncached SVG"] = _run(te, tmp, lambda qid: f'<img src="data:image/svg+xml;base64,'
+                                       f'{b64encode(qr_cache.render_qr(qr_cache.quest_url(qid), "svg")).decode()}" />')
+    for name, rate in results.items():
+        print(f"{name:>13}: {rate:8.0f} exports/s")
+
+
+if __name__ == "__main__":
+    main()
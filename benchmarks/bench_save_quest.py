@@ -0,0 +1,63 @@
+# Benchmark: saves per second with a fresh connection per save vs the pool.
+# Run from the project root: python benchmarks/bench_save_quest.py
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import database, migrations  # noqa: E402
+
+N = 500
+
+
+def _legacy_save(path, quest_id, data):
+    # what save_quest() did before the pool: open, run DDL, write, close
+    conn = sqlite3.connect(path)
+    migrations._base_tables(conn)
+    cursor = conn.cursor()
+    if quest_id is None:
+        cursor.execute(
+            "INSERT INTO quests (title, difficulty, reward, description, deadline) VALUES (?, ?, ?, ?, ?)",
+            (data["title"], data["difficulty"], data["reward"], data["description"], data["deadline"]),
+        )
+        quest_id = cursor.lastrowid
+    else:
+        cursor.execute(
+            "UPDATE quests SET title=?, difficulty=?, reward=?, description=?, deadline=? WHERE id=?",
+            (data["title"], data["difficulty"], data["reward"], data["description"], data["deadline"], quest_id),
+        )
+    cursor.execute(
+        "INSERT INTO quest_versions (quest_id, title, difficulty, reward, description) VALUES (?, ?, ?, ?, ?)",
+        (quest_id, data["title"], data["difficulty"], data["reward"], data["description"]),
+    )
+    conn.commit()
+    conn.close()
+    return quest_id
+
+
+def _run(save, path):
+    data = {"title": "Бенчмарк", "difficulty": "Средний", "reward": 100,
+            "description": "Описание квеста. " * 20, "deadline": "2026-01-01T00:00:00"}
+    quest_id = None
+    start = time.perf_counter()
+    for i in range(N):
+        data["reward"] = 100 + i
+        quest_id = save(path, quest_id, data)
+    return N / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = _run(_legacy_save, os.path.join(tmp, "legacy.db"))
+        pooled_path = os.path.join(tmp, "pooled.db")
+        pooled = _run(lambda p, qid, d: database.save_quest(qid, d, path=p), pooled_path)
+        database.close_pools()
+    print(f"legacy (connect + DDL per save): {legacy:8.0f} saves/s")
+    print(f"pooled (WAL, reused connection): {pooled:8.0f} saves/s")
+    print(f"speed-up: x{pooled / legacy:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Load test: the HTTP render service (core.server) under concurrent keep-alive clients.
+# Reports throughput and p50/p99 latency per route.
+# Run from the project root:
+#   python benchmarks/bench_server.py                 # starts `python -m core serve` on a temp database
+#   python benchmarks/bench_server.py --url http://127.0.0.1:8765 --ids 1-100
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import bulk  # noqa: E402
+from core.batch_export import dummy_quests  # noqa: E402
+from core.cli import parse_ids  # noqa: E402
+
+QUESTS = 200
+TEMPLATE = "ancient_scroll.html"
+
+
+async def _request(reader, writer, host, path, etag=None):
+    extra = f"If-None-Match: {etag}\r\n" if etag else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{extra}\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("etag")
+
+
+async def _load(host, port, paths, requests, concurrency, etags=None):
+    """Send `requests` GETs over `concurrency` keep-alive connections; returns latencies and statuses."""
+    latencies, statuses = [], {}
+    remaining = [requests]
+    rng = random.Random(1)
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                path = rng.choice(paths)
+                start = time.perf_counter()
+                status, _ = await _request(reader, writer, host, path, etags.get(path) if etags else None)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def _etags(host, port, paths):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return {path: (await _request(reader, writer, host, path))[1] for path in paths}
+    finally:
+        writer.close()
+
+
+async def _bench(host, port, ids, requests, concurrency):
+    scenarios = [
+        ("quest JSON", [f"/quests/{i}" for i in ids], None),
+        ("render HTML", [f"/render/{TEMPLATE}/{i}" for i in ids], None),
+        ("render HTML, If-None-Match", [f"/render/{TEMPLATE}/{i}" for i in ids], "etag"),
+        ("render HTML + QR", [f"/render/{TEMPLATE}/{i}?qr=svg" for i in ids], None),
+        ("QR PNG", [f"/qr/{i}" for i in ids], None),
+        # DOCX goes through the process pool and is two orders of magnitude slower
+        ("render DOCX", [f"/render/{TEMPLATE}/{i}?format=docx" for i in ids], "slow"),
+    ]
+    print(f"{requests} requests per route (DOCX: a tenth), {concurrency} connections, {len(ids)} quests")
+    for label, paths, mode in scenarios:
+        etags = await _etags(host, port, paths) if mode == "etag" else None
+        count = max(concurrency, requests // 10) if mode == "slow" else requests
+        latencies, statuses, elapsed = await _load(host, port, paths, count, concurrency, etags)
+        codes = ", ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+        print(f"{label:28} {len(latencies) / elapsed:8.0f} req/s  p50 {_percentile(latencies, 50) * 1000:7.2f} ms  "
+              f"p99 {_percentile(latencies, 99) * 1000:7.2f} ms  ({codes})")
+
+
+def _start_local(tmp):
+    db = os.path.join(tmp, "quests.db")
+    bulk.save_quests(dummy_quests(range(1, QUESTS + 1)), path=db)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "core", "serve", "--db", db, "--templates", os.path.join(ROOT, "templates"),
+         "--port", "0"],
+        cwd=tmp, env=dict(os.environ, PYTHONPATH=ROOT), stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    # "Сервис запущен: http://127.0.0.1:<port>"
+    line = proc.stdout.readline()
+    return proc, line.strip().rsplit(" ", 1)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="a running instance (default: start one on a temporary database)")
+    parser.add_argument("--ids", default=f"1-{QUESTS}", help="quest ids to request, e.g. 1-100")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, url = (None, args.url) if args.url else _start_local(tmp)
+        try:
+            address = urlsplit(url)
+            asyncio.run(_bench(address.hostname, address.port, list(parse_ids(args.ids)),
+                               args.requests, args.concurrency))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
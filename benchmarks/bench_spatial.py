@@ -0,0 +1,54 @@
+# Benchmark: viewport queries over 100k markers, R*Tree vs plain range scan.
+# Run from the project root: python benchmarks/bench_spatial.py
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import database  # noqa: E402
+
+N = 100_000
+SIZE = 20_000.0
+VIEW = (800.0, 600.0)
+QUERIES = 500
+
+
+def main():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "quests.db")
+        with database.connection(path) as conn:
+            conn.executemany(
+                "INSERT INTO quest_locations (quest_id, x, y, type) VALUES (1, ?, ?, 'green')",
+                [(rng.uniform(0, SIZE), rng.uniform(0, SIZE)) for _ in range(N)],
+            )
+        views = [(rng.uniform(0, SIZE), rng.uniform(0, SIZE)) for _ in range(QUERIES)]
+
+        start = time.perf_counter()
+        for x, y in views:
+            database.locations_in_rect(x, y, x + VIEW[0], y + VIEW[1], path=path)
+        rtree = (time.perf_counter() - start) / QUERIES * 1000
+
+        with database.connection(path) as conn:
+            start = time.perf_counter()
+            for x, y in views:
+                # NOT INDEXED: what the viewport query costs without the R*Tree
+                conn.execute("SELECT id, x, y, type FROM quest_locations NOT INDEXED "
+                             "WHERE x BETWEEN ? AND ? AND y BETWEEN ? AND ?",
+                             (x, x + VIEW[0], y, y + VIEW[1])).fetchall()
+            scan = (time.perf_counter() - start) / QUERIES * 1000
+
+        start = time.perf_counter()
+        for x, y in views:
+            database.nearest_locations(x, y, 5, path=path)
+        nearest = (time.perf_counter() - start) / QUERIES * 1000
+        database.close_pools()
+    print(f"viewport query, R*Tree:     {rtree:7.2f} ms")
+    print(f"viewport query, range scan: {scan:7.2f} ms  (x{scan / rtree:.0f})")
+    print(f"5 nearest markers:          {nearest:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Benchmark: replay 10k-point brush strokes through the legacy per-event
+# setPath() and through StrokeEngine (buffered, one update per frame).
+# Run from the project root: python benchmarks/bench_strokes.py
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "gui")]
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QPointF  # noqa: E402
+from PyQt6.QtGui import QColor, QPainterPath, QPen  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QGraphicsPathItem, QGraphicsScene, QGraphicsView  # noqa: E402
+
+from stroke_engine import StrokeEngine  # noqa: E402
+
+POINTS = 10_000
+STROKES = 3
+# a 1 kHz mouse at 60 fps delivers about 16 events per frame
+EVENTS_PER_FRAME = 16
+
+
+def _stroke(seed):
+    rng = random.Random(seed)
+    return [QPointF(100 + i * 0.08 + rng.uniform(-0.3, 0.3), 300 + 120 * math.sin(i / 300) + rng.uniform(-0.3, 0.3))
+            for i in range(POINTS)]
+
+
+def _replay(app, on_press, on_move, on_release, points):
+    latencies = []
+    on_press(points[0])
+    start = time.perf_counter()
+    for i, pos in enumerate(points[1:], start=1):
+        t = time.perf_counter()
+        on_move(pos)
+        latencies.append(time.perf_counter() - t)
+        if i % EVENTS_PER_FRAME == 0:
+            app.processEvents()
+    release_start = time.perf_counter()
+    item = on_release()
+    app.processEvents()
+    end = time.perf_counter()
+    return end - start, end - release_start, latencies, item
+
+
+def legacy(scene):
+    state = {}
+
+    def press(pos):
+        state["path"] = QPainterPath()
+        state["path"].moveTo(pos)
+        state["item"] = QGraphicsPathItem(state["path"])
+        state["item"].setPen(QPen(QColor("brown"), 3))
+        scene.addItem(state["item"])
+
+    def move(pos):
+        state["path"].lineTo(pos)
+        state["item"].setPath(state["path"])
+
+    return press, move, lambda: state["item"]
+
+
+def engine(scene):
+    strokes = StrokeEngine(scene)
+
+    def move(pos):
+        strokes.add(pos)
+        # the frame timer's job, driven here at a fixed event rate
+        if len(strokes._pending) >= EVENTS_PER_FRAME:
+            strokes.flush()
+
+    return lambda pos: strokes.begin(pos, QPen(QColor("brown"), 3)), move, strokes.finish
+
+
+def main():
+    app = QApplication.instance() or QApplication([])
+    for name, factory in (("legacy setPath per event", legacy), ("StrokeEngine", engine)):
+        scene = QGraphicsScene(0, 0, 1000, 600)
+        view = QGraphicsView(scene)
+        view.resize(1000, 600)
+        view.show()
+        total = release = 0.0
+        worst_tail = 0.0
+        kept = 0
+        for seed in range(STROKES):
+            elapsed, finish, latencies, item = _replay(app, *factory(scene), _stroke(seed))
+            total += elapsed
+            release += finish
+            # mean cost of the last 1000 move events: grows with stroke length if O(n)
+            worst_tail = max(worst_tail, sum(latencies[-1000:]) / 1000)
+            kept += item.path().elementCount()
+        print(f"{name:26} {total / STROKES * 1000:8.1f} ms/stroke, "
+              f"late move events {worst_tail * 1e6:7.1f} us, finish {release / STROKES * 1000:6.1f} ms, "
+              f"{kept // STROKES} of {POINTS} points kept")
+        view.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Benchmark: repaint of a large map through TiledMapView with and without
+# the tile cache, and banded PNG export memory.
+# Run from the project root: python benchmarks/bench_tiles.py
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "gui")]
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QPointF, QRectF  # noqa: E402
+from PyQt6.QtGui import QColor, QPainterPath, QPen  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QGraphicsScene  # noqa: E402
+
+from tiled_view import TiledMapView, export_png  # noqa: E402
+
+WORLD = (16000, 12000)
+STROKES = 300
+MARKERS = 2000
+REPAINTS = 20
+EXPORT_RECT = QRectF(0, 0, 4000, 3000)
+
+
+def _scene():
+    rng = random.Random(1)
+    scene = QGraphicsScene(0, 0, *WORLD)
+    for _ in range(STROKES):
+        x, y = rng.uniform(0, WORLD[0]), rng.uniform(0, WORLD[1])
+        path = QPainterPath(QPointF(x, y))
+        for _ in range(200):
+            x, y = x + rng.uniform(-20, 20), y + rng.uniform(-20, 20)
+            path.lineTo(x, y)
+        scene.addPath(path, QPen(QColor("brown"), 3))
+    for _ in range(MARKERS):
+        scene.addEllipse(rng.uniform(0, WORLD[0]), rng.uniform(0, WORLD[1]), 10, 10, QPen(), QColor("red"))
+    return scene
+
+
+def _repaint(app, view):
+    start = time.perf_counter()
+    for _ in range(REPAINTS):
+        view.viewport().repaint()
+    app.processEvents()
+    return (time.perf_counter() - start) / REPAINTS * 1000
+
+
+def main():
+    app = QApplication.instance() or QApplication([])
+    scene = _scene()
+    view = TiledMapView(scene)
+    view.resize(1200, 800)
+    view.show()
+    view.zoom(0.125)
+    app.processEvents()
+    print(f"untiled repaint  {_repaint(app, view):7.1f} ms")
+    view.tiled = True
+    start = time.perf_counter()
+    view.viewport().repaint()
+    print(f"tiled first      {(time.perf_counter() - start) * 1000:7.1f} ms ({len(view.tile_cache)} tiles)")
+    print(f"tiled cached     {_repaint(app, view):7.1f} ms")
+    view.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = export_png(scene, os.path.join(tmp, "map.png"), EXPORT_RECT)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"export_png {size[0]}x{size[1]} {elapsed:6.2f} s, python peak {peak / 2 ** 20:6.1f} MB, "
+              f"file {os.path.getsize(os.path.join(tmp, 'map.png')) / 2 ** 20:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
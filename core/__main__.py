@@ -0,0 +1,6 @@
+# quest_master/core/__main__.py
+from core.cli import main
+
+# guarded: spawned worker processes import this module as __mp_main__
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,331 @@
+# quest_master/core/batch_export.py
+"""Parallel batch rendering and export of quest parchments.
+
+Quests are read lazily from any iterable, grouped into small chunks and
+rendered/written by a pool of worker processes (WeasyPrint PDF generation is
+CPU-bound). Only `workers * max_pending` chunks are ever in flight, so a
+100k-quest export uses about as much memory as a 100-quest one.
+
+    for result in iter_export(dummy_quests(range(1, 1001)), fmt="pdf", workers=4):
+        ...
+"""
+import bisect
+import itertools
+import os
+import tarfile
+import tempfile
+import zipfile
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import IO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core import qr_cache
+from core.template_engine import SHIPPED_TEMPLATES, TEMPLATES_PATH, TemplateEngine
+
+FORMATS = ("html", "pdf", "docx")
+ARCHIVE_FORMATS = ("zip", "tar", "tar.gz")
+
+# (quest id, piece of rendered HTML). A piece of None starts a new document,
+# so consecutive quests with the same id (or with none) stay separate
+Chunk = Tuple[object, Optional[str]]
+
+
+@dataclass
+class ExportResult:
+    quest_id: object
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchReport:
+    done: int = 0
+    failed: int = 0
+    # failures only: successful results are not kept so memory stays flat
+    errors: List[ExportResult] = field(default_factory=list)
+
+
+ProgressCallback = Callable[[int, ExportResult], None]
+
+
+def dummy_quests(ids: Iterable[int]) -> Iterator[Dict]:
+    for i in ids:
+        yield TemplateEngine.generate_dummy_quest(i)
+
+
+def db_quests(ids: Optional[Iterable[int]] = None, path: Optional[str] = None) -> Iterator[Dict]:
+    from core import database
+    return database.iter_quests(ids, path=path or database.DB_PATH)
+
+
+def output_path(out_dir: str, quest: Dict, fmt: str) -> str:
+    return os.path.join(out_dir, f"quest_{quest.get('id')}.{fmt}")
+
+
+def write_document(html: str, path: str, fmt: str) -> str:
+    """Write already-rendered HTML as `fmt`; top-level so process pools can pickle it."""
+    if fmt == "html":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+    elif fmt == "pdf":
+        TemplateEngine.write_pdf(html, path)
+    elif fmt == "docx":
+        TemplateEngine.write_docx(html, path)
+    else:
+        raise ValueError(f"Неизвестный формат '{fmt}', ожидается один из {FORMATS}")
+    return path
+
+
+def export_one(engine: TemplateEngine, quest: Dict, template: str, fmt: str, out_dir: str,
+               qr: Optional[str] = None) -> ExportResult:
+    quest_id = quest.get("id")
+    try:
+        html = engine.render(template, quest)
+        if qr:
+            html = engine.qr_img_tag(quest_id, qr) + html
+        return ExportResult(quest_id, write_document(html, output_path(out_dir, quest, fmt), fmt))
+    except Exception as e:
+        return ExportResult(quest_id, error=f"{type(e).__name__}: {e}")
+
+
+def _export_chunk(chunk: List[Dict], template: str, fmt: str, out_dir: str, templates_path: str,
+                  qr: Optional[str] = None) -> List[ExportResult]:
+    # runs in a worker process; the shared engine is built once per process
+    engine = TemplateEngine.shared(templates_path)
+    if qr:
+        # one QR per quest, served from the shared on-disk cache when possible
+        qr_cache.shared().get_many((qr_cache.quest_url(q.get("id")) for q in chunk), qr)
+    return [export_one(engine, quest, template, fmt, out_dir, qr) for quest in chunk]
+
+
+def _chunks(quests: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk: List[Dict] = []
+    for quest in quests:
+        chunk.append(quest)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_export(quests: Iterable[Dict], template: str = SHIPPED_TEMPLATES[0], fmt: str = "html",
+                out_dir: str = "parchments", workers: Optional[int] = None, ordered: bool = True,
+                chunk_size: int = 16, max_pending: int = 4, templates_path: str = TEMPLATES_PATH,
+                executor: Optional[Executor] = None, qr: Optional[str] = None) -> Iterator[ExportResult]:
+    """Export `quests` and yield one ExportResult per quest.
+
+    `workers=0` renders in the calling process. With `ordered=True` results
+    come back in input order; otherwise as soon as each chunk finishes.
+    `qr="svg"` or `qr="png"` prepends each quest's cached QR code.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат '{fmt}', ожидается один из {FORMATS}")
+    os.makedirs(out_dir, exist_ok=True)
+    templates_path = os.path.abspath(templates_path)
+    out_dir = os.path.abspath(out_dir)
+    if workers == 0 and executor is None:
+        for chunk in _chunks(quests, chunk_size):
+            yield from _export_chunk(chunk, template, fmt, out_dir, templates_path, qr)
+        return
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    limit = max(1, (workers or os.cpu_count() or 1) * max_pending)
+    # future -> quest ids of its chunk, to report per-item errors if a worker dies
+    pending: Dict[Future, List[object]] = {}
+    order: Deque[Future] = deque()
+    try:
+        for chunk in _chunks(quests, chunk_size):
+            future = executor.submit(_export_chunk, chunk, template, fmt, out_dir, templates_path, qr)
+            pending[future] = [quest.get("id") for quest in chunk]
+            order.append(future)
+            while len(pending) >= limit:
+                yield from _collect(pending, order, ordered)
+        while pending:
+            yield from _collect(pending, order, ordered)
+    finally:
+        if own_executor:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+def _collect(pending: Dict[Future, List[object]], order: Deque[Future], ordered: bool) -> Iterator[ExportResult]:
+    if ordered:
+        finished = [order.popleft()]
+    else:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        finished = list(done)
+        for future in finished:
+            order.remove(future)
+    for future in finished:
+        ids = pending.pop(future)
+        try:
+            results = future.result()
+        except Exception as e:
+            results = [ExportResult(quest_id, error=f"{type(e).__name__}: {e}") for quest_id in ids]
+        yield from results
+
+
+def export_batch(quests: Iterable[Dict], template: str = SHIPPED_TEMPLATES[0], fmt: str = "html",
+                 out_dir: str = "parchments", workers: Optional[int] = None, ordered: bool = True,
+                 progress: Optional[ProgressCallback] = None, **kwargs) -> BatchReport:
+    """Run `iter_export` to completion, reporting each item to `progress(count, result)`."""
+    report = BatchReport()
+    for result in iter_export(quests, template, fmt, out_dir, workers, ordered, **kwargs):
+        if result.ok:
+            report.done += 1
+        else:
+            report.failed += 1
+            report.errors.append(result)
+        if progress is not None:
+            try:
+                progress(report.done + report.failed, result)
+            except Exception:
+                pass
+    return report
+
+
+def stream_render(quests: Iterable[Dict], template: str = SHIPPED_TEMPLATES[0],
+                  engine: Optional[TemplateEngine] = None) -> Iterator[Chunk]:
+    """Yield (quest_id, chunk) pairs via Jinja2's Template.generate().
+
+    Every document starts with a (quest_id, None) marker.
+
+    No document is ever held as a whole string, so memory does not grow with
+    either the batch size or the size of a single parchment.
+    """
+    engine = engine or TemplateEngine.shared()
+    tmpl = engine.env.get_template(template)
+    for quest in quests:
+        quest_id = quest.get("id")
+        yield quest_id, None
+        for piece in tmpl.generate(engine.context(quest)):
+            yield quest_id, piece
+
+
+def _documents(stream: Iterable[Chunk]) -> Iterator[Tuple[object, Iterator[str]]]:
+    # regroup the flat chunk stream into (quest_id, chunks of that quest); a
+    # document ends at the next start marker or, without markers, where the id changes
+    it = iter(stream)
+    head = next(it, None)
+    while head is not None:
+        quest_id = head[0]
+        following: List[Optional[Chunk]] = [None]
+
+        def pieces(first=head[1], quest_id=quest_id, following=following):
+            if first is not None:
+                yield first
+            for item in it:
+                if item[1] is None or item[0] != quest_id:
+                    following[0] = item
+                    return
+                yield item[1]
+
+        body = pieces()
+        yield quest_id, body
+        for _ in body:  # drain whatever the consumer did not read
+            pass
+        head = following[0]
+
+
+def _named_documents(stream: Iterable[Chunk], ext: str) -> Iterator[Tuple[str, Iterator[str]]]:
+    # file name per document: `quest_<id>.<ext>`, and `quest_<id>_2.<ext>`,
+    # `_3`, ... when an id repeats in the stream (e.g. unsaved quests, id None).
+    # Names already used are kept as a sorted array of 64-bit hashes: 8 bytes
+    # per document instead of a set of strings, so memory stays flat (a hash
+    # collision would at worst number a name that did not repeat)
+    used = array("q")
+    for quest_id, pieces in _documents(stream):
+        name, n = f"quest_{quest_id}.{ext}", 1
+        while _has(used, hash(name)):
+            n += 1
+            name = f"quest_{quest_id}_{n}.{ext}"
+        bisect.insort(used, hash(name))
+        yield name, pieces
+
+
+def _has(ordered: array, value: int) -> bool:
+    i = bisect.bisect_left(ordered, value)
+    return i < len(ordered) and ordered[i] == value
+
+
+def write_stream_to_dir(stream: Iterable[Chunk], out_dir: str = "parchments", ext: str = "html") -> int:
+    """Write every document of `stream` to `out_dir/quest_<id>.<ext>`; returns the count.
+
+    Files left in `out_dir` by an earlier export are overwritten; documents
+    sharing an id within the stream get numbered names instead.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+    for name, pieces in _named_documents(stream, ext):
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            for piece in pieces:
+                f.write(piece)
+        count += 1
+    return count
+
+
+def _copy_encoded(pieces: Iterable[str], dest: IO[bytes]) -> None:
+    for piece in pieces:
+        dest.write(piece.encode("utf-8"))
+
+
+def write_stream_to_archive(stream: Iterable[Chunk], archive_path: str, fmt: str = "zip", ext: str = "html") -> int:
+    """Write every document of `stream` into one zip/tar archive; returns the count.
+
+    Zip members are written chunk by chunk; only the small per-member entry
+    of the zip central directory stays in memory. A tar header needs the
+    member size up front, so each document passes through a
+    SpooledTemporaryFile that spills to disk past 1 MB. Member names are
+    those of write_stream_to_dir, so an archive never holds duplicate members.
+    """
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Неизвестный формат архива '{fmt}', ожидается один из {ARCHIVE_FORMATS}")
+    count = 0
+    if fmt == "zip":
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, pieces in _named_documents(stream, ext):
+                with zf.open(name, "w", force_zip64=True) as member:
+                    _copy_encoded(pieces, member)
+                count += 1
+        return count
+    with tarfile.open(archive_path, "w:gz" if fmt == "tar.gz" else "w") as tf:
+        for name, pieces in _named_documents(stream, ext):
+            with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+                _copy_encoded(pieces, spool)
+                info = tarfile.TarInfo(name)
+                info.size = spool.tell()
+                spool.seek(0)
+                tf.addfile(info, spool)
+            # TarFile remembers every member for listing; not needed when writing
+            tf.members.clear()
+            count += 1
+    return count
+
+
+def export_docx_bundle(quests: Iterable[Dict], path: str, template: str = SHIPPED_TEMPLATES[0],
+                       qr: Optional[str] = "png", engine: Optional[TemplateEngine] = None) -> int:
+    """Write many quests into one multi-section DOCX, streaming each render."""
+    from core import docx_export
+
+    engine = engine or TemplateEngine.shared()
+    tmpl = engine.env.get_template(template)
+
+    def documents():
+        for quest in quests:
+            chunks = tmpl.generate(engine.context(quest))
+            if qr:
+                yield itertools.chain([engine.qr_img_tag(quest.get("id"), qr)], chunks)
+            else:
+                yield chunks
+
+    return docx_export.write_many(documents(), path)
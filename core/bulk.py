@@ -0,0 +1,211 @@
+# quest_master/core/bulk.py
+"""Bulk quest import/export with batched transactions.
+
+`save_quests` streams any iterable of quest dicts into the database in
+batches: each batch is one transaction with an `executemany` upsert keyed on
+the UNIQUE title, so a million quests cost a few hundred commits instead of a
+million. Interchange formats are JSON Lines and CSV, both read and written
+as streams.
+"""
+import csv
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from core import database, search, version_store
+
+FIELDS = ("title", "difficulty", "reward", "description", "deadline")
+EXPORT_FIELDS = database.QUEST_COLUMNS
+FORMATS = ("jsonl", "csv")
+
+_UPSERT = (
+    "INSERT INTO quests (title, difficulty, reward, description, deadline) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(title) DO UPDATE SET difficulty=excluded.difficulty, reward=excluded.reward, "
+    "description=excluded.description, deadline=excluded.deadline"
+)
+_INSERT_NEW = (
+    "INSERT INTO quests (title, difficulty, reward, description, deadline) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(title) DO NOTHING"
+)
+# SQLite's default limit on bound parameters is 32766; stay well below it
+_MAX_PARAMS = 900
+
+
+@dataclass
+class BulkReport:
+    processed: int = 0
+    failed: int = 0
+    # rows left alone because the title already existed (upsert=False)
+    skipped: int = 0
+    batches: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def _row(quest: Dict) -> tuple:
+    reward = quest.get("reward")
+    return (
+        str(quest["title"]),
+        quest.get("difficulty") or "Легкий",
+        int(reward) if reward not in (None, "") else None,
+        quest.get("description") or "",
+        quest.get("deadline") or "",
+    )
+
+
+def _batches(quests: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for quest in quests:
+        batch.append(quest)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ids_by_title(conn: sqlite3.Connection, titles: List[str]) -> Dict[str, int]:
+    ids: Dict[str, int] = {}
+    for start in range(0, len(titles), _MAX_PARAMS):
+        chunk = titles[start:start + _MAX_PARAMS]
+        marks = ",".join("?" * len(chunk))
+        ids.update((t, i) for i, t in conn.execute(f"SELECT id, title FROM quests WHERE title IN ({marks})", chunk))
+    return ids
+
+
+def _latest_versions(conn: sqlite3.Connection, quest_ids: List[int]) -> Dict[int, int]:
+    latest: Dict[int, int] = {}
+    for start in range(0, len(quest_ids), _MAX_PARAMS):
+        chunk = quest_ids[start:start + _MAX_PARAMS]
+        marks = ",".join("?" * len(chunk))
+        latest.update(conn.execute(
+            f"SELECT quest_id, MAX(version) FROM quest_versions WHERE quest_id IN ({marks}) GROUP BY quest_id", chunk))
+    return latest
+
+
+def _write_batch(conn: sqlite3.Connection, rows: List[tuple], upsert: bool, record_versions: bool) -> int:
+    """Write one batch; returns how many rows were actually inserted or updated."""
+    if upsert:
+        # last row wins when a title repeats inside one batch, as with the upsert;
+        # the repeats are dropped before the write: a row inserted in this batch
+        # is not in the FTS index yet, so updating it would make the update
+        # trigger delete an unindexed document and corrupt the index
+        final = {row[0]: row for row in rows}
+        written = len(rows)
+        rows = list(final.values())
+    else:
+        # ON CONFLICT DO NOTHING skips titles that already exist and, inside
+        # the batch, every repeat after the first one
+        existing = _ids_by_title(conn, list({row[0] for row in rows}))
+        final = {}
+        for row in rows:
+            if row[0] not in existing:
+                final.setdefault(row[0], row)
+        written = len(final)
+    with search.deferred_quest_index(conn):
+        conn.executemany(_UPSERT if upsert else _INSERT_NEW, rows)
+    if not record_versions or not final:
+        return written
+    ids = _ids_by_title(conn, list(final))
+    latest = _latest_versions(conn, list(ids.values()))
+    # bulk versions are full snapshots: valid at any point of a delta chain and
+    # they need no per-row read of the previous version
+    conn.executemany(
+        "INSERT INTO quest_versions (quest_id, version, title, difficulty, reward, kind, payload) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (ids[title], latest.get(ids[title], 0) + 1, title, row[1], row[2],
+             version_store.KIND_SNAPSHOT, version_store.encode_snapshot(row[3]))
+            for title, row in final.items() if title in ids
+        ],
+    )
+    return written
+
+
+def save_quests(quests: Iterable[Dict], batch_size: int = 5000, upsert: bool = True,
+                record_versions: bool = True, path: str = database.DB_PATH,
+                progress=None) -> BulkReport:
+    """Insert or update quests by title, one transaction per batch.
+
+    A batch that violates a constraint is retried row by row so one bad
+    record does not sink its neighbours; such rows are reported in `errors`.
+    """
+    report = BulkReport()
+    for batch in _batches(quests, batch_size):
+        rows = []
+        for quest in batch:
+            try:
+                rows.append(_row(quest))
+            except (KeyError, TypeError, ValueError) as e:
+                report.failed += 1
+                report.errors.append(f"{quest!r:.80}: {e}")
+        try:
+            with database.connection(path) as conn:
+                written = _write_batch(conn, rows, upsert, record_versions)
+            report.processed += written
+            report.skipped += len(rows) - written
+        except sqlite3.IntegrityError:
+            for row in rows:
+                try:
+                    with database.connection(path) as conn:
+                        written = _write_batch(conn, [row], upsert, record_versions)
+                    report.processed += written
+                    report.skipped += 1 - written
+                except sqlite3.IntegrityError as e:
+                    report.failed += 1
+                    report.errors.append(f"{row[0]!r}: {e}")
+        report.batches += 1
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def read_jsonl(stream: IO[str]) -> Iterator[Dict]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(stream: IO[str]) -> Iterator[Dict]:
+    yield from csv.DictReader(stream)
+
+
+def _format_of(filename: str, fmt: Optional[str]) -> str:
+    fmt = fmt or filename.rsplit(".", 1)[-1].lower()
+    if fmt == "json":
+        fmt = "jsonl"
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат '{fmt}', ожидается один из {FORMATS}")
+    return fmt
+
+
+def import_quests(filename: str, fmt: Optional[str] = None, **kwargs) -> BulkReport:
+    """Stream a .jsonl/.csv file into the database via `save_quests`."""
+    fmt = _format_of(filename, fmt)
+    with open(filename, "r", encoding="utf-8", newline="") as f:
+        return save_quests(read_jsonl(f) if fmt == "jsonl" else read_csv(f), **kwargs)
+
+
+def write_quests(quests: Iterable[Dict], stream: IO[str], fmt: str = "jsonl") -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for quest in quests:
+            writer.writerow(quest)
+            count += 1
+        return count
+    for quest in quests:
+        stream.write(json.dumps(quest, ensure_ascii=False))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def export_quests(filename: str, fmt: Optional[str] = None, ids: Optional[Iterable[int]] = None,
+                  path: str = database.DB_PATH, batch_size: int = 5000) -> int:
+    """Stream quests (all, an id range or id list) to a .jsonl/.csv file."""
+    fmt = _format_of(filename, fmt)
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        return write_quests(database.iter_quests(ids, path=path, batch_size=batch_size), f, fmt)
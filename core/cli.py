@@ -0,0 +1,321 @@
+# quest_master/core/cli.py
+"""Headless command line for servers without a display: `python -m core`.
+
+    python -m core generate 1000                      # dummy quests into quests.db
+    python -m core generate 1000 --output quests.jsonl
+    python -m core render royal_decree.html --ids 1-500 --archive scrolls.zip
+    python -m core export --format pdf --jobs 8 --json
+    python -m core stats
+    python -m core serve --port 8765                  # HTTP render service, see core.server
+
+`--jobs N` renders in N worker processes (0: in this process; default: one
+per CPU). `--json` turns progress, per-quest errors and the final summary
+into JSON lines on stdout; otherwise progress goes to stderr as one
+updating line. Only core modules are imported here, never Qt.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core import batch_export, bulk, database, profiles, version_store
+from core.template_engine import SHIPPED_TEMPLATES, TEMPLATES_PATH, TemplateEngine
+
+# seconds between two progress reports
+PROGRESS_INTERVAL = 0.5
+LEADERBOARD_TOP = 5
+
+
+class Progress:
+    """Progress of one command, as JSON lines on stdout or a status line on stderr."""
+
+    def __init__(self, command: str, total: Optional[int], as_json: bool, interval: float = PROGRESS_INTERVAL,
+                 summary: Optional[IO[str]] = None):
+        self.command = command
+        self.total = total
+        self.as_json = as_json
+        self.interval = interval
+        # where the closing line goes (stdout unless stdout carries data)
+        self.summary = summary
+        self.done = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+        # one line rewritten in place on a terminal, plain lines in a log
+        self._tty = sys.stderr.isatty()
+        self.emit("start", total=total)
+
+    def emit(self, event: str, **fields) -> None:
+        if self.as_json:
+            record = {"event": event, "command": self.command, **fields}
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+
+    def update(self, done: int, failed: int, force: bool = False) -> None:
+        self.done, self.failed = done, failed
+        now = time.perf_counter()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        if self.as_json:
+            self.emit("progress", done=done, failed=failed, total=self.total,
+                      elapsed=round(elapsed, 3), rate=round(rate, 1))
+        else:
+            of = f"/{self.total}" if self.total is not None else ""
+            line = f"{self.command}: {done}{of}, ошибок {failed}, {rate:.0f}/с"
+            sys.stderr.write(f"\r{line}" if self._tty else f"{line}\n")
+            sys.stderr.flush()
+
+    def error(self, quest_id, message: str) -> None:
+        if self.as_json:
+            self.emit("error", quest_id=quest_id, error=message)
+        else:
+            if self._tty:
+                sys.stderr.write("\n")
+            sys.stderr.write(f"Ошибка ({quest_id}): {message}\n")
+
+    def finish(self, **fields) -> None:
+        self.update(self.done, self.failed, force=True)
+        elapsed = round(time.perf_counter() - self.start, 3)
+        if self.as_json:
+            self.emit("done", done=self.done, failed=self.failed, elapsed=elapsed, **fields)
+        else:
+            if self._tty:
+                sys.stderr.write("\n")
+            details = "".join(f", {key}: {value}" for key, value in fields.items())
+            print(f"{self.command}: готово {self.done}, ошибок {self.failed}, {elapsed} с{details}",
+                  file=self.summary or sys.stdout)
+
+
+def parse_ids(spec: str) -> Iterable[int]:
+    """'1-100' -> range(1, 101); '3,5,10-12' -> [3, 5, 10, 11, 12]."""
+    parts = [part.strip() for part in spec.split(",") if part.strip()]
+    ids: List[int] = []
+    for part in parts:
+        first, _, last = part.partition("-")
+        if last:
+            if len(parts) == 1:
+                # a single range is read page by page, not listed
+                return range(int(first), int(last) + 1)
+            ids.extend(range(int(first), int(last) + 1))
+        else:
+            ids.append(int(first))
+    return ids
+
+
+def _count_quests(path: str) -> int:
+    with database.connection(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM quests").fetchone()[0]
+
+
+def select_quests(args) -> Tuple[Iterable[Dict], int]:
+    """(quest iterable, expected count) for --dummy / --ids / the whole database."""
+    if args.dummy is not None:
+        return batch_export.dummy_quests(range(1, args.dummy + 1)), args.dummy
+    _require_db(args)
+    if args.ids:
+        ids = parse_ids(args.ids)
+        # ids that do not exist are skipped, so this is an upper bound
+        return database.iter_quests(ids, path=args.db), len(ids)
+    return database.iter_quests(path=args.db), _count_quests(args.db)
+
+
+def _require_db(args) -> None:
+    if not os.path.exists(args.db):
+        raise SystemExit(f"База '{args.db}' не найдена")
+
+
+def _counted(items: Iterable[Dict], progress: Progress) -> Iterator[Dict]:
+    # a quest is counted when the next one is requested, i.e. once it is written
+    count = 0
+    for item in items:
+        if count:
+            progress.update(count, 0)
+        yield item
+        count += 1
+    progress.done = count
+
+
+def _export(args, command: str, fmt: str) -> int:
+    quests, total = select_quests(args)
+    progress = Progress(command, total, args.json)
+    done = failed = 0
+    for result in batch_export.iter_export(quests, args.template, fmt, args.out_dir, args.jobs,
+                                           ordered=False, templates_path=args.templates, qr=args.qr):
+        if result.ok:
+            done += 1
+        else:
+            failed += 1
+            progress.error(result.quest_id, result.error)
+        progress.update(done, failed)
+    progress.finish(out_dir=os.path.abspath(args.out_dir))
+    return 1 if failed else 0
+
+
+def cmd_generate(args) -> int:
+    quests = (TemplateEngine.generate_dummy_quest(i) for i in range(args.start, args.start + args.count))
+    # with --output - stdout carries the quests, so progress cannot be JSON there
+    to_stdout = args.output == "-"
+    progress = Progress("generate", args.count, args.json and not to_stdout,
+                        summary=sys.stderr if to_stdout else None)
+    if args.output:
+        fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+        if to_stdout:
+            bulk.write_quests(_counted(quests, progress), sys.stdout, fmt)
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as f:
+                bulk.write_quests(_counted(quests, progress), f, fmt)
+        progress.finish(output=args.output)
+        return 0
+    report = bulk.save_quests(quests, batch_size=args.batch_size, path=args.db,
+                              progress=lambda r: progress.update(r.processed, r.failed))
+    for error in report.errors:
+        progress.error(None, error)
+    progress.done, progress.failed = report.processed, report.failed
+    progress.finish(db=os.path.abspath(args.db))
+    return 1 if report.failed else 0
+
+
+def cmd_render(args) -> int:
+    if not args.archive:
+        return _export(args, "render", "html")
+    # one archive, streamed from a single process (--jobs does not apply)
+    quests, total = select_quests(args)
+    progress = Progress("render", total, args.json)
+    engine = TemplateEngine.shared(args.templates)
+    stream = batch_export.stream_render(_counted(quests, progress), args.template, engine)
+    count = batch_export.write_stream_to_archive(stream, args.archive, args.archive_format or _archive_format(args.archive))
+    progress.done = count
+    progress.finish(archive=os.path.abspath(args.archive))
+    return 0
+
+
+def _archive_format(path: str) -> str:
+    if path.endswith((".tar.gz", ".tgz")):
+        return "tar.gz"
+    return "tar" if path.endswith(".tar") else "zip"
+
+
+def cmd_export(args) -> int:
+    return _export(args, "export", args.format)
+
+
+def collect_stats(path: str) -> Dict:
+    with database.connection(path) as conn:
+        one = lambda sql: conn.execute(sql).fetchone()[0]  # noqa: E731
+        kinds = dict(conn.execute("SELECT kind, COUNT(*) FROM quest_versions GROUP BY kind").fetchall())
+        return {
+            "db": os.path.abspath(path),
+            "size_bytes": os.path.getsize(path),
+            "schema_version": one("PRAGMA user_version"),
+            "quests": one("SELECT COUNT(*) FROM quests"),
+            "by_difficulty": dict(conn.execute(
+                "SELECT difficulty, COUNT(*) FROM quests GROUP BY difficulty ORDER BY difficulty").fetchall()),
+            "reward_total": one("SELECT COALESCE(SUM(reward), 0) FROM quests"),
+            "versions": sum(kinds.values()),
+            "version_snapshots": kinds.get(version_store.KIND_SNAPSHOT, 0),
+            "locations": one("SELECT COUNT(*) FROM quest_locations"),
+            "profiles": one("SELECT COUNT(*) FROM profiles"),
+            "achievements": one("SELECT COUNT(*) FROM achievements"),
+            "leaderboard": [{"rank": e.rank, "name": e.name, "xp": e.xp}
+                            for e in profiles.leaderboard(conn, LEADERBOARD_TOP)],
+        }
+
+
+def cmd_stats(args) -> int:
+    _require_db(args)
+    stats = collect_stats(args.db)
+    if args.json:
+        print(json.dumps({"event": "stats", "command": "stats", **stats}, ensure_ascii=False))
+        return 0
+    print(f"База: {stats['db']} ({stats['size_bytes'] / 1024:.0f} КБ, схема {stats['schema_version']})")
+    print(f"Квестов: {stats['quests']}, награда всего: {stats['reward_total']}")
+    for difficulty, count in stats["by_difficulty"].items():
+        print(f"  {difficulty}: {count}")
+    print(f"Версий: {stats['versions']} (снимков {stats['version_snapshots']}), меток на картах: {stats['locations']}")
+    print(f"Профилей: {stats['profiles']}, достижений: {stats['achievements']}")
+    for entry in stats["leaderboard"]:
+        print(f"  {entry['rank']}. {entry['name']} — {entry['xp']} XP")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    import asyncio
+    from core import server
+    service = server.RenderService(args.db, args.templates, args.jobs)
+    try:
+        asyncio.run(server.serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=database.DB_PATH, help="путь к базе (по умолчанию quests.db)")
+    common.add_argument("--json", action="store_true", help="прогресс и итог в виде JSON-строк на stdout")
+
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument("--ids", help="какие квесты из базы: '1-100' или '3,5,10-12' (по умолчанию все)")
+    selection.add_argument("--dummy", type=int, metavar="N", help="вместо базы взять N сгенерированных квестов")
+    selection.add_argument("--out-dir", default="parchments", help="папка для файлов (по умолчанию parchments)")
+    selection.add_argument("--templates", default=TEMPLATES_PATH, help="папка шаблонов")
+    selection.add_argument("--qr", choices=("svg", "png"), help="добавить QR-код квеста")
+    selection.add_argument("--jobs", type=int, default=None,
+                           help="число рабочих процессов (0 — без процессов, по умолчанию по числу CPU)")
+
+    parser = argparse.ArgumentParser(prog="python -m core", description="Квест-мастер без графического интерфейса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", parents=[common], help="сгенерировать тестовые квесты")
+    generate.add_argument("count", type=int, help="сколько квестов")
+    generate.add_argument("--start", type=int, default=1, help="номер первого квеста")
+    generate.add_argument("--output", help="записать в .jsonl/.csv ('-' — stdout) вместо базы")
+    generate.add_argument("--format", choices=bulk.FORMATS, help="формат файла, если не ясен из расширения")
+    generate.add_argument("--batch-size", type=int, default=5000, help="квестов в одной транзакции")
+    generate.set_defaults(func=cmd_generate)
+
+    render = commands.add_parser("render", parents=[common, selection], help="отрисовать шаблон в HTML")
+    render.add_argument("template", help="имя шаблона, например ancient_scroll.html")
+    render.add_argument("--archive", help="записать все документы в один .zip/.tar/.tar.gz")
+    render.add_argument("--archive-format", choices=batch_export.ARCHIVE_FORMATS)
+    render.set_defaults(func=cmd_render)
+
+    export = commands.add_parser("export", parents=[common, selection], help="экспорт в HTML, PDF или DOCX")
+    export.add_argument("--format", choices=batch_export.FORMATS, default="pdf", help="формат (по умолчанию pdf)")
+    export.add_argument("--template", default=SHIPPED_TEMPLATES[0], help="шаблон пергамента")
+    export.set_defaults(func=cmd_export)
+
+    stats = commands.add_parser("stats", parents=[common], help="статистика базы")
+    stats.set_defaults(func=cmd_stats)
+
+    serve = commands.add_parser("serve", parents=[common], help="HTTP-сервис отрисовки пергаментов")
+    serve.add_argument("--host", default="127.0.0.1", help="адрес (по умолчанию только локальный)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--templates", default=TEMPLATES_PATH, help="папка шаблонов")
+    serve.add_argument("--jobs", type=int, default=None, help="процессов для PDF/DOCX (по умолчанию по числу CPU)")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # the reader of stdout (e.g. `| head`) has gone; stop quietly
+        sys.stdout = open(os.devnull, "w")
+        return 1
+    except (RuntimeError, ValueError, OSError) as e:
+        if args.json:
+            print(json.dumps({"event": "failed", "command": args.command, "error": str(e)}, ensure_ascii=False))
+        else:
+            print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database.close_pools()
@@ -1,74 +1,323 @@
 # quest_master/core/database.py
+import os
+import queue
 import sqlite3
-from typing import Dict
-
-
-def create_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect("quests.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS quests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT UNIQUE NOT NULL,
-            difficulty TEXT CHECK(difficulty IN ('Легкий','Средний','Сложный','Эпический')),
-            reward INTEGER,
-            description TEXT,
-            deadline TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS quest_versions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quest_id INTEGER,
-            title TEXT,
-            difficulty TEXT,
-            reward INTEGER,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (quest_id) REFERENCES quests(id)
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS quest_locations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quest_id INTEGER,
-            x REAL,
-            y REAL,
-            type TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (quest_id) REFERENCES quests(id)
-        )
-        """
-    )
-    conn.commit()
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from core import migrations, search, spatial, version_store
+
+DB_PATH = "quests.db"
+
+# Pragmas applied to every pooled connection. WAL lets the GUI read while a
+# background write is in flight; NORMAL sync is durable enough under WAL.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    # creates or upgrades the schema; see core.migrations
+    migrations.migrate(conn)
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections to one database file.
+
+    The schema is bootstrapped once, when the pool is created. Connections are
+    handed out by `connection()` and returned to the pool afterwards, so a
+    save costs one transaction instead of a file open plus DDL.
+    """
+
+    def __init__(self, path: str = DB_PATH, size: int = 4):
+        self.path = path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        conn = self._open()
+        _create_schema(conn)
+        self._idle.put(conn)
+
+    def _open(self) -> sqlite3.Connection:
+        # connections move between threads (GUI / autosave worker), but are
+        # only ever used by one thread at a time thanks to the pool
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Пул соединений закрыт")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_grow = self._created < self.size
+        if can_grow:
+            return self._open()
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; commit on success, roll back on error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str = DB_PATH) -> ConnectionPool:
+    """Return the process-wide pool for `path`, creating it on first use."""
+    key = os.path.abspath(path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(path)
+                _pools[key] = pool
+    return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+@contextmanager
+def connection(path: str = DB_PATH) -> Iterator[sqlite3.Connection]:
+    """Context manager yielding a pooled connection inside one transaction."""
+    with get_pool(path).connection() as conn:
+        yield conn
+
+
+def create_connection(path: str = DB_PATH) -> sqlite3.Connection:
+    # Legacy API: a standalone connection the caller closes. The schema is
+    # ensured by the pool bootstrap, so no DDL runs here any more.
+    get_pool(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA busy_timeout=5000")
     return conn
 
 
-def save_quest(quest_id: int, data: Dict[str, str | int]):
-    conn = create_connection()
-    cursor = conn.cursor()
-    if quest_id is None:
-        cursor.execute(
-            "INSERT INTO quests (title, difficulty, reward, description, deadline) VALUES (?, ?, ?, ?, ?)",
-            (data["title"], data["difficulty"], data["reward"], data["description"], data["deadline"]),
+def save_quest(quest_id: int, data: Dict[str, str | int], path: str = DB_PATH):
+    with connection(path) as conn:
+        cursor = conn.cursor()
+        if quest_id is None:
+            cursor.execute(
+                "INSERT INTO quests (title, difficulty, reward, description, deadline) VALUES (?, ?, ?, ?, ?)",
+                (data["title"], data["difficulty"], data["reward"], data["description"], data["deadline"]),
+            )
+            quest_id = cursor.lastrowid
+        else:
+            cursor.execute(
+                "UPDATE quests SET title=?, difficulty=?, reward=?, description=?, deadline=? WHERE id=?",
+                (data["title"], data["difficulty"], data["reward"], data["description"], data["deadline"], quest_id),
+            )
+
+        version_store.append_version(conn, quest_id, data)
+    return quest_id
+
+
+QUEST_COLUMNS = ("id", "title", "difficulty", "reward", "description", "deadline", "created_at")
+_SELECT_QUESTS = "SELECT " + ", ".join(QUEST_COLUMNS) + " FROM quests"
+
+
+def get_quest(quest_id: int, path: str = DB_PATH) -> Optional[Dict[str, str | int]]:
+    with connection(path) as conn:
+        row = conn.execute(_SELECT_QUESTS + " WHERE id = ?", (quest_id,)).fetchone()
+    return dict(zip(QUEST_COLUMNS, row)) if row else None
+
+
+def get_quest_version(quest_id: int, path: str = DB_PATH) -> Tuple[Optional[Dict[str, str | int]], int]:
+    """The quest and its latest version number (0 if none was recorded), read together."""
+    with connection(path) as conn:
+        row = conn.execute(_SELECT_QUESTS + " WHERE id = ?", (quest_id,)).fetchone()
+        if row is None:
+            return None, 0
+        return dict(zip(QUEST_COLUMNS, row)), version_store.latest_version(conn, quest_id)
+
+
+def iter_quests(ids: Optional[Iterable[int]] = None, path: str = DB_PATH,
+                batch_size: int = 500) -> Iterator[Dict[str, str | int]]:
+    """Stream quests (all, an id `range`, or any id iterable) page by page.
+
+    A pooled connection is held only while one page is fetched, so a long
+    export never blocks autosave.
+    """
+    if ids is None or isinstance(ids, range) and ids.step == 1:
+        last = (ids.start - 1) if ids is not None else -1
+        stop = ids.stop if ids is not None else None
+        while True:
+            sql = _SELECT_QUESTS + " WHERE id > ?" + ("" if stop is None else " AND id < ?")
+            args = (last,) if stop is None else (last, stop)
+            with connection(path) as conn:
+                rows = conn.execute(sql + " ORDER BY id LIMIT ?", args + (batch_size,)).fetchall()
+            for row in rows:
+                yield dict(zip(QUEST_COLUMNS, row))
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+    batch: list = []
+    for quest_id in ids:
+        batch.append(quest_id)
+        if len(batch) >= batch_size:
+            yield from _fetch_quests(batch, path)
+            batch = []
+    if batch:
+        yield from _fetch_quests(batch, path)
+
+
+def _fetch_quests(ids: list, path: str) -> Iterator[Dict[str, str | int]]:
+    marks = ",".join("?" * len(ids))
+    with connection(path) as conn:
+        rows = conn.execute(_SELECT_QUESTS + f" WHERE id IN ({marks})", ids).fetchall()
+    by_id = {row[0]: dict(zip(QUEST_COLUMNS, row)) for row in rows}
+    # keep the caller's order; ids that do not exist are skipped
+    for quest_id in ids:
+        if quest_id in by_id:
+            yield by_id[quest_id]
+
+
+def list_quests(difficulty: Optional[str] = None, deadline_before: Optional[str] = None,
+                deadline_after: Optional[str] = None, limit: int = 100,
+                path: str = DB_PATH) -> list:
+    """Quests ordered by deadline, optionally filtered by difficulty and deadline range."""
+    filters, args = [], []
+    if difficulty:
+        filters.append("difficulty = ?")
+        args.append(difficulty)
+    if deadline_after:
+        filters.append("deadline >= ?")
+        args.append(deadline_after)
+    if deadline_before:
+        filters.append("deadline <= ?")
+        args.append(deadline_before)
+    where = (" WHERE " + " AND ".join(filters)) if filters else ""
+    with connection(path) as conn:
+        rows = conn.execute(_SELECT_QUESTS + where + " ORDER BY deadline LIMIT ?", args + [limit]).fetchall()
+    return [dict(zip(QUEST_COLUMNS, row)) for row in rows]
+
+
+def list_versions(quest_id: int, path: str = DB_PATH) -> list:
+    """History of a quest without rebuilding texts: version, title, created_at, tag."""
+    with connection(path) as conn:
+        rows = conn.execute(
+            "SELECT version, title, difficulty, reward, created_at, tag FROM quest_versions "
+            "WHERE quest_id = ? ORDER BY version",
+            (quest_id,),
+        ).fetchall()
+    return [dict(zip(("version", "title", "difficulty", "reward", "created_at", "tag"), row)) for row in rows]
+
+
+def get_version(quest_id: int, n: int, path: str = DB_PATH) -> Optional[Dict[str, str | int]]:
+    """Return version `n` (1-based) of a quest, rebuilt from the version store."""
+    with connection(path) as conn:
+        return version_store.get_version(conn, quest_id, n)
+
+
+def search_quests(query: str, path: str = DB_PATH, **filters) -> list:
+    """Ranked full-text search, see core.search.search for the filters."""
+    with connection(path) as conn:
+        return search.search(conn, query, **filters)
+
+
+def tag_version(quest_id: int, n: int, tag: Optional[str], path: str = DB_PATH) -> bool:
+    with connection(path) as conn:
+        return version_store.tag_version(conn, quest_id, n, tag)
+
+
+def add_location(quest_id: int, x: float, y: float, kind: str, path: str = DB_PATH) -> int:
+    with connection(path) as conn:
+        cur = conn.execute(
+            "INSERT INTO quest_locations (quest_id, x, y, type) VALUES (?, ?, ?, ?)",
+            (quest_id, float(x), float(y), kind),
         )
-        quest_id = cursor.lastrowid
-    else:
-        cursor.execute(
-            "UPDATE quests SET title=?, difficulty=?, reward=?, description=?, deadline=? WHERE id=?",
-            (data["title"], data["difficulty"], data["reward"], data["description"], data["deadline"], quest_id),
+        return cur.lastrowid
+
+
+def delete_location(location_id: int, path: str = DB_PATH) -> Optional[spatial.Location]:
+    """Delete a marker; returns the deleted row so it can be restored."""
+    with connection(path) as conn:
+        row = conn.execute(
+            "SELECT id, quest_id, x, y, type FROM quest_locations WHERE id = ?", (location_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM quest_locations WHERE id = ?", (location_id,))
+    return spatial.Location(*row)
+
+
+def restore_location(location: spatial.Location, path: str = DB_PATH) -> int:
+    """Re-insert a deleted marker under its old id (undo of a delete)."""
+    with connection(path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO quest_locations (id, quest_id, x, y, type) VALUES (?, ?, ?, ?, ?)",
+            (location.id, location.quest_id, location.x, location.y, location.type),
         )
+    return location.id
+
+
+def get_locations(quest_id: int, path: str = DB_PATH) -> list:
+    """Markers of a quest as (x, y, type) tuples."""
+    with connection(path) as conn:
+        return conn.execute(
+            "SELECT x, y, type FROM quest_locations WHERE quest_id = ?", (quest_id,)
+        ).fetchall()
+
+
+def locations_in_rect(x0: float, y0: float, x1: float, y1: float, quest_id: Optional[int] = None,
+                      limit: Optional[int] = None, path: str = DB_PATH) -> list:
+    """Markers inside a rectangle (R*Tree lookup), see core.spatial.in_bbox."""
+    with connection(path) as conn:
+        return spatial.in_bbox(conn, x0, y0, x1, y1, quest_id, limit)
+
+
+def nearest_locations(x: float, y: float, k: int = 1, quest_id: Optional[int] = None,
+                      path: str = DB_PATH) -> list:
+    with connection(path) as conn:
+        return spatial.nearest(conn, x, y, k, quest_id)
+
 
-    cursor.execute(
-        "INSERT INTO quest_versions (quest_id, title, difficulty, reward, description) VALUES (?, ?, ?, ?, ?)",
-        (quest_id, data["title"], data["difficulty"], data["reward"], data["description"]),
-    )
-    conn.commit()
-    conn.close()
-    return quest_id
\ No newline at end of file
+def location_bounds(quest_id: Optional[int] = None, path: str = DB_PATH):
+    with connection(path) as conn:
+        return spatial.bounds(conn, quest_id)
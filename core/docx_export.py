@@ -0,0 +1,179 @@
+# quest_master/core/docx_export.py
+"""Structured DOCX export of rendered parchments.
+
+The rendered HTML is parsed once, in a single streaming pass
+(`html.parser.HTMLParser` accepts chunks as they come from
+`Template.generate()`), and turned into Word headings, paragraphs with
+bold/italic runs and an embedded QR picture. New documents are cloned from
+a base template that is built once per process.
+"""
+from base64 import b64decode
+from html.parser import HTMLParser
+from io import BytesIO
+from typing import Iterable, List, Optional, Tuple
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4}
+BLOCK_TAGS = {"p", "div", "li", "blockquote"}
+SKIP_TAGS = {"head", "style", "script", "title"}
+QR_WIDTH_INCHES = 1.2
+
+_base_template: Optional[bytes] = None
+
+
+def _require_docx():
+    try:
+        # python-docx may be absent in some environments; silence static analysis warning
+        import docx  # type: ignore[reportMissingImports]
+    except Exception:
+        raise RuntimeError("python-docx не установлен — экспорт в DOCX невозможен в этой среде.")
+    return docx
+
+
+def new_document():
+    """Return a fresh Document cloned from the cached base template."""
+    global _base_template
+    docx = _require_docx()
+    if _base_template is None:
+        from docx.shared import Pt  # type: ignore[reportMissingImports]
+
+        base = docx.Document()
+        normal = base.styles["Normal"]
+        normal.font.name = "Georgia"
+        normal.font.size = Pt(11)
+        buffer = BytesIO()
+        base.save(buffer)
+        _base_template = buffer.getvalue()
+    return docx.Document(BytesIO(_base_template))
+
+
+class DocxBuilder(HTMLParser):
+    """Feed rendered HTML (whole or in chunks) and get a structured document."""
+
+    def __init__(self, document=None):
+        super().__init__(convert_charrefs=True)
+        self.document = document if document is not None else new_document()
+        self._skip = 0
+        self._bold = 0
+        self._italic = 0
+        self._heading: Optional[int] = None
+        # runs collected for the current block: (text, bold, italic)
+        self._runs: List[Tuple[str, bool, bool]] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif self._skip:
+            return
+        elif tag in HEADING_TAGS:
+            self._flush()
+            self._heading = HEADING_TAGS[tag]
+        elif tag in BLOCK_TAGS:
+            self._flush()
+        elif tag in ("strong", "b"):
+            self._bold += 1
+        elif tag in ("em", "i"):
+            self._italic += 1
+        elif tag == "br":
+            self._runs.append(("\n", False, False))
+        elif tag == "hr":
+            self._flush()
+            self.document.add_paragraph("⸻")
+        elif tag == "img":
+            self._add_image(dict(attrs).get("src") or "")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif self._skip:
+            return
+        elif tag in HEADING_TAGS or tag in BLOCK_TAGS or tag == "body":
+            self._flush()
+        elif tag in ("strong", "b"):
+            self._bold = max(0, self._bold - 1)
+        elif tag in ("em", "i"):
+            self._italic = max(0, self._italic - 1)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        text = " ".join(data.split())
+        if not text:
+            return
+        if data[:1].isspace() and self._runs:
+            text = " " + text
+        if data[-1:].isspace():
+            text += " "
+        self._runs.append((text, self._bold > 0, self._italic > 0))
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        runs, self._runs = self._runs, []
+        heading, self._heading = self._heading, None
+        if not runs or not "".join(t for t, _b, _i in runs).strip():
+            return
+        if heading is not None:
+            self.document.add_heading("".join(t for t, _b, _i in runs).strip(), level=heading)
+            return
+        paragraph = self.document.add_paragraph()
+        for i, (text, bold, italic) in enumerate(runs):
+            if i == len(runs) - 1:
+                text = text.rstrip()
+            run = paragraph.add_run(text)
+            run.bold = bold or None
+            run.italic = italic or None
+
+    def _add_image(self, src: str):
+        # only inline PNG/JPEG can be embedded (python-docx has no SVG support)
+        if not src.startswith(("data:image/png;base64,", "data:image/jpeg;base64,")):
+            return
+        try:
+            from docx.image.image import Image  # type: ignore[reportMissingImports]
+            from docx.shared import Inches  # type: ignore[reportMissingImports]
+
+            data = b64decode(src.split(",", 1)[1])
+            # parsed up front: add_picture would leave an empty paragraph behind
+            Image.from_blob(data)
+        except Exception:
+            # broken base64 or an image python-docx cannot read: skip the
+            # picture, not the whole document
+            return
+        self._flush()
+        self.document.add_picture(BytesIO(data), width=Inches(QR_WIDTH_INCHES))
+
+
+def build_document(html_chunks: Iterable[str], document=None):
+    builder = DocxBuilder(document)
+    for chunk in html_chunks:
+        builder.feed(chunk)
+    builder.close()
+    return builder.document
+
+
+def write_docx(html: str, path: str) -> None:
+    build_document([html]).save(path)
+
+
+def write_many(documents: Iterable[Iterable[str]], path: str) -> int:
+    """Write many rendered quests into one document, one section (page) each.
+
+    `documents` yields the HTML of each quest, either as a string or as a
+    chunk iterable (e.g. from `Template.generate()`). Returns the count.
+    """
+    _require_docx()
+    from docx.enum.section import WD_SECTION  # type: ignore[reportMissingImports]
+
+    document = new_document()
+    count = 0
+    for html in documents:
+        if count:
+            document.add_section(WD_SECTION.NEW_PAGE)
+        build_document([html] if isinstance(html, str) else html, document)
+        count += 1
+    document.save(path)
+    return count
@@ -1,7 +1,36 @@
 # quest_master/core/gamification.py
-from typing import List, Optional
+"""XP and achievements, persisted as a snapshot plus an event journal.
+
+`add_xp` only records an event in memory; `flush` appends the pending events
+to `gamification.jsonl` (one JSON line each, one write per batch), so the
+cost of persisting an event does not depend on the history size. Every
+SNAPSHOT_EVERY journaled events the full state is written to
+`gamification.json` atomically and the journal starts over.
+
+Crash safety: the snapshot is replaced with os.replace, events carry a
+sequence number so a journal that outlived its snapshot is not applied
+twice, and a torn last line (crash mid-append) is cut off on load.
+"""
+from typing import Dict, List, Optional
+import datetime
 import json
+import os
 from pathlib import Path
+from core.levels import LEVELS_PATH, LevelCurve, LevelInfo, load_curve
+
+DEFAULT_PATH = "gamification.json"
+JOURNAL_SUFFIX = ".jsonl"
+# journaled events between two snapshots
+SNAPSHOT_EVERY = 1000
+
+
+def journal_path(path: str | Path) -> Path:
+    return Path(path).with_suffix(JOURNAL_SUFFIX)
+
+
+def achievement_text(event: Dict) -> str:
+    return f"{event['ts']}  +{event['amount']} XP  ({event['reason']})"
+
 
 class Gamification:
     # User-requested LEVELS mapping (name -> threshold)
@@ -11,36 +40,54 @@ class Gamification:
         "Архимаг документов": 100,
     }
 
-    def __init__(self):
+    # built once from LEVELS and shared by every player without a config curve
+    _default_curve: Optional[LevelCurve] = None
+
+    def __init__(self, curve: Optional[LevelCurve] = None):
+        self.curve = curve or self.default_curve()
         self.xp: int = 0
         self.achievements: List[str] = []
+        # sequence number of the last event, persisted or not
+        self.seq: int = 0
+        # events not yet appended to the journal
+        self.pending: List[Dict] = []
+        # events in the journal since the last snapshot
+        self.journaled: int = 0
+        # set for profiles stored in quests.db (see core.profiles)
+        self.name: Optional[str] = None
+        self.profile_id: Optional[int] = None
 
     def add_xp(self, amount: int, reason: Optional[str] = None):
         """Add XP, record an achievement entry, and print a friendly message."""
-        self.xp += amount
         reason_tag = reason if reason is not None else ""
-        emoji = "🎉"
-        ts = __import__("datetime").datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = f"{ts}  +{amount} XP  ({reason_tag})"
-        try:
-            self.achievements.append(entry)
-        except Exception:
-            pass
-        print(f"{emoji} +{amount} XP ({reason_tag}). Всего: {self.xp} XP. Уровень: {self.get_level()}")
+        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.seq += 1
+        event = {"seq": self.seq, "ts": ts, "amount": amount, "reason": reason_tag}
+        self._apply(event)
+        self.pending.append(event)
+        print(f"🎉 +{amount} XP ({reason_tag}). Всего: {self.xp} XP. Уровень: {self.get_level()}")
+
+    def _apply(self, event: Dict) -> None:
+        self.xp += int(event["amount"])
+        self.achievements.append(achievement_text(event))
+        self.seq = max(self.seq, int(event["seq"]))
+
+    @classmethod
+    def default_curve(cls) -> LevelCurve:
+        if cls._default_curve is None:
+            cls._default_curve = LevelCurve.from_mapping(cls.LEVELS)
+        return cls._default_curve
 
     def get_level(self) -> str:
-        # choose the highest level whose threshold is <= xp
-        try:
-            items = sorted(self.LEVELS.items(), key=lambda kv: kv[1], reverse=True)
-            for name, threshold in items:
-                if self.xp >= threshold:
-                    return name
-        except Exception:
-            pass
-        return "Ученик"
+        # the highest level whose threshold is <= xp (bisect, no sorting)
+        return self.curve.name(self.xp)
+
+    def level_info(self) -> LevelInfo:
+        """Current level, XP to the next one and progress within the level."""
+        return self.curve.info(self.xp)
 
     def to_dict(self) -> dict:
-        return {"xp": self.xp, "achievements": self.achievements}
+        return {"xp": self.xp, "achievements": self.achievements, "seq": self.seq}
 
     @classmethod
     def from_dict(cls, data: dict) -> "Gamification":
@@ -48,24 +95,92 @@ class Gamification:
         try:
             g.xp = int(data.get("xp", 0))
             g.achievements = list(data.get("achievements", []))
+            g.seq = int(data.get("seq", 0))
         except Exception:
             pass
         return g
 
-    def save(self, path: str | Path = "gamification.json") -> None:
+    def flush(self, path: str | Path = DEFAULT_PATH, fsync: bool = True) -> int:
+        """Append pending events to the journal; returns how many were written.
+
+        Takes a snapshot instead once the journal holds SNAPSHOT_EVERY events.
+        """
+        if not self.pending:
+            return 0
+        events, count = self.pending, len(self.pending)
+        if self.journaled + count >= SNAPSHOT_EVERY:
+            self.snapshot(path, fsync)
+            return count
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        with open(journal_path(path), "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        self.pending = []
+        self.journaled += count
+        return count
+
+    def snapshot(self, path: str | Path = DEFAULT_PATH, fsync: bool = True) -> None:
+        """Write the full state atomically, then start an empty journal."""
+        p = Path(path)
+        tmp = p.with_name(p.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, p)
+        # a crash before this point leaves a journal whose events are all
+        # <= seq of the new snapshot: load() skips them
+        open(journal_path(p), "w").close()
+        self.pending = []
+        self.journaled = 0
+
+    def save(self, path: str | Path = DEFAULT_PATH) -> None:
+        """Persist pending events (batched callers use flush on a timer)."""
         try:
-            p = Path(path)
-            p.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+            self.flush(path)
         except Exception:
             pass
 
     @classmethod
-    def load(cls, path: str | Path = "gamification.json") -> "Gamification":
+    def load(cls, path: str | Path = DEFAULT_PATH) -> "Gamification":
+        """Snapshot plus the journal tail; levels from levels.json next to it, if any."""
+        g = cls()
         try:
             p = Path(path)
             if p.exists():
-                data = json.loads(p.read_text(encoding="utf-8"))
-                return cls.from_dict(data)
+                g = cls.from_dict(json.loads(p.read_text(encoding="utf-8")))
+        except Exception:
+            pass
+        try:
+            g._replay(journal_path(path))
         except Exception:
             pass
-        return cls()
\ No newline at end of file
+        try:
+            g.curve = load_curve(str(Path(path).with_name(LEVELS_PATH))) or g.curve
+        except Exception as e:
+            print(f"Не удалось загрузить уровни: {e}")
+        return g
+
+    def _replay(self, journal: Path) -> None:
+        if not journal.exists():
+            return
+        good = 0
+        with open(journal, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    if not line.endswith(b"\n"):
+                        raise ValueError("torn line")
+                except ValueError:
+                    break
+                good += len(line)
+                self.journaled += 1
+                if int(event["seq"]) > self.seq:
+                    self._apply(event)
+        if good < journal.stat().st_size:
+            # cut a half-written tail so later appends start on a clean line
+            with open(journal, "r+b") as f:
+                f.truncate(good)
@@ -0,0 +1,113 @@
+# quest_master/core/history.py
+"""Undo/redo history with a memory budget.
+
+Each edit is a `Command` that can apply (`redo`) and revert (`undo`)
+itself; commands touch only the objects they hold, so undo and redo cost
+the same whatever the size of the document. The history keeps two deques
+and a running byte estimate. When it exceeds the budget, the oldest undo
+entries are dropped. A new command may also be merged into the previous
+one (e.g. repeated erases), keeping one entry instead of many.
+"""
+from collections import deque
+from typing import Callable, Deque, Optional
+
+# estimated bytes held by undo and redo entries together
+DEFAULT_BUDGET = 32 * 1024 * 1024
+DEFAULT_LIMIT = 1000
+
+
+class Command:
+    """One reversible edit. `size` is an estimate in bytes, used for the budget."""
+
+    text = ""
+    size = 0
+
+    def redo(self) -> None:
+        raise NotImplementedError
+
+    def undo(self) -> None:
+        raise NotImplementedError
+
+    def merge(self, other: "Command") -> bool:
+        """Absorb the next command `other` (already applied); True if merged."""
+        return False
+
+    def discard(self) -> None:
+        """Called once the command leaves the history for good."""
+
+
+class History:
+    def __init__(self, budget: int = DEFAULT_BUDGET, limit: int = DEFAULT_LIMIT,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.budget = budget
+        self.limit = limit
+        self.on_change = on_change
+        self._undo: Deque[Command] = deque()
+        self._redo: Deque[Command] = deque()
+        self.memory = 0
+
+    def __len__(self) -> int:
+        return len(self._undo) + len(self._redo)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def push(self, command: Command) -> None:
+        """Apply `command` and record it; anything that could be redone is dropped."""
+        command.redo()
+        while self._redo:
+            self._drop(self._redo.pop())
+        top = self._undo[-1] if self._undo else None
+        if top is not None:
+            before = top.size
+            if top.merge(command):
+                self.memory += top.size - before
+                self._trim()
+                return
+        self._undo.append(command)
+        self.memory += command.size
+        self._trim()
+
+    def undo(self) -> Optional[Command]:
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        command.undo()
+        self._redo.append(command)
+        self._changed()
+        return command
+
+    def redo(self) -> Optional[Command]:
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        command.redo()
+        self._undo.append(command)
+        self._changed()
+        return command
+
+    def clear(self) -> None:
+        while self._undo:
+            self._drop(self._undo.pop())
+        while self._redo:
+            self._drop(self._redo.pop())
+        self._changed()
+
+    def _drop(self, command: Command) -> None:
+        self.memory -= command.size
+        command.discard()
+
+    def _trim(self) -> None:
+        # the newest entry always stays, even if it alone is over budget
+        while len(self._undo) > 1 and (self.memory > self.budget or len(self._undo) > self.limit):
+            self._drop(self._undo.popleft())
+        self._changed()
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,120 @@
+# quest_master/core/levels.py
+"""Level progression: XP thresholds precomputed once, looked up with bisect.
+
+A curve comes from config (`levels.json`), either as an explicit list::
+
+    {"levels": [{"name": "Ученик", "xp": 0}, {"name": "Мастер пергаментов", "xp": 50}]}
+
+or as a formula for long progressions, threshold(n) = base * n ** exponent::
+
+    {"curve": {"count": 1000, "base": 100, "exponent": 1.5, "name": "Уровень {n}"}}
+
+Thresholds are kept in a sorted list, so a lookup is O(log levels) and one
+curve object serves any number of players.
+"""
+import json
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LEVELS_PATH = "levels.json"
+
+
+@dataclass(frozen=True)
+class LevelInfo:
+    index: int
+    name: str
+    xp: int
+    # threshold of the current level and of the next one (None at the top)
+    floor: int
+    next_xp: Optional[int]
+    next_name: Optional[str]
+
+    @property
+    def to_next(self) -> int:
+        return 0 if self.next_xp is None else self.next_xp - self.xp
+
+    @property
+    def span(self) -> int:
+        return 0 if self.next_xp is None else self.next_xp - self.floor
+
+    @property
+    def progress(self) -> float:
+        """0..1 within the current level; 1 at the top level."""
+        return 1.0 if self.next_xp is None else (self.xp - self.floor) / self.span
+
+
+class LevelCurve:
+    def __init__(self, levels: Iterable[Tuple[str, int]]):
+        ordered = sorted(((int(xp), str(name)) for name, xp in levels), key=lambda level: level[0])
+        if not ordered:
+            raise ValueError("Нужен хотя бы один уровень")
+        thresholds = [xp for xp, _name in ordered]
+        if any(a == b for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError("Пороги уровней должны различаться")
+        self.thresholds: List[int] = thresholds
+        self.names: List[str] = [name for _xp, name in ordered]
+
+    def __len__(self) -> int:
+        return len(self.thresholds)
+
+    def index(self, xp: int) -> int:
+        # XP below the first threshold still counts as the first level
+        return max(0, bisect_right(self.thresholds, xp) - 1)
+
+    def name(self, xp: int) -> str:
+        return self.names[self.index(xp)]
+
+    def indexes(self, xps: Iterable[int]) -> List[int]:
+        """Levels of many players at once."""
+        thresholds = self.thresholds
+        return [max(0, bisect_right(thresholds, xp) - 1) for xp in xps]
+
+    def info(self, xp: int) -> LevelInfo:
+        i = self.index(xp)
+        top = i + 1 >= len(self.thresholds)
+        return LevelInfo(i, self.names[i], xp, self.thresholds[i],
+                         None if top else self.thresholds[i + 1], None if top else self.names[i + 1])
+
+    @classmethod
+    def from_mapping(cls, levels: Dict[str, int]) -> "LevelCurve":
+        return cls(levels.items())
+
+    @classmethod
+    def formula(cls, count: int, base: float = 100, exponent: float = 1.5,
+                name: str = "Уровень {n}") -> "LevelCurve":
+        levels, previous = [], -1
+        for n in range(count):
+            # rounding must not make two levels share a threshold
+            xp = max(previous + 1, round(base * n ** exponent))
+            levels.append((name.format(n=n + 1), xp))
+            previous = xp
+        return cls(levels)
+
+    @classmethod
+    def from_config(cls, data: Dict) -> "LevelCurve":
+        if "levels" in data:
+            return cls((level["name"], level["xp"]) for level in data["levels"])
+        if "curve" in data:
+            return cls.formula(**data["curve"])
+        raise ValueError("В конфигурации уровней нет ни 'levels', ни 'curve'")
+
+
+_cache: Dict[Tuple[str, int], LevelCurve] = {}
+
+
+def load_curve(path: str = LEVELS_PATH) -> Optional[LevelCurve]:
+    """Curve from a JSON config, parsed once per file version; None if there is no file."""
+    try:
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+    curve = _cache.get(key)
+    if curve is None:
+        with open(path, encoding="utf-8") as f:
+            curve = LevelCurve.from_config(json.load(f))
+        for stale in [k for k in _cache if k[0] == key[0]]:
+            del _cache[stale]
+        _cache[key] = curve
+    return curve
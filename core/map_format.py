@@ -0,0 +1,309 @@
+# quest_master/core/map_format.py
+"""Compact binary format for map scenes (`.qmap`).
+
+A map is stored as vectors, not pixels: brush strokes share one flat float32
+array of points, markers and labels are fixed-size typed records, and label
+strings live in a UTF-8 blob at the end. Every record is 4-byte aligned, so a
+memory-mapped file can be read in place: stroke points are `memoryview`
+slices of the mapping and nothing is parsed until it is used.
+
+Layout (little-endian)::
+
+    header   magic, version, flags, scene rect, background, counts
+    strokes  first point, point count, RGBA, pen width
+    markers  x, y, RGBA, radius
+    labels   x, y, font size, RGBA, text offset/length, font offset/length
+    points   float32 x0, y0, x1, y1, ...
+    text     UTF-8
+
+With `compress=True` the points block is byte-planed (all first bytes of
+the floats, then all second bytes, ...) and deflated, preceded by its
+compressed length. Neighbouring coordinates share their high bytes, so this
+shrinks stroke data about 3-4x at C speed, but points are then decompressed
+on load instead of being read in place. Quest maps under `maps/` are kept
+uncompressed and opened in place (`open_quest_map`); maps the user saves
+elsewhere are compressed.
+
+Colours are 32-bit ARGB integers (`QColor.rgba()`), so this module needs
+no Qt. Coordinates are float32: exact for the whole and half pixels a mouse
+produces on any realistic map size.
+"""
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"QMAP"
+VERSION = 1
+EXTENSION = ".qmap"
+MAPS_DIR = "maps"
+
+_HEADER = struct.Struct("<4sHH4fIIIII")
+_STROKE = struct.Struct("<IIIf")
+_MARKER = struct.Struct("<ffIf")
+_LABEL = struct.Struct("<fffIIIII")
+_NATIVE = sys.byteorder == "little"
+_LENGTH = struct.Struct("<I")
+FLAG_DEFLATE = 1
+
+
+@dataclass
+class Stroke:
+    # flat x0, y0, x1, y1, ... (array('f'), list or memoryview of floats)
+    points: Sequence[float]
+    color: int = 0xFFA52A2A
+    width: float = 3.0
+
+    def xy(self) -> Iterator[Tuple[float, float]]:
+        points = self.points
+        for i in range(0, len(points) - 1, 2):
+            yield points[i], points[i + 1]
+
+
+@dataclass
+class Marker:
+    x: float
+    y: float
+    color: int
+    radius: float = 5.0
+
+
+@dataclass
+class Label:
+    x: float
+    y: float
+    text: str
+    color: int = 0xFF000000
+    font_size: float = 10.0
+    font_family: str = ""
+
+
+@dataclass
+class MapScene:
+    rect: Tuple[float, float, float, float] = (0.0, 0.0, 800.0, 600.0)
+    background: int = 0xFFF4E4BC
+    strokes: List[Stroke] = field(default_factory=list)
+    markers: List[Marker] = field(default_factory=list)
+    labels: List[Label] = field(default_factory=list)
+
+    @property
+    def point_count(self) -> int:
+        return sum(len(s.points) // 2 for s in self.strokes)
+
+
+def quest_map_path(quest_id: int, directory: str = MAPS_DIR) -> str:
+    return os.path.join(directory, f"quest_{quest_id}{EXTENSION}")
+
+
+def _float_array(points: Sequence[float]) -> array:
+    if isinstance(points, array) and points.typecode == "f":
+        return points
+    if isinstance(points, memoryview):
+        return array("f", points.tolist())
+    return array("f", points)
+
+
+def _planes(data: bytes) -> bytes:
+    return b"".join(data[i::4] for i in range(4))
+
+
+def _unplane(data: bytes) -> bytes:
+    out = bytearray(len(data))
+    size = len(data) // 4
+    for i in range(4):
+        out[i::4] = data[i * size:(i + 1) * size]
+    return bytes(out)
+
+
+def dumps(scene: MapScene, compress: bool = False) -> bytes:
+    points = array("f")
+    strokes = []
+    for stroke in scene.strokes:
+        data = _float_array(stroke.points)
+        count = len(data) // 2
+        strokes.append(_STROKE.pack(len(points) // 2, count, stroke.color & 0xFFFFFFFF, stroke.width))
+        points.extend(data[:count * 2])
+    text = bytearray()
+    labels = []
+    for label in scene.labels:
+        body, family = label.text.encode("utf-8"), label.font_family.encode("utf-8")
+        labels.append(_LABEL.pack(label.x, label.y, label.font_size, label.color & 0xFFFFFFFF,
+                                  len(text), len(body), len(text) + len(body), len(family)))
+        text += body + family
+    if not _NATIVE:
+        points.byteswap()
+    header = _HEADER.pack(MAGIC, VERSION, FLAG_DEFLATE if compress else 0, *scene.rect,
+                          scene.background & 0xFFFFFFFF,
+                          len(scene.strokes), len(points) // 2, len(scene.markers), len(scene.labels))
+    markers = [_MARKER.pack(m.x, m.y, m.color & 0xFFFFFFFF, m.radius) for m in scene.markers]
+    body = points.tobytes()
+    if compress:
+        body = zlib.compress(_planes(body), 6)
+        body = _LENGTH.pack(len(body)) + body
+    return b"".join([header, *strokes, *markers, *labels, body, bytes(text)])
+
+
+def loads(data, copy: bool = True) -> MapScene:
+    """Parse a map from bytes or any buffer.
+
+    With `copy=False` stroke points are float views into `data`, which must
+    then stay alive (and, for an mmap, open) while they are used.
+    """
+    view = memoryview(data)
+    if len(view) < _HEADER.size:
+        raise ValueError("Файл карты повреждён: слишком короткий")
+    magic, version, flags, x, y, w, h, background, n_strokes, n_points, n_markers, n_labels = \
+        _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Это не файл карты (.qmap)")
+    if version > VERSION:
+        raise ValueError(f"Файл карты создан более новой версией программы (формат {version})")
+    offset = _HEADER.size
+    records = offset + n_strokes * _STROKE.size + n_markers * _MARKER.size + n_labels * _LABEL.size
+    if flags & FLAG_DEFLATE and len(view) >= records + _LENGTH.size:
+        packed = _LENGTH.unpack_from(view, records)[0]
+        points_end = records + _LENGTH.size + packed
+    else:
+        points_end = records + n_points * 8
+    if len(view) < points_end:
+        raise ValueError("Файл карты повреждён: данные обрезаны")
+    stroke_records = list(_STROKE.iter_unpack(view[offset:offset + n_strokes * _STROKE.size]))
+    offset += n_strokes * _STROKE.size
+    markers = [Marker(*r) for r in _MARKER.iter_unpack(view[offset:offset + n_markers * _MARKER.size])]
+    offset += n_markers * _MARKER.size
+    label_records = list(_LABEL.iter_unpack(view[offset:offset + n_labels * _LABEL.size]))
+    offset += n_labels * _LABEL.size
+    text = view[points_end:]
+    if flags & FLAG_DEFLATE:
+        try:
+            points_bytes = memoryview(_unplane(zlib.decompress(view[offset + _LENGTH.size:points_end])))
+        except zlib.error as e:
+            raise ValueError(f"Файл карты повреждён: {e}")
+        if len(points_bytes) != n_points * 8:
+            raise ValueError("Файл карты повреждён: не хватает точек")
+    else:
+        points_bytes = view[offset:points_end]
+    if not _NATIVE:
+        copy = True
+    strokes = []
+    for first, count, color, width in stroke_records:
+        chunk = points_bytes[first * 8:(first + count) * 8]
+        if copy:
+            points = array("f")
+            points.frombytes(chunk)
+            if not _NATIVE:
+                points.byteswap()
+        else:
+            points = chunk.cast("f")
+        strokes.append(Stroke(points, color, width))
+    labels = [
+        Label(lx, ly, bytes(text[t_off:t_off + t_len]).decode("utf-8"), color, size,
+              bytes(text[f_off:f_off + f_len]).decode("utf-8"))
+        for lx, ly, size, color, t_off, t_len, f_off, f_len in label_records
+    ]
+    return MapScene((x, y, w, h), background, strokes, markers, labels)
+
+
+def write_map(scene: MapScene, path: str, compress: bool = True) -> int:
+    """Write atomically (temp file + rename); returns the size in bytes."""
+    data = dumps(scene, compress)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+class MapReader:
+    """Memory-mapped `.qmap`; stroke points are read from the page cache.
+
+    Only uncompressed files (`write_map(..., compress=False)`) are read in
+    place; compressed ones are inflated into memory when opened.
+
+    Use as a context manager and drop the scene before it closes::
+
+        with MapReader(path) as scene:
+            for stroke in scene.strokes: ...
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file: nothing to map
+            self._file.close()
+            raise ValueError("Файл карты повреждён: пустой файл")
+        self.scene = loads(self._map, copy=False)
+
+    def close(self) -> None:
+        self.scene = None
+        try:
+            self._map.close()
+        except BufferError:
+            # a caller still holds point views; the mapping goes with them
+            pass
+        self._file.close()
+
+    def __enter__(self) -> MapScene:
+        return self.scene
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_map(path: str, use_mmap: bool = True) -> MapScene:
+    """Load a whole map into memory (points copied out of the mapping)."""
+    if not use_mmap:
+        with open(path, "rb") as f:
+            return loads(f.read())
+    reader = MapReader(path)
+    try:
+        scene = reader.scene
+        for stroke in scene.strokes:
+            points = array("f")
+            points.frombytes(stroke.points.cast("B"))
+            stroke.points = points
+        return scene
+    finally:
+        reader.close()
+
+
+def quest_map_ids(directory: str = MAPS_DIR) -> List[int]:
+    """Ids of the quests that have a saved map in `directory`, sorted."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    ids = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == EXTENSION and stem.startswith("quest_") and stem[6:].isdigit():
+            ids.append(int(stem[6:]))
+    return sorted(ids)
+
+
+def load_quest_map(quest_id: int, directory: str = MAPS_DIR) -> Optional[MapScene]:
+    """The saved map of a quest as an independent copy; None if there is none."""
+    path = quest_map_path(quest_id, directory)
+    return read_map(path) if os.path.exists(path) else None
+
+
+def open_quest_map(quest_id: int, directory: str = MAPS_DIR) -> Optional[MapReader]:
+    """The saved map of a quest, memory-mapped; None if there is none."""
+    path = quest_map_path(quest_id, directory)
+    return MapReader(path) if os.path.exists(path) else None
+
+
+def save_quest_map(quest_id: int, scene: MapScene, directory: str = MAPS_DIR, compress: bool = False) -> str:
+    # uncompressed by default, so open_quest_map reads the points in place
+    path = quest_map_path(quest_id, directory)
+    write_map(scene, path, compress)
+    return path
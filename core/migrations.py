@@ -0,0 +1,132 @@
+# quest_master/core/migrations.py
+"""Schema migrations for quests.db, tracked with `PRAGMA user_version`.
+
+Each migration is a function applied once, in order; `user_version` records
+the last one that ran. Migrations are written to be idempotent (IF NOT
+EXISTS, column checks), so databases created before this framework existed
+(user_version 0) upgrade cleanly through every step.
+
+To change the schema, append a new `(version, description, function)` entry
+to MIGRATIONS; never edit one that has shipped.
+"""
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from core import profiles, search, spatial, version_store
+
+
+def _base_tables(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS quests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT UNIQUE NOT NULL,
+            difficulty TEXT CHECK(difficulty IN ('Легкий','Средний','Сложный','Эпический')),
+            reward INTEGER,
+            description TEXT,
+            deadline TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS quest_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quest_id INTEGER,
+            title TEXT,
+            difficulty TEXT,
+            reward INTEGER,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (quest_id) REFERENCES quests(id)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS quest_locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quest_id INTEGER,
+            x REAL,
+            y REAL,
+            type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (quest_id) REFERENCES quests(id)
+        )
+        """
+    )
+
+
+def _versions_as_deltas(conn: sqlite3.Connection) -> None:
+    # adds version/kind/payload/tag and converts full-text rows in place
+    version_store.ensure_schema(conn)
+
+
+def _full_text_index(conn: sqlite3.Connection) -> None:
+    search.ensure_schema(conn)
+
+
+def _secondary_indexes(conn: sqlite3.Connection) -> None:
+    # history of a quest: version chain walks and "latest version" lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quest_versions_quest_version ON quest_versions(quest_id, version)")
+    # nearest snapshot at or below a version (partial: snapshots only)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_quest_versions_snapshots ON quest_versions(quest_id, version) "
+        f"WHERE kind = {version_store.KIND_SNAPSHOT}"
+    )
+    # locations of a quest, answered from the index alone
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quest_locations_quest ON quest_locations(quest_id, x, y, type)")
+    # quest lists filtered by difficulty and/or sorted by deadline
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quests_difficulty_deadline ON quests(difficulty, deadline)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quests_deadline ON quests(deadline)")
+    conn.execute("ANALYZE")
+
+
+def _spatial_index(conn: sqlite3.Connection) -> None:
+    spatial.ensure_schema(conn)
+
+
+def _profiles(conn: sqlite3.Connection) -> None:
+    profiles.ensure_schema(conn)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base tables", _base_tables),
+    (2, "delta-encoded quest_versions", _versions_as_deltas),
+    (3, "FTS5 index over quests", _full_text_index),
+    (4, "secondary indexes for hot queries", _secondary_indexes),
+    (5, "R*Tree index over quest_locations", _spatial_index),
+    (6, "player profiles and achievements", _profiles),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: latest); returns those applied."""
+    target = LATEST if target is None else target
+    applied = []
+    version = current_version(conn)
+    if version > LATEST:
+        raise RuntimeError(
+            f"База создана более новой версией программы (схема {version}, поддерживается {LATEST})")
+    for number, description, step in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        try:
+            step(conn)
+            conn.commit()
+            # user_version cannot be bound as a parameter
+            conn.execute(f"PRAGMA user_version = {int(number)}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise RuntimeError(f"Ошибка миграции {number} ({description}): {e}")
+        applied.append(number)
+    return applied
@@ -0,0 +1,264 @@
+# quest_master/core/profiles.py
+"""Player profiles in quests.db: per-user XP, achievement events, leaderboard.
+
+`achievements` is the append-only event log (one row per XP award) and
+`profiles.xp` its running total, updated in the same transaction, so a
+profile loads from one row plus its most recent events instead of the whole
+history. The leaderboard walks `idx_profiles_xp` and stops after one page.
+
+`ProfileStore` caches profile objects and leaderboard pages; every write
+that goes through the store invalidates what it changed.
+"""
+import getpass
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.gamification import Gamification, achievement_text
+from core.levels import LEVELS_PATH, load_curve
+
+# achievements loaded with a profile (the full history stays in the DB)
+RECENT_ACHIEVEMENTS = 200
+LEADERBOARD_SIZE = 10
+DEFAULT_PROFILE = "default"
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        xp INTEGER NOT NULL DEFAULT 0,
+        seq INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        profile_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        reason TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (profile_id) REFERENCES profiles(id)
+    )
+    """,
+    # files already imported into a profile, so a restart does not import twice
+    """
+    CREATE TABLE IF NOT EXISTS profile_imports (
+        source TEXT PRIMARY KEY,
+        profile_id INTEGER NOT NULL,
+        imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # leaderboard order; the id breaks ties so pages are stable
+    "CREATE INDEX IF NOT EXISTS idx_profiles_xp ON profiles(xp DESC, id)",
+    # recent events of one profile
+    "CREATE INDEX IF NOT EXISTS idx_achievements_profile ON achievements(profile_id, id)",
+)
+
+# the entry format written by Gamification.add_xp before events were stored
+_LEGACY_ENTRY = re.compile(r"^(?P<ts>.*?)\s+\+(?P<amount>-?\d+) XP\s+\((?P<reason>.*)\)$")
+
+
+@dataclass
+class LeaderboardEntry:
+    rank: int
+    name: str
+    xp: int
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    for ddl in _SCHEMA:
+        conn.execute(ddl)
+    conn.commit()
+
+
+def profile_id(conn: sqlite3.Connection, name: str, create: bool = True) -> Optional[int]:
+    row = conn.execute("SELECT id FROM profiles WHERE name = ?", (name,)).fetchone()
+    if row is not None:
+        return row[0]
+    if not create:
+        return None
+    return conn.execute("INSERT INTO profiles (name) VALUES (?)", (name,)).lastrowid
+
+
+def load_profile(conn: sqlite3.Connection, name: str, recent: int = RECENT_ACHIEVEMENTS,
+                 create: bool = True) -> Optional[Gamification]:
+    """Profile row plus its `recent` latest achievements, oldest first."""
+    pid = profile_id(conn, name, create)
+    if pid is None:
+        return None
+    xp, seq = conn.execute("SELECT xp, seq FROM profiles WHERE id = ?", (pid,)).fetchone()
+    rows = conn.execute(
+        "SELECT amount, reason, created_at FROM achievements WHERE profile_id = ? ORDER BY id DESC LIMIT ?",
+        (pid, recent),
+    ).fetchall()
+    g = Gamification()
+    g.name, g.profile_id, g.xp, g.seq = name, pid, xp, seq
+    g.achievements = [achievement_text({"ts": ts, "amount": amount, "reason": reason or ""})
+                      for amount, reason, ts in reversed(rows)]
+    return g
+
+
+def record_events(conn: sqlite3.Connection, pid: int, events: List[Dict]) -> int:
+    """Append XP events and add them to the profile total, in one transaction."""
+    if not events:
+        return 0
+    conn.executemany(
+        "INSERT INTO achievements (profile_id, amount, reason, created_at) VALUES (?, ?, ?, ?)",
+        [(pid, int(e["amount"]), e.get("reason") or "", e["ts"]) for e in events],
+    )
+    conn.execute(
+        "UPDATE profiles SET xp = xp + ?, seq = MAX(seq, ?), updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (sum(int(e["amount"]) for e in events), max(int(e.get("seq", 0)) for e in events), pid),
+    )
+    return len(events)
+
+
+def leaderboard(conn: sqlite3.Connection, limit: int = LEADERBOARD_SIZE, offset: int = 0) -> List[LeaderboardEntry]:
+    rows = conn.execute(
+        "SELECT name, xp FROM profiles ORDER BY xp DESC, id LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+    # equal XP shares a rank (1, 2, 2, 4)
+    entries: List[LeaderboardEntry] = []
+    for i, (name, xp) in enumerate(rows):
+        if entries and entries[-1].xp == xp:
+            position = entries[-1].rank
+        elif entries or offset == 0:
+            position = offset + i + 1
+        else:
+            # a later page may start in the middle of a tie
+            position = rank_of_xp(conn, xp)
+        entries.append(LeaderboardEntry(position, name, xp))
+    return entries
+
+
+def rank_of_xp(conn: sqlite3.Connection, xp: int) -> int:
+    # a range count over idx_profiles_xp
+    return conn.execute("SELECT COUNT(*) FROM profiles WHERE xp > ?", (xp,)).fetchone()[0] + 1
+
+
+def rank(conn: sqlite3.Connection, name: str) -> Optional[int]:
+    row = conn.execute("SELECT xp FROM profiles WHERE name = ?", (name,)).fetchone()
+    return None if row is None else rank_of_xp(conn, row[0])
+
+
+def legacy_events(g: Gamification) -> List[Dict]:
+    """Achievement strings of a gamification.json state as events."""
+    events = []
+    for seq, entry in enumerate(g.achievements, start=1):
+        match = _LEGACY_ENTRY.match(entry)
+        if match:
+            events.append({"seq": seq, "ts": match["ts"], "amount": int(match["amount"]), "reason": match["reason"]})
+        else:
+            events.append({"seq": seq, "ts": "", "amount": 0, "reason": entry})
+    return events
+
+
+def import_json(conn: sqlite3.Connection, path: str, name: str) -> Optional[int]:
+    """Move a gamification.json (+ journal) into profile `name`, once per file.
+
+    The file's XP total wins over the sum of its entries (early versions
+    saved XP without entries). Returns the profile id, None if skipped.
+    """
+    source = os.path.abspath(path)
+    if not os.path.exists(path) or conn.execute(
+            "SELECT 1 FROM profile_imports WHERE source = ?", (source,)).fetchone():
+        return None
+    g = Gamification.load(path)
+    pid = profile_id(conn, name)
+    events = legacy_events(g)
+    record_events(conn, pid, events)
+    conn.execute("UPDATE profiles SET xp = xp + ? WHERE id = ?", (g.xp - sum(e["amount"] for e in events), pid))
+    conn.execute("INSERT INTO profile_imports (source, profile_id) VALUES (?, ?)", (source, pid))
+    return pid
+
+
+def current_user() -> str:
+    try:
+        return getpass.getuser() or DEFAULT_PROFILE
+    except Exception:
+        return DEFAULT_PROFILE
+
+
+class ProfileStore:
+    """Profiles of one database with cached objects and leaderboard pages."""
+
+    def __init__(self, path: Optional[str] = None, levels_path: str = LEVELS_PATH):
+        from core import database
+        self.path = path or database.DB_PATH
+        self.levels_path = levels_path
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Gamification] = {}
+        self._boards: Dict[Tuple[int, int], List[LeaderboardEntry]] = {}
+
+    def _connection(self):
+        from core import database
+        return database.connection(self.path)
+
+    def _invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            self._boards.clear()
+            if name is not None:
+                self._profiles.pop(name, None)
+
+    def profile(self, name: Optional[str] = None) -> Gamification:
+        """Cached profile object, created on first use."""
+        name = name or current_user()
+        with self._lock:
+            cached = self._profiles.get(name)
+        if cached is not None:
+            return cached
+        with self._connection() as conn:
+            g = load_profile(conn, name)
+        g.curve = load_curve(self.levels_path) or g.curve
+        with self._lock:
+            return self._profiles.setdefault(name, g)
+
+    def save(self, g: Gamification) -> int:
+        """Write the pending events of a profile object from `profile()`."""
+        events = g.pending
+        if not events:
+            return 0
+        with self._connection() as conn:
+            written = record_events(conn, g.profile_id, events)
+        g.pending = []
+        # the object itself is current; only the pages are stale
+        self._invalidate()
+        return written
+
+    def award(self, name: str, amount: int, reason: Optional[str] = None) -> None:
+        """Give XP to a profile that may not be loaded (not batched)."""
+        g = self.profile(name)
+        g.add_xp(amount, reason)
+        self.save(g)
+
+    def names(self) -> List[str]:
+        with self._connection() as conn:
+            return [row[0] for row in conn.execute("SELECT name FROM profiles ORDER BY name")]
+
+    def leaderboard(self, limit: int = LEADERBOARD_SIZE, offset: int = 0) -> List[LeaderboardEntry]:
+        key = (limit, offset)
+        with self._lock:
+            page = self._boards.get(key)
+        if page is None:
+            with self._connection() as conn:
+                page = leaderboard(conn, limit, offset)
+            with self._lock:
+                self._boards[key] = page
+        return page
+
+    def rank(self, name: str) -> Optional[int]:
+        with self._connection() as conn:
+            return rank(conn, name)
+
+    def import_json(self, path: str = "gamification.json", name: Optional[str] = None) -> Optional[int]:
+        name = name or current_user()
+        with self._connection() as conn:
+            pid = import_json(conn, path, name)
+        if pid is not None:
+            self._invalidate(name)
+        return pid
@@ -0,0 +1,251 @@
+# quest_master/core/qr_cache.py
+"""Content-addressed cache of rendered QR codes.
+
+A QR code depends only on its URL and render options, so the rendered bytes
+are stored under a SHA-256 of both: first in an in-memory LRU, then in a small
+on-disk store shared by every process of the user (GUI, batch export workers,
+render service). The disk store lives in a private (0700) per-user cache
+directory, every entry carries a SHA-256 of its bytes and is checked before
+use, and the oldest entries are evicted once the store outgrows its limit.
+The SVG format is produced by qrcode's pure-Python SVG factory and skips
+Pillow.
+"""
+import hashlib
+import os
+import stat
+import tempfile
+import threading
+from base64 import b64encode
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+
+QUEST_URL = "http://example.com/quest/{id}"
+FORMATS = ("png", "svg")
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+DEFAULT_DISK_LIMIT = 32 * 1024 * 1024
+_MAGIC = {"png": (b"\x89PNG\r\n\x1a\n",), "svg": (b"<?xml", b"<svg")}
+_DIGEST_SIZE = hashlib.sha256().digest_size
+# after an eviction the store is trimmed to this fraction of the limit
+_PRUNE_TO = 0.8
+
+
+def _user_cache_dir() -> str:
+    base = (os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "quest_master", "qr")
+
+
+DEFAULT_DIR = _user_cache_dir()
+
+
+def quest_url(quest_id) -> str:
+    return QUEST_URL.format(id=quest_id)
+
+
+def render_qr(url: str, fmt: str = "png", box_size: int = 10, border: int = 4) -> bytes:
+    """Render a QR code without any caching."""
+    import qrcode
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат QR '{fmt}', ожидается один из {FORMATS}")
+    factory = None
+    if fmt == "svg":
+        import qrcode.image.svg
+        factory = qrcode.image.svg.SvgPathImage
+    qr = qrcode.QRCode(box_size=box_size, border=border, image_factory=factory)
+    qr.add_data(url)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    if fmt == "svg":
+        qr.make_image().save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class QRCache:
+    def __init__(self, capacity: int = 512, directory: Optional[str] = DEFAULT_DIR,
+                 disk_limit: int = DEFAULT_DISK_LIMIT):
+        self.capacity = capacity
+        self.directory = directory
+        self.disk_limit = disk_limit
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        # None until the directory has been created and checked
+        self._disk_ok: Optional[bool] = None
+        self._disk_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url: str, fmt: str, box_size: int, border: int) -> str:
+        return hashlib.sha256(f"{fmt}|{box_size}|{border}|{url}".encode("utf-8")).hexdigest()
+
+    def get(self, url: str, fmt: str = "png", box_size: int = 10, border: int = 4) -> bytes:
+        key = self.key(url, fmt, box_size, border)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        data = self._read_disk(key, fmt)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if data is None:
+            data = render_qr(url, fmt, box_size, border)
+            self._write_disk(key, fmt, data)
+        self._remember(key, data)
+        return data
+
+    def get_many(self, urls: Iterable[str], fmt: str = "png", box_size: int = 10, border: int = 4) -> Dict[str, bytes]:
+        """Batch lookup: each distinct URL is rendered at most once."""
+        result: Dict[str, bytes] = {}
+        for url in urls:
+            if url not in result:
+                result[url] = self.get(url, fmt, box_size, border)
+        return result
+
+    def data_uri(self, url: str, fmt: str = "svg", **options) -> str:
+        return f"data:{MIME_TYPES[fmt]};base64,{b64encode(self.get(url, fmt, **options)).decode('ascii')}"
+
+    def img_tag(self, url: str, fmt: str = "svg", **options) -> str:
+        return f'<img src="{self.data_uri(url, fmt, **options)}" alt="QR" />'
+
+    def clear(self, disk: bool = False) -> None:
+        with self._lock:
+            self._memory.clear()
+        if disk and self._disk_ready():
+            for name in os.listdir(self.directory):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            with self._lock:
+                self._disk_bytes = 0
+
+    def _remember(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    def _disk_ready(self) -> bool:
+        """Create the directory (0700) once; disk caching is off if it is not private."""
+        if self._disk_ok is None:
+            self._disk_ok = bool(self.directory) and _private_dir(self.directory)
+        return self._disk_ok
+
+    def _disk_path(self, key: str, fmt: str) -> Optional[str]:
+        if not self._disk_ready():
+            return None
+        return os.path.join(self.directory, f"{key}.{fmt}")
+
+    def _read_disk(self, key: str, fmt: str) -> Optional[bytes]:
+        path = self._disk_path(key, fmt)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                stored = f.read()
+        except OSError:
+            return None
+        digest, data = stored[:_DIGEST_SIZE], stored[_DIGEST_SIZE:]
+        if hashlib.sha256(data).digest() != digest or not data.startswith(_MAGIC[fmt]):
+            # truncated or foreign file: drop it and render again
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            # keep recently used entries out of the eviction order
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _write_disk(self, key: str, fmt: str, data: bytes) -> None:
+        path = self._disk_path(key, fmt)
+        if path is None:
+            return
+        try:
+            # write-then-rename so concurrent export workers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(hashlib.sha256(data).digest())
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += _DIGEST_SIZE + len(data)
+            over = self._disk_bytes is None or self._disk_bytes > self.disk_limit
+        if over:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Measure the store and, above the limit, evict least recently used entries."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        info = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        if total > self.disk_limit:
+            entries.sort()
+            for _mtime, size, path in entries:
+                if total <= self.disk_limit * _PRUNE_TO:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+def _private_dir(directory: str) -> bool:
+    """Make sure `directory` exists, belongs to this user and is closed to others."""
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            return False
+        if info.st_mode & 0o077:
+            try:
+                os.chmod(directory, 0o700)
+            except OSError:
+                return False
+    return True
+
+
+_shared: Optional[QRCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> QRCache:
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = QRCache()
+    return _shared
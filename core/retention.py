@@ -0,0 +1,284 @@
+# quest_master/core/retention.py
+"""Retention and compaction for `quest_versions`.
+
+A policy keeps the newest `keep_last` versions of every quest and every
+tagged version. Older versions are thinned according to `tiers`: a version
+older than `age` seconds survives only if it is the newest one in its
+`bucket`-second window. Compaction works one quest per short transaction:
+the history is decoded and re-encoded before the write lock is taken, so
+autosaves are never blocked for long, however long the history is.
+
+Offline use:
+    python -m core.retention --db quests.db --keep-last 20 --vacuum
+In the background while the GUI runs (opt-in):
+    python main.py --compact-versions 20
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from core import database, version_store
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+@dataclass
+class RetentionPolicy:
+    keep_last: int = 50
+    # (minimum age in seconds, bucket size in seconds), checked oldest tier first
+    tiers: Sequence[Tuple[int, int]] = ((HOUR, MINUTE), (DAY, HOUR), (30 * DAY, DAY))
+    keep_tagged: bool = True
+
+
+@dataclass
+class CompactionReport:
+    quests: int = 0
+    rows_deleted: int = 0
+    # size of the deleted payloads, before any VACUUM
+    payload_bytes: int = 0
+    # file bytes returned to the OS (VACUUM) or to the free list
+    bytes_reclaimed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def merge(self, other: "CompactionReport") -> None:
+        self.quests += other.quests
+        self.rows_deleted += other.rows_deleted
+        self.payload_bytes += other.payload_bytes
+        self.bytes_reclaimed += other.bytes_reclaimed
+        self.errors.extend(other.errors)
+
+    def __str__(self) -> str:
+        return (f"Квестов: {self.quests}, удалено версий: {self.rows_deleted}, "
+                f"данных: {self.payload_bytes} Б, освобождено: {self.bytes_reclaimed} Б")
+
+
+def _parse_ts(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def select_survivors(versions: Sequence[Tuple[int, Optional[float], Optional[str]]],
+                     policy: RetentionPolicy, now: float) -> Set[int]:
+    """Return the version numbers to keep from (version, created_ts, tag), oldest first."""
+    keep: Set[int] = set()
+    if policy.keep_last > 0:
+        keep.update(v for v, _ts, _tag in versions[-policy.keep_last:])
+    if policy.keep_tagged:
+        keep.update(v for v, _ts, tag in versions if tag)
+    tiers = sorted(policy.tiers, reverse=True)
+    seen_buckets: Set[Tuple[int, int]] = set()
+    # newest first, so the newest version of each bucket is the one kept
+    for version, ts, _tag in reversed(versions):
+        if version in keep:
+            continue
+        if ts is None:
+            keep.add(version)
+            continue
+        age = now - ts
+        tier = next(((a, b) for a, b in tiers if age >= a), None)
+        if tier is None:
+            keep.add(version)
+            continue
+        bucket = (tier[0], int(ts // tier[1]))
+        if bucket not in seen_buckets:
+            seen_buckets.add(bucket)
+            keep.add(version)
+    return keep
+
+
+# a quest whose history keeps changing under the compactor is left for the next run
+ATTEMPTS = 3
+
+
+def _read_chain(conn: sqlite3.Connection, quest_id: Optional[int]) -> list:
+    """(row id, version, kind, payload, text, created_at, tag) of every version, oldest first."""
+    rows = conn.execute(
+        "SELECT id, version, kind, payload, created_at, tag FROM quest_versions "
+        "WHERE quest_id IS ? AND version IS NOT NULL ORDER BY version",
+        (quest_id,),
+    ).fetchall()
+    chain, text = [], None
+    for row_id, version, kind, payload, created_at, tag in rows:
+        text = version_store.decode(kind, payload, text)
+        chain.append((row_id, version, kind, payload, text, created_at, tag))
+    return chain
+
+
+def _chain_key(conn: sqlite3.Connection, quest_id: Optional[int]) -> list:
+    # cheap (no decoding): what must not change between planning and writing
+    return conn.execute(
+        "SELECT id, version, tag FROM quest_versions WHERE quest_id IS ? AND version IS NOT NULL ORDER BY version",
+        (quest_id,),
+    ).fetchall()
+
+
+def _plan(chain: list, policy: RetentionPolicy, now: float) -> Tuple[List[int], int, list]:
+    """(row ids to delete, their payload bytes, (kind, payload, id) updates of the survivors)."""
+    keep = select_survivors([(v, _parse_ts(ts), tag) for _id, v, _k, _p, _t, ts, tag in chain], policy, now)
+    doomed = [row[0] for row in chain if row[1] not in keep]
+    if not doomed:
+        return [], 0, []
+    payload_bytes = sum(len(row[3]) for row in chain if row[1] not in keep)
+    survivors = [row for row in chain if row[1] in keep]
+    # deltas referred to deleted rows: re-encode the surviving chain, write only what changed
+    encoded = version_store.encode_chain([(row[0], row[4]) for row in survivors])
+    updates = [(kind, payload, row_id) for (kind, payload, row_id), row in zip(encoded, survivors)
+               if (kind, payload) != (row[2], bytes(row[3]))]
+    return doomed, payload_bytes, updates
+
+
+def compact_quest(conn: sqlite3.Connection, quest_id: Optional[int], policy: RetentionPolicy,
+                  now: Optional[float] = None, dry_run: bool = False) -> CompactionReport:
+    """Thin one quest's history.
+
+    Decoding, survivor selection and re-encoding happen outside any write
+    lock; the write transaction only checks that the history is unchanged
+    and applies the deletes and updates. If an autosave got in between,
+    the plan is made again.
+    """
+    report = CompactionReport(quests=1)
+    now = datetime.now(timezone.utc).timestamp() if now is None else now
+    for _attempt in range(ATTEMPTS):
+        chain = _read_chain(conn, quest_id)
+        doomed, payload_bytes, updates = _plan(chain, policy, now)
+        report.rows_deleted, report.payload_bytes = len(doomed), payload_bytes
+        if dry_run or not doomed:
+            return report
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _chain_key(conn, quest_id) != [(row[0], row[1], row[6]) for row in chain]:
+                conn.execute("ROLLBACK")
+                continue
+            conn.executemany("DELETE FROM quest_versions WHERE id = ?", [(row_id,) for row_id in doomed])
+            conn.executemany("UPDATE quest_versions SET kind=?, payload=? WHERE id=?", updates)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return report
+    return CompactionReport(quests=1, errors=[f"{quest_id}: история менялась во время очистки, пропущено"])
+
+
+def _quest_ids(conn: sqlite3.Connection) -> List[Optional[int]]:
+    return [row[0] for row in conn.execute("SELECT DISTINCT quest_id FROM quest_versions")]
+
+
+def _file_pages(conn: sqlite3.Connection) -> Tuple[int, int, int]:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_size, page_count, freelist
+
+
+def compact(path: str = database.DB_PATH, policy: Optional[RetentionPolicy] = None,
+            quest_ids: Optional[Iterable[Optional[int]]] = None, vacuum: bool = False,
+            dry_run: bool = False, stop: Optional[threading.Event] = None,
+            pause: float = 0.0) -> CompactionReport:
+    """Compact every quest (or `quest_ids`) one transaction at a time."""
+    policy = policy or RetentionPolicy()
+    report = CompactionReport()
+    with database.connection(path) as conn:
+        page_size, pages_before, free_before = _file_pages(conn)
+        ids = _quest_ids(conn) if quest_ids is None else list(quest_ids)
+    for quest_id in ids:
+        if stop is not None and stop.is_set():
+            break
+        # a fresh pooled connection per quest keeps each lock window short
+        with database.connection(path) as conn:
+            conn.commit()
+            try:
+                report.merge(compact_quest(conn, quest_id, policy, dry_run=dry_run))
+            except sqlite3.Error as e:
+                report.errors.append(f"{quest_id}: {e}")
+        if stop is not None and pause:
+            stop.wait(pause)
+    with database.connection(path) as conn:
+        if vacuum and not dry_run:
+            conn.commit()
+            conn.execute("VACUUM")
+            _ps, pages_after, _free = _file_pages(conn)
+            report.bytes_reclaimed = (pages_before - pages_after) * page_size
+        else:
+            _ps, _pages, free_after = _file_pages(conn)
+            report.bytes_reclaimed = max(0, free_after - free_before) * page_size
+    return report
+
+
+class BackgroundCompactor(threading.Thread):
+    """Runs `compact()` on a daemon thread, pausing between quests."""
+
+    def __init__(self, path: str = database.DB_PATH, policy: Optional[RetentionPolicy] = None,
+                 pause: float = 0.05, on_done=None):
+        super().__init__(name="version-compactor", daemon=True)
+        self.path = path
+        self.policy = policy or RetentionPolicy()
+        self.pause = pause
+        self.on_done = on_done
+        self.report: Optional[CompactionReport] = None
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        try:
+            self.report = compact(self.path, self.policy, stop=self._stop_event, pause=self.pause)
+        except Exception as e:
+            self.report = CompactionReport(errors=[str(e)])
+        if self.on_done:
+            try:
+                self.on_done(self.report)
+            except Exception:
+                pass
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def start_background_compaction(path: str = database.DB_PATH, policy: Optional[RetentionPolicy] = None,
+                                on_done=None) -> BackgroundCompactor:
+    compactor = BackgroundCompactor(path, policy, on_done=on_done)
+    compactor.start()
+    return compactor
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Очистка истории версий квестов")
+    parser.add_argument("--db", default=database.DB_PATH, help="путь к базе (по умолчанию quests.db)")
+    parser.add_argument("--keep-last", type=int, default=RetentionPolicy.keep_last,
+                        help="сколько последних версий хранить полностью")
+    parser.add_argument("--minute-after", type=float, default=1, help="часов до прореживания до 1/мин")
+    parser.add_argument("--hour-after", type=float, default=24, help="часов до прореживания до 1/час")
+    parser.add_argument("--day-after", type=float, default=24 * 30, help="часов до прореживания до 1/день")
+    parser.add_argument("--no-keep-tagged", action="store_true", help="не защищать версии с тегом")
+    parser.add_argument("--vacuum", action="store_true", help="выполнить VACUUM после очистки")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не удалять")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"База '{args.db}' не найдена")
+    policy = RetentionPolicy(
+        keep_last=args.keep_last,
+        tiers=(
+            (int(args.minute_after * HOUR), MINUTE),
+            (int(args.hour_after * HOUR), HOUR),
+            (int(args.day_after * HOUR), DAY),
+        ),
+        keep_tagged=not args.no_keep_tagged,
+    )
+    report = compact(args.db, policy, vacuum=args.vacuum, dry_run=args.dry_run)
+    print(report)
+    for err in report.errors:
+        print(f"Ошибка: {err}")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+# quest_master/core/search.py
+"""FTS5 full-text search over quests and, optionally, their version history.
+
+`quests_fts` is an external-content index over `quests(title, description)`
+kept in sync by triggers. The optional `quest_versions_fts` index is filled
+by a trigger on `quest_versions` inserts: `save_quest` updates the quest row
+before appending the version, so the row's description is the version text
+(versions themselves are stored as deltas, see core.version_store).
+"""
+import re
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from core import version_store
+
+HIGHLIGHT = ("[", "]")
+SNIPPET_TOKENS = 12
+VERSION_WINDOW = 500
+
+_QUESTS_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS quests_fts USING fts5(
+    title, description,
+    content='quests', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)
+"""
+
+_QUESTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS quests_fts_ai AFTER INSERT ON quests BEGIN
+        INSERT INTO quests_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quests_fts_ad AFTER DELETE ON quests BEGIN
+        INSERT INTO quests_fts(quests_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quests_fts_au AFTER UPDATE OF title, description ON quests
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        INSERT INTO quests_fts(quests_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO quests_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+)
+
+_VERSIONS_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS quest_versions_fts USING fts5(
+    title, description, quest_id UNINDEXED, version UNINDEXED,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)
+"""
+
+_VERSIONS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS quest_versions_fts_ai AFTER INSERT ON quest_versions
+    WHEN new.quest_id IS NOT NULL BEGIN
+        INSERT INTO quest_versions_fts(rowid, title, description, quest_id, version)
+        SELECT new.id, new.title, q.description, new.quest_id, new.version FROM quests q WHERE q.id = new.quest_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quest_versions_fts_ad AFTER DELETE ON quest_versions BEGIN
+        DELETE FROM quest_versions_fts WHERE rowid = old.id;
+    END
+    """,
+)
+
+
+@dataclass
+class SearchHit:
+    quest_id: int
+    title: str
+    snippet: str
+    rank: float
+    difficulty: Optional[str] = None
+    reward: Optional[int] = None
+    deadline: Optional[str] = None
+    # set for hits coming from the version history
+    version: Optional[int] = None
+
+
+def fts_available(conn: sqlite3.Connection) -> bool:
+    try:
+        return "ENABLE_FTS5" in {row[0] for row in conn.execute("PRAGMA compile_options")} or bool(
+            conn.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'").fetchone())
+    except sqlite3.Error:
+        return False
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """Create the quests index and its triggers; backfill on first creation."""
+    if not fts_available(conn):
+        return False
+    created = not _table_exists(conn, "quests_fts")
+    conn.execute(_QUESTS_FTS)
+    for ddl in _QUESTS_TRIGGERS:
+        conn.execute(ddl)
+    if created:
+        conn.execute("INSERT INTO quests_fts(quests_fts) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def enable_version_index(conn: sqlite3.Connection) -> int:
+    """Index the whole version history (opt-in: it stores every version's text).
+
+    Returns the number of versions indexed by the backfill.
+    """
+    if _table_exists(conn, "quest_versions_fts"):
+        return 0
+    conn.execute(_VERSIONS_FTS)
+    for ddl in _VERSIONS_TRIGGERS:
+        conn.execute(ddl)
+    count = 0
+    for (quest_id,) in conn.execute("SELECT DISTINCT quest_id FROM quest_versions WHERE quest_id IS NOT NULL").fetchall():
+        rows = [
+            (row_id, text, quest_id, version)
+            for row_id, version, text, _created, _tag in version_store.iter_chain(conn, quest_id)
+        ]
+        conn.executemany(
+            "INSERT INTO quest_versions_fts(rowid, title, description, quest_id, version) "
+            "SELECT ?, title, ?, ?, ? FROM quest_versions WHERE id = ?",
+            [(r[0], r[1], r[2], r[3], r[0]) for r in rows],
+        )
+        count += len(rows)
+    conn.commit()
+    return count
+
+
+@contextmanager
+def deferred_quest_index(conn: sqlite3.Connection) -> Iterator[None]:
+    """Index quests inserted inside the block with one INSERT ... SELECT.
+
+    The per-row insert trigger tokenizes and flushes every document on its
+    own; indexing a whole batch at once is about twice as fast. The trigger
+    is dropped and recreated inside the caller's transaction, so other
+    connections never see it missing.
+    """
+    if not _table_exists(conn, "quests_fts"):
+        yield
+        return
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    # ids are AUTOINCREMENT: everything inserted in the block is above this
+    start = conn.execute("SELECT COALESCE(MAX(id), 0) FROM quests").fetchone()[0]
+    conn.execute("DROP TRIGGER IF EXISTS quests_fts_ai")
+    try:
+        yield
+    finally:
+        conn.execute(_QUESTS_TRIGGERS[0])
+    conn.execute(
+        "INSERT INTO quests_fts(rowid, title, description) SELECT id, title, description FROM quests WHERE id > ?",
+        (start,))
+
+
+def version_index_enabled(conn: sqlite3.Connection) -> bool:
+    return _table_exists(conn, "quest_versions_fts")
+
+
+def build_match(query: str, prefix: bool = True) -> str:
+    """Turn free text into a safe FTS5 expression: every word must match."""
+    words = re.findall(r"\w+", query, flags=re.UNICODE)
+    terms = [f'"{w}"' + ("*" if prefix else "") for w in words]
+    return " AND ".join(terms)
+
+
+def search(conn: sqlite3.Connection, query: str, prefix: bool = True, difficulty: Optional[str] = None,
+           reward_min: Optional[int] = None, reward_max: Optional[int] = None,
+           deadline_before: Optional[str] = None, deadline_after: Optional[str] = None,
+           include_versions: bool = False, limit: int = 20, highlight=HIGHLIGHT,
+           version_window: Optional[int] = VERSION_WINDOW) -> List[SearchHit]:
+    """Ranked search; filters apply to the current quest row.
+
+    Deadlines are ISO strings, compared as text. Version hits (if the version
+    index is enabled and `include_versions` is set) follow the quest hits and
+    are limited to the best-ranked version of each quest.
+
+    bm25 has to score every matching version, so only the `version_window`
+    most recent matching versions are ranked: an older version is not found
+    when more than that many newer versions match, however well it would
+    rank. `version_window=None` ranks the whole match set.
+    """
+    match = build_match(query, prefix)
+    filters, args = [], []
+    if difficulty:
+        filters.append("q.difficulty = ?")
+        args.append(difficulty)
+    if reward_min is not None:
+        filters.append("q.reward >= ?")
+        args.append(reward_min)
+    if reward_max is not None:
+        filters.append("q.reward <= ?")
+        args.append(reward_max)
+    if deadline_before:
+        filters.append("q.deadline <= ?")
+        args.append(deadline_before)
+    if deadline_after:
+        filters.append("q.deadline >= ?")
+        args.append(deadline_after)
+    where = "".join(" AND " + f for f in filters)
+
+    if not match:
+        rows = conn.execute(
+            "SELECT q.id, q.title, substr(q.description, 1, 120), 0, q.difficulty, q.reward, q.deadline "
+            f"FROM quests q WHERE 1 = 1{where} ORDER BY q.id DESC LIMIT ?", args + [limit]).fetchall()
+        return [SearchHit(*row) for row in rows]
+    if not _table_exists(conn, "quests_fts"):
+        return _search_like(conn, query, where, args, limit)
+
+    open_mark, close_mark = highlight
+    rows = conn.execute(
+        "SELECT q.id, q.title, snippet(quests_fts, -1, ?, ?, '…', ?), bm25(quests_fts, 5.0, 1.0), "
+        "q.difficulty, q.reward, q.deadline "
+        "FROM quests_fts JOIN quests q ON q.id = quests_fts.rowid "
+        f"WHERE quests_fts MATCH ?{where} ORDER BY bm25(quests_fts, 5.0, 1.0) LIMIT ?",
+        [open_mark, close_mark, SNIPPET_TOKENS, match] + args + [limit],
+    ).fetchall()
+    hits = [SearchHit(*row) for row in rows]
+
+    if include_versions and version_index_enabled(conn) and len(hits) < limit:
+        # the window is a cheap rowid range scan, see the docstring
+        row = None
+        if version_window is not None:
+            row = conn.execute(
+                "SELECT rowid FROM quest_versions_fts WHERE quest_versions_fts MATCH ? "
+                "ORDER BY rowid DESC LIMIT 1 OFFSET ?", (match, max(version_window, 1) - 1)).fetchone()
+        lowest = row[0] if row else 0
+        rows = conn.execute(
+            "SELECT q.id, quest_versions_fts.title, snippet(quest_versions_fts, -1, ?, ?, '…', ?), "
+            "bm25(quest_versions_fts), q.difficulty, q.reward, q.deadline, quest_versions_fts.version "
+            "FROM quest_versions_fts JOIN quests q ON q.id = quest_versions_fts.quest_id "
+            f"WHERE quest_versions_fts MATCH ? AND quest_versions_fts.rowid >= ?{where} "
+            "ORDER BY bm25(quest_versions_fts) LIMIT ?",
+            [open_mark, close_mark, SNIPPET_TOKENS, match, lowest] + args + [limit * 4],
+        ).fetchall()
+        seen = {hit.quest_id for hit in hits}
+        for row in rows:
+            if row[0] in seen:
+                continue
+            seen.add(row[0])
+            hits.append(SearchHit(*row))
+            if len(hits) >= limit:
+                break
+    return hits
+
+
+def _search_like(conn: sqlite3.Connection, query: str, where: str, args: list, limit: int) -> List[SearchHit]:
+    # SQLite built without FTS5: slow but correct substring search
+    pattern = f"%{query.strip()}%"
+    rows = conn.execute(
+        "SELECT q.id, q.title, substr(q.description, 1, 120), 0, q.difficulty, q.reward, q.deadline "
+        f"FROM quests q WHERE (q.title LIKE ? OR q.description LIKE ?){where} ORDER BY q.id DESC LIMIT ?",
+        [pattern, pattern] + args + [limit],
+    ).fetchall()
+    return [SearchHit(*row) for row in rows]
@@ -0,0 +1,405 @@
+# quest_master/core/server.py
+"""Local HTTP render service: parchments for other tools, without the GUI.
+
+    python -m core serve --port 8765 --jobs 4
+
+Routes (GET and HEAD):
+    /quests/{id}                                quest as JSON with its version number
+    /render/{template}/{id}?format=html|pdf|docx&qr=svg|png
+    /qr/{id}?format=png|svg
+    /health
+
+One asyncio loop speaks HTTP/1.1 with keep-alive (stdlib only). Database
+reads and HTML renders run on a small thread pool that shares the process-wide
+connection pool and one warm TemplateEngine; PDF and DOCX documents are
+written in a process pool, because WeasyPrint holds the GIL for the whole
+render.
+
+ETags come from quest version numbers (plus the templates' mtimes and the
+format), so `If-None-Match` is answered with 304 after one indexed lookup,
+without rendering. The templates folder is rescanned at most once per
+TEMPLATES_TTL, on the thread pool. Rendered bodies are kept in an LRU under their ETag.
+
+Quest fields are HTML-escaped in the served pages (the desktop exports keep
+them raw), and HTML responses carry a Content-Security-Policy that blocks
+scripts altogether.
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from core import database, qr_cache
+from core.batch_export import write_document
+from core.template_engine import TEMPLATES_PATH, TemplateEngine
+from core.tiles import LRUCache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# rendered responses kept in memory, keyed by ETag
+RESPONSE_CACHE_SIZE = 256
+# an idle keep-alive connection is closed after this many seconds
+KEEPALIVE_TIMEOUT = 15
+# the templates folder is scanned for changes at most this often (seconds)
+TEMPLATES_TTL = 1.0
+MAX_HEADERS = 100
+MAX_BODY = 64 * 1024
+
+RENDER_FORMATS = ("html", "pdf", "docx")
+CONTENT_TYPES = {
+    "html": "text/html; charset=utf-8",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "json": "application/json; charset=utf-8",
+}
+# template names are plain file names inside the templates folder
+_TEMPLATE_NAME = re.compile(r"^[\w.-]+\.html$")
+# parchments need only their inline styles and the data: URI of the QR code
+HTML_HEADERS = {
+    "Content-Security-Policy": "default-src 'none'; img-src data:; style-src 'unsafe-inline'",
+    "X-Content-Type-Options": "nosniff",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Response:
+    status: HTTPStatus
+    body: bytes = b""
+    content_type: str = CONTENT_TYPES["json"]
+    etag: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def json_response(data, status: HTTPStatus = HTTPStatus.OK, etag: Optional[str] = None) -> Response:
+    return Response(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), etag=etag)
+
+
+def render_document(html: str, fmt: str) -> bytes:
+    """Rendered HTML as PDF/DOCX bytes; top-level so the process pool can pickle it."""
+    fd, path = tempfile.mkstemp(suffix="." + fmt)
+    os.close(fd)
+    try:
+        write_document(html, path, fmt)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # weak comparison, as RFC 9110 asks for If-None-Match
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+class RenderService:
+    """Routes requests to the database, the warm engine and the worker pools."""
+
+    def __init__(self, db_path: str = database.DB_PATH, templates_path: str = TEMPLATES_PATH,
+                 jobs: Optional[int] = None, cache_size: int = RESPONSE_CACHE_SIZE,
+                 templates_ttl: float = TEMPLATES_TTL):
+        self.db_path = db_path
+        self.templates_path = os.path.abspath(templates_path)
+        self.jobs = jobs
+        # compile the shipped templates and open (and migrate) the database now,
+        # not on the first request
+        self.engine = TemplateEngine.shared(self.templates_path, autoescape=True)
+        self.engine.prewarm()
+        pool = database.get_pool(db_path)
+        # one thread per pooled connection: more would only wait for one
+        self._threads = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="render")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.cache: LRUCache[bytes] = LRUCache(cache_size)
+        self.templates_ttl = templates_ttl
+        # (monotonic time of the scan, newest mtime, template file names)
+        self._templates: Optional[Tuple[float, int, frozenset]] = None
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # "spawn": forking a process that already runs threads can deadlock
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.jobs, mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    def close(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._threads, func, *args)
+
+    # -- routing
+
+    async def respond(self, method: str, target: str, headers: Dict[str, str]) -> Response:
+        try:
+            if method not in ("GET", "HEAD"):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Метод {method} не поддерживается")
+            url = urlsplit(target)
+            parts = [unquote(part) for part in url.path.strip("/").split("/")]
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if parts == ["health"]:
+                return json_response({"status": "ok"})
+            if len(parts) == 2 and parts[0] == "quests":
+                return await self.quest(_quest_id(parts[1]), headers)
+            if len(parts) == 3 and parts[0] == "render":
+                return await self.render(parts[1], _quest_id(parts[2]), query.get("format", "html"),
+                                         query.get("qr"), headers)
+            if len(parts) == 2 and parts[0] == "qr":
+                return await self.qr(_quest_id(parts[1]), query.get("format", "png"), headers)
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Нет такого адреса: {url.path}")
+        except HTTPError as e:
+            return json_response({"error": e.message}, e.status)
+        except Exception as e:
+            return json_response({"error": f"{type(e).__name__}: {e}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    async def _load(self, quest_id: int) -> Tuple[Dict, int, str]:
+        """The quest, its version number and a tag that changes whenever the quest does."""
+        quest, version = await self._in_thread(database.get_quest_version, quest_id, self.db_path)
+        if quest is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Квест {quest_id} не найден")
+        if version:
+            return quest, version, f"{quest_id}.v{version}"
+        # quests imported without history have no version: hash the row instead
+        digest = hashlib.sha256(json.dumps(quest, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return quest, version, f"{quest_id}.h{digest[:16]}"
+
+    async def quest(self, quest_id: int, headers: Dict[str, str]) -> Response:
+        quest, version, tag = await self._load(quest_id)
+        etag = f'"quest-{tag}"'
+        if etag_matches(headers.get("if-none-match"), etag):
+            return Response(HTTPStatus.NOT_MODIFIED, etag=etag)
+        return json_response({"quest": quest, "version": version}, etag=etag)
+
+    def _scan_templates(self) -> Tuple[int, frozenset]:
+        """The newest mtime in the templates folder and its top-level file names."""
+        mtime = 0
+        for root, _dirs, files in os.walk(self.templates_path):
+            for name in files:
+                try:
+                    mtime = max(mtime, os.stat(os.path.join(root, name)).st_mtime_ns)
+                except OSError:
+                    pass  # removed meanwhile
+        with os.scandir(self.templates_path) as entries:
+            names = frozenset(entry.name for entry in entries if entry.is_file())
+        return mtime, names
+
+    async def _template_mtime(self, template: str) -> int:
+        """The newest mtime in the templates folder, rescanned at most once per `templates_ttl`.
+
+        A template may extend or include any other one, so editing any file
+        in the folder changes the ETags of every render.
+        """
+        if not _TEMPLATE_NAME.match(template):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Недопустимое имя шаблона: {template}")
+        if self._templates is None or time.monotonic() - self._templates[0] >= self.templates_ttl:
+            mtime, names = await self._in_thread(self._scan_templates)
+            self._templates = (time.monotonic(), mtime, names)
+        _checked, mtime, names = self._templates
+        if template not in names:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Шаблон {template} не найден")
+        return mtime
+
+    async def render(self, template: str, quest_id: int, fmt: str, qr: Optional[str],
+                     headers: Dict[str, str]) -> Response:
+        if fmt not in RENDER_FORMATS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Неизвестный формат '{fmt}', ожидается один из {RENDER_FORMATS}")
+        if qr not in (None, *qr_cache.FORMATS):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Неизвестный формат QR-кода '{qr}'")
+        mtime = await self._template_mtime(template)
+        quest, _version, tag = await self._load(quest_id)
+        etag = f'"render-{tag}-{template}-{mtime:x}-{fmt}-{qr or "noqr"}"'
+        extra = HTML_HEADERS if fmt == "html" else {}
+        if etag_matches(headers.get("if-none-match"), etag):
+            return Response(HTTPStatus.NOT_MODIFIED, etag=etag, headers=dict(extra))
+        body = self.cache.get(etag)
+        if body is None:
+            html = await self._in_thread(self._render_html, template, quest, qr)
+            if fmt == "html":
+                body = html.encode("utf-8")
+            else:
+                body = await asyncio.get_running_loop().run_in_executor(
+                    self._process_pool(), render_document, html, fmt)
+            self.cache.put(etag, body)
+        return Response(HTTPStatus.OK, body, CONTENT_TYPES[fmt], etag, dict(extra))
+
+    def _render_html(self, template: str, quest: Dict, qr: Optional[str]) -> str:
+        html = self.engine.render(template, quest)
+        if qr:
+            html = self.engine.qr_img_tag(quest["id"], qr) + html
+        return html
+
+    async def qr(self, quest_id: int, fmt: str, headers: Dict[str, str]) -> Response:
+        if fmt not in qr_cache.FORMATS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Неизвестный формат QR-кода '{fmt}'")
+        url = qr_cache.quest_url(quest_id)
+        # the code depends only on the URL, so it never changes for an id
+        etag = f'"qr-{qr_cache.QRCache.key(url, fmt, 10, 4)[:32]}"'
+        cache = {"Cache-Control": "public, max-age=86400"}
+        if etag_matches(headers.get("if-none-match"), etag):
+            return Response(HTTPStatus.NOT_MODIFIED, etag=etag, headers=cache)
+        body = await self._in_thread(qr_cache.shared().get, url, fmt)
+        return Response(HTTPStatus.OK, body, qr_cache.MIME_TYPES[fmt], etag, cache)
+
+    # -- HTTP/1.1
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = await _read_headers(reader)
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError("отрицательный Content-Length")
+                    if length > MAX_BODY:
+                        raise ValueError("тело запроса слишком большое")
+                except (ValueError, UnicodeDecodeError) as e:
+                    writer.write(_encode(json_response({"error": f"Неверный запрос: {e}"}, HTTPStatus.BAD_REQUEST),
+                                         head=False, keep_alive=False))
+                    await writer.drain()
+                    break
+                if length:
+                    await reader.readexactly(length)  # GET/HEAD bodies carry nothing we use
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                response = await self.respond(method, target, headers)
+                writer.write(_encode(response, method == "HEAD", keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+def _quest_id(text: str) -> int:
+    try:
+        return int(text)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Неверный номер квеста: {text}")
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADERS):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise ValueError(f"строка заголовка без ':': {line!r:.60}")
+        headers[name.strip().lower()] = value.strip()
+    raise ValueError("слишком много заголовков")
+
+
+def _encode(response: Response, head: bool, keep_alive: bool) -> bytes:
+    status = response.status
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    headers = {"Connection": "keep-alive" if keep_alive else "close"}
+    if status != HTTPStatus.NOT_MODIFIED:
+        headers["Content-Type"] = response.content_type
+        headers["Content-Length"] = str(len(response.body))
+    if response.etag:
+        headers["ETag"] = response.etag
+        # caches may keep the body but must ask again; the answer is usually a 304
+        headers.setdefault("Cache-Control", "no-cache")
+    headers.update(response.headers)
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    if head or status == HTTPStatus.NOT_MODIFIED:
+        return payload
+    return payload + response.body
+
+
+class BackgroundServer(threading.Thread):
+    """The service on its own event loop thread (tests, benchmarks, embedding)."""
+
+    def __init__(self, service: RenderService, host: str = DEFAULT_HOST, port: int = 0):
+        super().__init__(name="render-service", daemon=True)
+        self.service = service
+        self.host = host
+        self.port = port
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(self.service.start(self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except BaseException as e:
+            self._error = e
+            return
+        finally:
+            self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        # idle keep-alive connections are still waiting for a request
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def start(self) -> "BackgroundServer":
+        super().start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.join(timeout)
+        self.service.close()
+
+
+async def serve(service: RenderService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    server = await service.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Сервис запущен: http://{address[0]}:{address[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
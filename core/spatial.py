@@ -0,0 +1,154 @@
+# quest_master/core/spatial.py
+"""R*Tree spatial index over quest_locations.
+
+`quest_locations_rtree` holds one degenerate box (a point) per location and
+is kept in sync by triggers, so `add_location` and any other writer need no
+changes. The R*Tree stores 32-bit floats rounded outwards, so every query
+re-checks the exact coordinates on the joined `quest_locations` row.
+Without the rtree module the same queries fall back to plain range scans.
+"""
+import math
+import sqlite3
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+_RTREE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS quest_locations_rtree USING rtree(
+    id, min_x, max_x, min_y, max_y, +quest_id INTEGER
+)
+"""
+
+_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS quest_locations_rtree_ai AFTER INSERT ON quest_locations
+    WHEN new.x IS NOT NULL AND new.y IS NOT NULL BEGIN
+        INSERT INTO quest_locations_rtree(id, min_x, max_x, min_y, max_y, quest_id)
+        VALUES (new.id, new.x, new.x, new.y, new.y, new.quest_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quest_locations_rtree_ad AFTER DELETE ON quest_locations BEGIN
+        DELETE FROM quest_locations_rtree WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quest_locations_rtree_au AFTER UPDATE OF x, y, quest_id ON quest_locations BEGIN
+        DELETE FROM quest_locations_rtree WHERE id = old.id;
+        INSERT INTO quest_locations_rtree(id, min_x, max_x, min_y, max_y, quest_id)
+        SELECT new.id, new.x, new.x, new.y, new.y, new.quest_id WHERE new.x IS NOT NULL AND new.y IS NOT NULL;
+    END
+    """,
+)
+
+# first search radius of `nearest`, in scene units; doubled until enough hits
+NEAREST_RADIUS = 64.0
+# window growth before `nearest` checks whether it already covers everything
+EXTENT_CHECK_AFTER = 64
+
+
+@dataclass
+class Location:
+    id: int
+    quest_id: Optional[int]
+    x: float
+    y: float
+    type: Optional[str]
+
+
+def rtree_available(conn: sqlite3.Connection) -> bool:
+    try:
+        return "ENABLE_RTREE" in {row[0] for row in conn.execute("PRAGMA compile_options")} or bool(
+            conn.execute("SELECT 1 FROM pragma_module_list WHERE name = 'rtree'").fetchone())
+    except sqlite3.Error:
+        return False
+
+
+def _indexed(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'quest_locations_rtree'").fetchone() is not None
+
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """Create the R*Tree and its triggers; backfill on first creation."""
+    if not rtree_available(conn):
+        return False
+    created = not _indexed(conn)
+    conn.execute(_RTREE)
+    for ddl in _TRIGGERS:
+        conn.execute(ddl)
+    if created:
+        conn.execute(
+            "INSERT INTO quest_locations_rtree(id, min_x, max_x, min_y, max_y, quest_id) "
+            "SELECT id, x, x, y, y, quest_id FROM quest_locations WHERE x IS NOT NULL AND y IS NOT NULL")
+    conn.commit()
+    return True
+
+
+def in_bbox(conn: sqlite3.Connection, x0: float, y0: float, x1: float, y1: float,
+            quest_id: Optional[int] = None, limit: Optional[int] = None) -> List[Location]:
+    """Locations with x0 <= x <= x1 and y0 <= y <= y1, optionally of one quest."""
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    args: list = []
+    if _indexed(conn):
+        sql = ("SELECT l.id, l.quest_id, l.x, l.y, l.type FROM quest_locations_rtree r "
+               "JOIN quest_locations l ON l.id = r.id "
+               "WHERE r.min_x <= ? AND r.max_x >= ? AND r.min_y <= ? AND r.max_y >= ? "
+               "AND l.x BETWEEN ? AND ? AND l.y BETWEEN ? AND ?")
+        args += [x1, x0, y1, y0, x0, x1, y0, y1]
+        if quest_id is not None:
+            sql += " AND r.quest_id = ?"
+            args.append(quest_id)
+    else:
+        sql = "SELECT l.id, l.quest_id, l.x, l.y, l.type FROM quest_locations l WHERE l.x BETWEEN ? AND ? AND l.y BETWEEN ? AND ?"
+        args += [x0, x1, y0, y1]
+        if quest_id is not None:
+            sql += " AND l.quest_id = ?"
+            args.append(quest_id)
+    if limit is not None:
+        sql += " LIMIT ?"
+        args.append(limit)
+    return [Location(*row) for row in conn.execute(sql, args)]
+
+
+def bounds(conn: sqlite3.Connection, quest_id: Optional[int] = None) -> Optional[Tuple[float, float, float, float]]:
+    """(min_x, min_y, max_x, max_y) of all locations, or of one quest's."""
+    if quest_id is None:
+        row = conn.execute("SELECT MIN(x), MIN(y), MAX(x), MAX(y) FROM quest_locations").fetchone()
+    else:
+        row = conn.execute(
+            "SELECT MIN(x), MIN(y), MAX(x), MAX(y) FROM quest_locations WHERE quest_id = ?", (quest_id,)).fetchone()
+    return None if row is None or row[0] is None else row
+
+
+def nearest(conn: sqlite3.Connection, x: float, y: float, k: int = 1, quest_id: Optional[int] = None,
+            radius: float = NEAREST_RADIUS) -> List[Location]:
+    """The `k` locations closest to (x, y), nearest first.
+
+    Searches a square window that doubles until it holds `k` points within
+    its inscribed circle (anything outside the circle may be beaten by a
+    point just outside the window), or until it covers all locations.
+    """
+    radius = radius if radius > 0 else NEAREST_RADIUS
+    extent, start = None, radius
+    while True:
+        found = in_bbox(conn, x - radius, y - radius, x + radius, y + radius, quest_id)
+        found.sort(key=lambda loc: math.hypot(loc.x - x, loc.y - y))
+        if len(found) >= k:
+            if math.hypot(found[k - 1].x - x, found[k - 1].y - y) <= radius:
+                return found[:k]
+            # k points exist, so a larger window is bound to settle it
+            radius *= 2
+            continue
+        if radius < start * EXTENT_CHECK_AFTER:
+            # the extent query scans the table; most lookups settle before it
+            radius *= 2
+            continue
+        if extent is None:
+            extent = bounds(conn, quest_id)
+            if extent is None:
+                return []
+        min_x, min_y, max_x, max_y = extent
+        if radius >= max(x - min_x, max_x - x, y - min_y, max_y - y):
+            return found[:k]
+        radius *= 2
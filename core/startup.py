@@ -0,0 +1,182 @@
+# quest_master/core/startup.py
+"""Startup timing for `main.py --profile-startup`.
+
+Phases are wall-clock spans of the startup sequence (imports, QApplication,
+main window, tabs); marks are points in time such as the first event loop
+turn after the window is shown. While `track_imports` is on, every import
+statement that loads a new module is timed by wrapping `builtins.__import__`,
+much like `python -X importtime`, and summarized per module and per package.
+
+Phases cost two perf_counter calls, so main.py always runs under a profiler;
+the import hook is only installed when profiling was asked for.
+"""
+import builtins
+import importlib.util
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# rows of the per-module table in the text report
+REPORT_TOP = 15
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    # seconds, including / excluding the modules it imported itself
+    cumulative: float
+    own: float
+
+
+class StartupProfiler:
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.perf_counter() if start is None else start
+        # (name, seconds) in start order; nesting depth for the report
+        self.phases: List[Tuple[str, float]] = []
+        self._depths: List[int] = []
+        self._depth = 0
+        self.marks: Dict[str, float] = {}
+        self.imports: List[ImportRecord] = []
+        # free-form facts for the report (e.g. which heavy modules were deferred)
+        self.info: Dict[str, object] = {}
+        self._original_import = None
+        # per thread: time spent in nested imports of each import in progress
+        self._local = threading.local()
+
+    # -- phases and marks
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        index = len(self.phases)
+        self.phases.append((name, 0.0))
+        self._depths.append(self._depth)
+        self._depth += 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.phases[index] = (name, time.perf_counter() - t0)
+
+    def mark(self, name: str) -> float:
+        """Record seconds since the profiler started under `name`."""
+        elapsed = time.perf_counter() - self.start
+        self.marks[name] = elapsed
+        return elapsed
+
+    # -- imports
+
+    def track_imports(self) -> None:
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def stop_imports(self) -> None:
+        if self._original_import is not None:
+            # another hook installed later stays in place
+            if builtins.__import__ == self._timed_import:
+                builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @staticmethod
+    def _loaded(name: str, globals, fromlist, level: int) -> Tuple[str, bool]:
+        try:
+            full = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__")) if level else name
+        except (ImportError, ValueError):
+            return name, True
+        module = sys.modules.get(full)
+        if module is None:
+            return full, False
+        # `from package import submodule` loads the submodule on first use
+        return full, all(item == "*" or hasattr(module, item) for item in fromlist or ())
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import or builtins.__import__
+        full, loaded = self._loaded(name, globals, fromlist, level)
+        if loaded:
+            return original(name, globals, locals, fromlist, level)
+        missing = [item for item in fromlist or () if f"{full}.{item}" not in sys.modules]
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - t0
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            # `from core import database` is reported as core.database
+            loaded = [f"{full}.{item}" for item in missing if f"{full}.{item}" in sys.modules]
+            self.imports.append(ImportRecord(", ".join(loaded) or full, elapsed, elapsed - nested))
+
+    def packages(self) -> List[Tuple[str, float]]:
+        """Own import time summed per top-level package, slowest first."""
+        totals: Dict[str, float] = {}
+        for record in self.imports:
+            package = record.name.split(".")[0]
+            totals[package] = totals.get(package, 0.0) + record.own
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    # -- output
+
+    def to_dict(self) -> Dict:
+        return {
+            "marks_ms": {name: round(t * 1000, 3) for name, t in self.marks.items()},
+            "phases": [{"name": name, "ms": round(t * 1000, 3)} for name, t in self.phases],
+            "imports": [{"name": r.name, "cumulative_ms": round(r.cumulative * 1000, 3), "own_ms": round(r.own * 1000, 3)}
+                        for r in self.imports],
+            "info": self.info,
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def report(self, top: int = REPORT_TOP) -> str:
+        lines = ["Профиль запуска"]
+        for name, t in self.marks.items():
+            lines.append(f"  {name}: {t * 1000:.1f} мс от старта")
+        lines.append("Этапы:")
+        for (name, t), depth in zip(self.phases, self._depths):
+            lines.append(f"  {t * 1000:8.1f} мс  {'  ' * depth}{name}")
+        if self.imports:
+            total = sum(r.own for r in self.imports)
+            lines.append(f"Импорты: {len(self.imports)} модулей, {total * 1000:.1f} мс")
+            lines.append("  по пакетам (собственное время):")
+            for package, t in self.packages()[:top]:
+                lines.append(f"  {t * 1000:8.1f} мс  {package}")
+            lines.append("  самые долгие модули (с вложенными | собственное):")
+            for r in sorted(self.imports, key=lambda r: r.cumulative, reverse=True)[:top]:
+                lines.append(f"  {r.cumulative * 1000:8.1f} | {r.own * 1000:6.1f} мс  {r.name}")
+        for key, value in self.info.items():
+            if isinstance(value, (list, tuple)):
+                value = ", ".join(map(str, value)) or "—"
+            lines.append(f"{key}: {value}")
+        return "\n".join(lines)
+
+
+_active: Optional[StartupProfiler] = None
+
+
+def activate(profiler: Optional[StartupProfiler]) -> None:
+    global _active
+    _active = profiler
+
+
+def active() -> Optional[StartupProfiler]:
+    return _active
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """A phase of the active profiler; a no-op outside of main.py."""
+    if _active is None:
+        yield
+    else:
+        with _active.phase(name):
+            yield
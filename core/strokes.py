@@ -0,0 +1,72 @@
+# quest_master/core/strokes.py
+"""Brush stroke simplification.
+
+Two passes keep strokes small without visible change: `RadialFilter` drops
+input points closer than the tolerance to the last kept one while the user
+is still drawing (mouse jitter, high-rate tablets), and `simplify`
+(Ramer–Douglas–Peucker) removes points that deviate from the straight line
+between their neighbours by less than the tolerance once the stroke ends.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+# scene units; below a pixel at 100% zoom, so simplification is invisible
+DEFAULT_TOLERANCE = 0.75
+
+
+def simplify(points: Sequence[Point], tolerance: float = DEFAULT_TOLERANCE) -> List[Point]:
+    """Ramer–Douglas–Peucker over (x, y) pairs; endpoints are always kept.
+
+    Iterative (an explicit stack), so 10k-point strokes cannot hit the
+    recursion limit.
+    """
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return list(points)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tol2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = points[first]
+        bx, by = points[last]
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        best, index = tol2, -1
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if length2 == 0.0:
+                # closed loop: distance to the shared endpoint
+                d = (px - ax) * (px - ax) + (py - ay) * (py - ay)
+            else:
+                cross = dx * (py - ay) - dy * (px - ax)
+                d = cross * cross / length2
+            if d > best:
+                best, index = d, i
+        if index >= 0:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+class RadialFilter:
+    """Online pass: accept a point only if it moved `tolerance` from the last one."""
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE):
+        self.tolerance2 = tolerance * tolerance
+        self.last: Optional[Point] = None
+
+    def reset(self) -> None:
+        self.last = None
+
+    def accept(self, x: float, y: float) -> bool:
+        last = self.last
+        if last is not None and (x - last[0]) ** 2 + (y - last[1]) ** 2 < self.tolerance2:
+            return False
+        self.last = (x, y)
+        return True
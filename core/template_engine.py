@@ -1,23 +1,84 @@
 # quest_master/core/template_engine.py
-from jinja2 import Environment, FileSystemLoader
-from typing import Dict, Callable, Optional
-import qrcode
-from io import BytesIO
+from typing import TYPE_CHECKING, Dict, Callable, Optional, Iterable, Tuple
 from datetime import datetime
 import os
+import threading
+
+from core import qr_cache
+
+# Jinja2 is imported by the first engine, not with this module: the GUI
+# imports this module at startup but renders nothing until the first export
+if TYPE_CHECKING:
+    from jinja2 import FileSystemBytecodeCache
+
+TEMPLATES_PATH = "templates"
+SHIPPED_TEMPLATES = ("ancient_scroll.html", "guild_contract.html", "royal_decree.html")
+
+# process-wide registry: one engine (and one compiled-template cache) per templates folder
+# and escaping mode
+_engines: Dict[Tuple[str, bool], "TemplateEngine"] = {}
+_engines_lock = threading.Lock()
+_bytecode_caches: Dict[bool, "FileSystemBytecodeCache"] = {}
+
+
+def _get_bytecode_cache(autoescape: bool = False) -> Optional["FileSystemBytecodeCache"]:
+    # compiled template code survives restarts in the user temp directory;
+    # autoescaping is compiled into the code, so escaped templates get their own files
+    cache = _bytecode_caches.get(autoescape)
+    if cache is None:
+        try:
+            from jinja2 import FileSystemBytecodeCache
+            cache = FileSystemBytecodeCache(pattern="__jinja2_%s.escaped.cache" if autoescape else "__jinja2_%s.cache")
+        except Exception:
+            return None
+        _bytecode_caches[autoescape] = cache
+    return cache
+
 
 class TemplateEngine:
-    def __init__(self):
-        templates_path = "templates"
+    def __init__(self, templates_path: str = TEMPLATES_PATH, autoescape: bool = False):
         if not os.path.exists(templates_path):
             raise RuntimeError(f"Папка шаблонов '{templates_path}' не найдена. Убедитесь, что она существует в корне проекта.")
         if not os.listdir(templates_path):
             raise RuntimeError(f"Папка шаблонов '{templates_path}' пуста. Добавьте необходимые файлы шаблонов.")
+        self.templates_path = templates_path
+        # off for the desktop exports, where descriptions may carry markup on purpose;
+        # on for anything served to a browser
+        self.autoescape = autoescape
         try:
-            self.env = Environment(loader=FileSystemLoader(templates_path))
+            from jinja2 import Environment, FileSystemLoader
+            # auto_reload re-compiles a cached template only when its file mtime changes
+            self.env = Environment(
+                loader=FileSystemLoader(templates_path),
+                auto_reload=True,
+                cache_size=100,
+                autoescape=autoescape,
+                bytecode_cache=_get_bytecode_cache(autoescape),
+            )
         except Exception as e:
             raise RuntimeError(f"Ошибка загрузки шаблонов: {e}")
 
+    @classmethod
+    def shared(cls, templates_path: str = TEMPLATES_PATH, autoescape: bool = False) -> "TemplateEngine":
+        """Return the process-wide engine for `templates_path`, creating it once."""
+        key = (os.path.abspath(templates_path), autoescape)
+        engine = _engines.get(key)
+        if engine is None:
+            with _engines_lock:
+                engine = _engines.get(key)
+                if engine is None:
+                    engine = cls(templates_path, autoescape)
+                    _engines[key] = engine
+        return engine
+
+    def prewarm(self, names: Iterable[str] = SHIPPED_TEMPLATES) -> None:
+        """Compile templates ahead of the first render; missing ones are skipped."""
+        for name in names:
+            try:
+                self.env.get_template(name)
+            except Exception:
+                pass
+
     @staticmethod
     def generate_dummy_quest(i: int) -> dict:
         return {
@@ -30,6 +91,39 @@ class TemplateEngine:
         }
 
     class BatchExporter:
+        @staticmethod
+        def export(quests, template: str = SHIPPED_TEMPLATES[0], fmt: str = "html", out_dir: str = "parchments",
+                   workers: Optional[int] = None, ordered: bool = True,
+                   progress: Optional[Callable] = None, **kwargs):
+            """
+            Render and write any quest iterable (see core.batch_export) to HTML, PDF
+            or DOCX using a process pool. Returns a BatchReport with per-item errors.
+            """
+            from core.batch_export import export_batch
+            return export_batch(quests, template, fmt, out_dir, workers, ordered, progress, **kwargs)
+
+        @staticmethod
+        def stream(quests, template: str = SHIPPED_TEMPLATES[0]):
+            """Yield (quest_id, rendered_chunk) pairs without building whole documents.
+
+            Each document starts with a (quest_id, None) marker.
+            """
+            from core.batch_export import stream_render
+            return stream_render(quests, template)
+
+        @staticmethod
+        def write_stream(quests, template: str = SHIPPED_TEMPLATES[0], out_dir: str = "parchments",
+                         archive: Optional[str] = None, archive_format: str = "zip") -> int:
+            """
+            Stream-render `quests` into `out_dir` (one file per quest) or, if `archive`
+            is given, into a single zip/tar. Returns the number of documents written.
+            """
+            from core.batch_export import stream_render, write_stream_to_archive, write_stream_to_dir
+            stream = stream_render(quests, template)
+            if archive:
+                return write_stream_to_archive(stream, archive, archive_format)
+            return write_stream_to_dir(stream, out_dir)
+
         @staticmethod
         def generate_100_quests(export_html: bool = False, on_complete: Optional[Callable[[int, str], None]] = None):
             """
@@ -38,7 +132,7 @@ class TemplateEngine:
             and `on_complete` callback is provided, call it with (20, 'BOSS_FIGHT').
             """
             import time
-            te = TemplateEngine()
+            te = TemplateEngine.shared()
             out = []
             start = time.time()
             for i in range(1, 101):
@@ -64,23 +158,48 @@ class TemplateEngine:
                 pass
             return out
 
+    @staticmethod
+    def context(data: Dict) -> Dict:
+        # the parchment templates read `quest.*` and `date`; plain quest dicts
+        # (from the wizard or generate_dummy_quest) are wrapped accordingly
+        if "quest" in data:
+            return data
+        ctx = dict(data)
+        ctx["quest"] = data
+        ctx.setdefault("date", datetime.now().strftime("%Y-%m-%d %H:%M"))
+        return ctx
+
     def render(self, template_name: str, data: Dict):
         try:
             template = self.env.get_template(template_name)
-            return template.render(data)
+            return template.render(self.context(data))
         except Exception as e:
             raise RuntimeError(f"Ошибка рендеринга шаблона '{template_name}': {e}")
 
-    def export_pdf(self, html: str, path: str, on_exported: Optional[Callable[[int, str], None]] = None):
+    @staticmethod
+    def write_pdf(html: str, path: str) -> None:
+        """Write `html` to a PDF file; raises RuntimeError if WeasyPrint is missing."""
         try:
             # weasyprint is an optional, heavy dependency (requires native libs on Windows).
             # Pylance may report a missing import in environments where it's not installed;
             # silence that specific warning while keeping the runtime import behavior.
             from weasyprint import HTML  # type: ignore[reportMissingImports]
         except Exception:
-            print("WeasyPrint не доступен — экспорт в PDF невозможен в этой среде.")
-            return
+            raise RuntimeError("WeasyPrint не доступен — экспорт в PDF невозможен в этой среде.")
         HTML(string=html).write_pdf(path)
+
+    @staticmethod
+    def write_docx(html: str, path: str) -> None:
+        """Write `html` to a DOCX file; raises RuntimeError if python-docx is missing."""
+        from core import docx_export
+        docx_export.write_docx(html, path)
+
+    def export_pdf(self, html: str, path: str, on_exported: Optional[Callable[[int, str], None]] = None):
+        try:
+            self.write_pdf(html, path)
+        except RuntimeError as e:
+            print(e)
+            return
         # report export event (2 XP) and call optional callback
         print(f"+2 XP (EXPORT_DOC). Файл: {path}")
         if on_exported:
@@ -91,14 +210,10 @@ class TemplateEngine:
 
     def export_docx(self, html: str, path: str, on_exported: Optional[Callable[[int, str], None]] = None):
         try:
-            # python-docx may be absent in some environments; silence static analysis warning
-            from docx import Document  # type: ignore[reportMissingImports]
-        except Exception:
-            print("python-docx не установлен — экспорт в DOCX невозможен в этой среде.")
+            self.write_docx(html, path)
+        except RuntimeError as e:
+            print(e)
             return
-        doc = Document()
-        doc.add_paragraph(html)  # Упрощённо
-        doc.save(path)
         print(f"+2 XP (EXPORT_DOC). Файл: {path}")
         if on_exported:
             try:
@@ -106,15 +221,16 @@ class TemplateEngine:
             except Exception:
                 pass
 
-    def generate_qr(self, url: str) -> bytes:
+    def generate_qr(self, url: str, fmt: str = "png") -> bytes:
+        try:
+            return qr_cache.shared().get(url, fmt)
+        except Exception as e:
+            raise RuntimeError(f"Ошибка генерации QR-кода: {e}")
+
+    def qr_img_tag(self, quest_id, fmt: str = "svg") -> str:
+        """Inline <img> with the quest's QR code; SVG avoids PNG encoding entirely."""
         try:
-            qr = qrcode.QRCode()
-            qr.add_data(url)
-            qr.make(fit=True)
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            img.save(buffer, format="PNG")
-            return buffer.getvalue()
+            return qr_cache.shared().img_tag(qr_cache.quest_url(quest_id), fmt)
         except Exception as e:
             raise RuntimeError(f"Ошибка генерации QR-кода: {e}")
 
@@ -0,0 +1,156 @@
+# quest_master/core/tiles.py
+"""Tile grid, tile LRU and a streaming PNG writer for large maps.
+
+Tiles are TILE_SIZE pixels square. A tile at level L covers
+TILE_SIZE * 2**L scene units, so level 0 is full resolution and each level
+up halves it; a view zoomed out to scale s draws tiles of level
+floor(log2(1/s)). All of this is plain geometry, shared by the tiled view
+and the exporters.
+"""
+import math
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Generic, Hashable, Iterator, NamedTuple, Optional, Tuple, TypeVar
+
+TILE_SIZE = 256
+LEVELS = 5
+
+Rect = Tuple[float, float, float, float]  # left, top, right, bottom
+V = TypeVar("V")
+
+
+class TileKey(NamedTuple):
+    level: int
+    col: int
+    row: int
+
+
+def tile_span(level: int, tile_size: int = TILE_SIZE) -> float:
+    """Scene units covered by one tile side at `level`."""
+    return tile_size * (1 << level)
+
+
+def level_for_scale(scale: float, levels: int = LEVELS) -> int:
+    if scale >= 1:
+        return 0
+    if scale <= 0:
+        return levels - 1
+    return min(levels - 1, int(math.floor(math.log2(1.0 / scale))))
+
+
+def tile_rect(key: TileKey, tile_size: int = TILE_SIZE) -> Rect:
+    span = tile_span(key.level, tile_size)
+    return key.col * span, key.row * span, (key.col + 1) * span, (key.row + 1) * span
+
+
+def tiles_in(rect: Rect, level: int, tile_size: int = TILE_SIZE) -> Iterator[TileKey]:
+    """Keys of the tiles at `level` that intersect `rect`, row by row."""
+    left, top, right, bottom = rect
+    if right <= left or bottom <= top:
+        return
+    span = tile_span(level, tile_size)
+    c0, c1 = math.floor(left / span), math.ceil(right / span)
+    r0, r1 = math.floor(top / span), math.ceil(bottom / span)
+    for row in range(r0, r1):
+        for col in range(c0, c1):
+            yield TileKey(level, col, row)
+
+
+def intersects(a: Rect, b: Rect) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class LRUCache(Generic[V]):
+    """Thread-safe least-recently-used cache with a fixed number of entries."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def discard_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            doomed = [key for key in self._data if predicate(key)]
+            for key in doomed:
+                del self._data[key]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class PngStreamWriter:
+    """Write an RGBA PNG row band by row band.
+
+    Only the compressor state and the current band live in memory, so a
+    40000x30000 map needs a few MB instead of a 4.8 GB image.
+    """
+
+    def __init__(self, stream: BinaryIO, width: int, height: int, level: int = 6,
+                 dpi: Optional[float] = None):
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(level)
+        stream.write(b"\x89PNG\r\n\x1a\n")
+        # 8 bits per channel, colour type 6 (RGBA), no interlace
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        if dpi:
+            # pixels per metre on both axes, unit 1 = metre
+            ppm = round(dpi / 0.0254)
+            self._chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self.stream.write(struct.pack(">I", len(data)))
+        self.stream.write(kind)
+        self.stream.write(data)
+        self.stream.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write_rows(self, data, bytes_per_line: int, rows: int) -> None:
+        """Append `rows` rows of RGBA pixels; lines may carry padding."""
+        if self.rows_written + rows > self.height:
+            raise ValueError("PNG: строк больше, чем указано в заголовке")
+        view = memoryview(data)
+        row_bytes = self.width * 4
+        parts = []
+        for y in range(rows):
+            start = y * bytes_per_line
+            # filter type 0 (None) before every row
+            parts.append(b"\x00")
+            parts.append(view[start:start + row_bytes])
+        out = self._compressor.compress(b"".join(parts))
+        if out:
+            self._chunk(b"IDAT", out)
+        self.rows_written += rows
+
+    def close(self) -> None:
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG: записано {self.rows_written} строк из {self.height}")
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
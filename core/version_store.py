@@ -0,0 +1,242 @@
+# quest_master/core/version_store.py
+"""Delta-encoded storage for `quest_versions`.
+
+Each quest has a chain of numbered versions (1, 2, 3, ...). Every
+SNAPSHOT_INTERVAL-th version is a zlib-compressed full description. The rows
+in between only store what changed since the previous version: the lengths of
+the common prefix and suffix and the replaced middle part. Typing edits are
+local, so a delta is usually a few bytes. Rebuilding version `n` reads one
+snapshot and at most SNAPSHOT_INTERVAL - 1 deltas.
+"""
+import sqlite3
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+SNAPSHOT_INTERVAL = 16
+
+KIND_SNAPSHOT = 0
+KIND_DELTA = 1
+KIND_DELTA_Z = 2  # delta whose inserted text is zlib-compressed
+
+# deltas with a longer inserted part are worth compressing
+_COMPRESS_MIN = 128
+_DELTA_HEADER = struct.Struct("<II")
+
+
+def encode_snapshot(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    # binary search with C-level slice comparisons instead of a per-char loop
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    la, lb = len(a), len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def encode_delta(old: str, new: str) -> Tuple[int, bytes]:
+    """Return (kind, payload) turning `old` into `new`."""
+    limit = min(len(old), len(new))
+    prefix = _common_prefix(old, new, limit)
+    suffix = _common_suffix(old, new, limit - prefix)
+    inserted = new[prefix:len(new) - suffix].encode("utf-8")
+    if len(inserted) >= _COMPRESS_MIN:
+        return KIND_DELTA_Z, _DELTA_HEADER.pack(prefix, suffix) + zlib.compress(inserted)
+    return KIND_DELTA, _DELTA_HEADER.pack(prefix, suffix) + inserted
+
+
+def apply_delta(old: str, kind: int, payload: bytes) -> str:
+    prefix, suffix = _DELTA_HEADER.unpack_from(payload)
+    body = payload[_DELTA_HEADER.size:]
+    if kind == KIND_DELTA_Z:
+        body = zlib.decompress(body)
+    return old[:prefix] + body.decode("utf-8") + old[len(old) - suffix:]
+
+
+def decode(kind: int, payload: bytes, previous: Optional[str]) -> str:
+    if kind == KIND_SNAPSHOT:
+        return zlib.decompress(payload).decode("utf-8")
+    if previous is None:
+        raise ValueError("Дельта без базового снимка")
+    return apply_delta(previous, kind, payload)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Add the versioning columns to a legacy table and convert its rows."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(quest_versions)")}
+    for name, ddl in (("version", "INTEGER"), ("kind", "INTEGER"), ("payload", "BLOB"), ("tag", "TEXT")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE quest_versions ADD COLUMN {name} {ddl}")
+    conn.commit()
+    if migrate(conn):
+        conn.execute("VACUUM")
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Convert rows that still hold a full `description` into the chain format.
+
+    Runs in place, in a single transaction. Returns the number of rows converted.
+    """
+    pending = conn.execute("SELECT COUNT(*) FROM quest_versions WHERE version IS NULL").fetchone()[0]
+    if not pending:
+        return 0
+    quest_ids = [row[0] for row in conn.execute(
+        "SELECT DISTINCT quest_id FROM quest_versions WHERE version IS NULL")]
+    converted = 0
+    for quest_id in quest_ids:
+        text, chain, version = _load_tail(conn, quest_id)
+        rows = conn.execute(
+            "SELECT id, description FROM quest_versions WHERE quest_id IS ? AND version IS NULL ORDER BY id",
+            (quest_id,),
+        ).fetchall()
+        updates = []
+        for row_id, description in rows:
+            version += 1
+            new_text = description or ""
+            kind, payload = _encode_next(text, new_text, chain)
+            chain = 0 if kind == KIND_SNAPSHOT else chain + 1
+            text = new_text
+            updates.append((version, kind, payload, row_id))
+        conn.executemany(
+            "UPDATE quest_versions SET version=?, kind=?, payload=?, description=NULL WHERE id=?",
+            updates,
+        )
+        converted += len(updates)
+    conn.commit()
+    return converted
+
+
+def _encode_next(previous: Optional[str], text: str, chain: int) -> Tuple[int, bytes]:
+    if previous is None or chain + 1 >= SNAPSHOT_INTERVAL:
+        return KIND_SNAPSHOT, encode_snapshot(text)
+    kind, payload = encode_delta(previous, text)
+    # small deltas win outright; only large ones are weighed against a snapshot
+    if len(payload) > _COMPRESS_MIN:
+        snapshot = encode_snapshot(text)
+        if len(payload) >= len(snapshot):
+            return KIND_SNAPSHOT, snapshot
+    return kind, payload
+
+
+def _replay(rows: List[Tuple[int, int, bytes]]) -> Optional[str]:
+    text = None
+    for _version, kind, payload in rows:
+        text = decode(kind, payload, text)
+    return text
+
+
+def _chain_rows(conn: sqlite3.Connection, quest_id: Optional[int], upto: Optional[int]) -> List[Tuple[int, int, bytes]]:
+    # rows from the latest snapshot at or below `upto` to `upto` itself
+    upto_clause = "" if upto is None else " AND version <= ?"
+    args: tuple = (quest_id,) if upto is None else (quest_id, upto)
+    row = conn.execute(
+        f"SELECT MAX(version) FROM quest_versions WHERE quest_id IS ? AND kind = {KIND_SNAPSHOT}" + upto_clause,
+        args,
+    ).fetchone()
+    if row is None or row[0] is None:
+        return []
+    return conn.execute(
+        "SELECT version, kind, payload FROM quest_versions "
+        "WHERE quest_id IS ? AND version >= ?" + upto_clause + " ORDER BY version",
+        (quest_id, row[0]) + args[1:],
+    ).fetchall()
+
+
+def _load_tail(conn: sqlite3.Connection, quest_id: Optional[int]) -> Tuple[Optional[str], int, int]:
+    """Return (latest text, deltas since its snapshot, latest version number)."""
+    rows = _chain_rows(conn, quest_id, None)
+    if not rows:
+        return None, 0, 0
+    return _replay(rows), len(rows) - 1, rows[-1][0]
+
+
+def append_version(conn: sqlite3.Connection, quest_id: int, data: Dict[str, str | int]) -> int:
+    """Record `data` as the next version of `quest_id`; returns its number."""
+    previous, chain, version = _load_tail(conn, quest_id)
+    text = str(data.get("description") or "")
+    kind, payload = _encode_next(previous, text, chain)
+    version += 1
+    conn.execute(
+        "INSERT INTO quest_versions (quest_id, version, title, difficulty, reward, kind, payload) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (quest_id, version, data["title"], data["difficulty"], data["reward"], kind, payload),
+    )
+    return version
+
+
+def get_version(conn: sqlite3.Connection, quest_id: int, n: int) -> Optional[Dict[str, str | int]]:
+    """Rebuild version `n` of a quest, or None if it does not exist."""
+    meta = conn.execute(
+        "SELECT title, difficulty, reward, created_at FROM quest_versions WHERE quest_id = ? AND version = ?",
+        (quest_id, n),
+    ).fetchone()
+    if meta is None:
+        return None
+    return {
+        "quest_id": quest_id,
+        "version": n,
+        "title": meta[0],
+        "difficulty": meta[1],
+        "reward": meta[2],
+        "description": _replay(_chain_rows(conn, quest_id, n)) or "",
+        "created_at": meta[3],
+    }
+
+
+def iter_chain(conn: sqlite3.Connection, quest_id: Optional[int]):
+    """Yield (row id, version, text, created_at, tag) for every version, oldest first."""
+    text = None
+    for row_id, version, kind, payload, created_at, tag in conn.execute(
+        "SELECT id, version, kind, payload, created_at, tag FROM quest_versions "
+        "WHERE quest_id IS ? AND version IS NOT NULL ORDER BY version",
+        (quest_id,),
+    ):
+        text = decode(kind, payload, text)
+        yield row_id, version, text, created_at, tag
+
+
+def encode_chain(chain: List[Tuple[int, str]]) -> List[Tuple[int, bytes, int]]:
+    """(kind, payload, row id) re-encoding surviving (row id, text) pairs, oldest first."""
+    previous = None
+    run = 0
+    encoded = []
+    for row_id, text in chain:
+        kind, payload = _encode_next(previous, text, run)
+        run = 0 if kind == KIND_SNAPSHOT else run + 1
+        previous = text
+        encoded.append((kind, payload, row_id))
+    return encoded
+
+
+def rewrite_chain(conn: sqlite3.Connection, chain: List[Tuple[int, str]]) -> None:
+    """Re-encode surviving (row id, text) pairs, oldest first, after rows were removed."""
+    conn.executemany("UPDATE quest_versions SET kind=?, payload=? WHERE id=?", encode_chain(chain))
+
+
+def tag_version(conn: sqlite3.Connection, quest_id: int, n: int, tag: Optional[str]) -> bool:
+    """Tag (or untag with None) a version; tagged versions survive retention."""
+    cur = conn.execute("UPDATE quest_versions SET tag=? WHERE quest_id=? AND version=?", (tag, quest_id, n))
+    return cur.rowcount > 0
+
+
+def latest_version(conn: sqlite3.Connection, quest_id: int) -> int:
+    row = conn.execute("SELECT MAX(version) FROM quest_versions WHERE quest_id = ?", (quest_id,)).fetchone()
+    return row[0] or 0
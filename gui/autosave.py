@@ -0,0 +1,126 @@
+# quest_master/gui/autosave.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+class AutosaveScheduler(QObject):
+    """Debounced, coalescing autosave that writes off the GUI thread.
+
+    Every `schedule()` call restarts a single-shot timer; only the latest data
+    is written once the editor has been quiet for `delay_ms`. Writes run one at
+    a time on a worker thread, so the quest id assigned by the first INSERT is
+    always visible to the next UPDATE. Data equal to the last write is skipped.
+    """
+
+    # (previous quest id, quest id after the write), emitted from the worker
+    # thread and delivered to GUI-thread slots through a queued connection
+    saved = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, save_func: Callable[[Optional[int], Dict], Optional[int]],
+                 delay_ms: int = 700, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._save_func = save_func
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self._lock = threading.Lock()
+        self._quest_id: Optional[int] = None
+        self._pending: Optional[Dict] = None
+        self._last_written: Optional[Dict] = None
+        self._last_future: Optional[Future] = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._submit_pending)
+
+    @property
+    def quest_id(self) -> Optional[int]:
+        with self._lock:
+            return self._quest_id
+
+    @quest_id.setter
+    def quest_id(self, value: Optional[int]) -> None:
+        # switching quests: drop whatever was queued for the previous one
+        self._timer.stop()
+        self.wait()
+        with self._lock:
+            self._quest_id = value
+            self._pending = None
+            self._last_written = None
+
+    @property
+    def delay_ms(self) -> int:
+        return self._timer.interval()
+
+    @delay_ms.setter
+    def delay_ms(self, value: int) -> None:
+        self._timer.setInterval(value)
+
+    def schedule(self, data: Dict) -> None:
+        """Remember `data` as the latest state and (re)start the quiet period."""
+        self._pending = dict(data)
+        self._timer.start()
+
+    def flush(self, wait: bool = True) -> None:
+        """Write pending changes now (e.g. on close or before export)."""
+        self._timer.stop()
+        self._submit_pending()
+        if wait:
+            self.wait()
+
+    def save_now(self, data: Dict) -> Optional[int]:
+        """Write `data` immediately on the worker and return the quest id.
+
+        Replaces anything pending. If the last write (possibly still in
+        flight) already holds `data`, it is awaited instead of repeated.
+        """
+        self._timer.stop()
+        self._pending = dict(data)
+        future = self._submit_pending()
+        if future is None:
+            self.wait()
+            # write again only if that earlier write failed
+            self._pending = dict(data)
+            future = self._submit_pending()
+        if future is not None:
+            future.result()
+        return self.quest_id
+
+    def wait(self) -> None:
+        future = self._last_future
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def shutdown(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def _submit_pending(self) -> Optional[Future]:
+        data, self._pending = self._pending, None
+        if data is None:
+            return None
+        if data == self._last_written:
+            return None
+        self._last_written = data
+        self._last_future = self._executor.submit(self._write, data)
+        return self._last_future
+
+    def _write(self, data: Dict) -> None:
+        with self._lock:
+            prev_id = self._quest_id
+        try:
+            new_id = self._save_func(prev_id, data)
+        except Exception as e:
+            # let the next edit retry instead of treating this data as saved
+            self._last_written = None
+            self.failed.emit(str(e))
+            raise
+        if new_id is not None:
+            with self._lock:
+                self._quest_id = new_id
+        self.saved.emit(prev_id, new_id)
@@ -0,0 +1,204 @@
+# quest_master/gui/export_jobs.py
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+class JobState:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINAL = (DONE, FAILED, CANCELLED)
+
+
+class ExportJob:
+    def __init__(self, job_id: int, html: str, path: str, fmt: str,
+                 on_done: Optional[Callable[["ExportJob"], None]] = None):
+        self.id = job_id
+        self.html = html
+        self.path = path
+        self.fmt = fmt
+        self.on_done = on_done
+        self.state = JobState.QUEUED
+        self.error: Optional[str] = None
+        self.progress = 0
+        self.cancel_requested = False
+        self.future: Optional[Future] = None
+
+
+class ExportJobQueue(QObject):
+    """Bounded export queue that writes PDF/DOCX files outside the GUI thread.
+
+    Each job is driven by a dispatcher thread and rendered in a worker process
+    (WeasyPrint holds the GIL for the whole render, a thread alone would still
+    freeze the window). State changes are reported through Qt signals, which
+    are delivered to slots on the GUI thread.
+
+    Output is written to `<path>.tmp` and renamed over `path` only once the
+    export succeeded, so a failed or cancelled job never touches an existing
+    file.
+    """
+
+    # how often a running job's estimated progress is updated, in seconds
+    PROGRESS_INTERVAL = 0.1
+
+    job_state_changed = pyqtSignal(int, str)
+    # job id, percent: 0 queued, 10 started, then estimated from how long the
+    # previous export of the same format took, up to 95, and 100 when finished
+    job_progress = pyqtSignal(int, int)
+    # job id, final state, output path or error message
+    job_finished = pyqtSignal(int, str, str)
+
+    def __init__(self, workers: int = 2, max_jobs: int = 8, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._dispatch = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        # multiprocessing and the renderers are imported by the first job, not at startup
+        self._processes: Optional["ProcessPoolExecutor"] = None
+        # seconds an export of each format takes (moving average), for progress estimates
+        self._durations: Dict[str, float] = {}
+        # callbacks are invoked on the GUI thread via the queued signal
+        self.job_finished.connect(self._run_callback)
+
+    def _process_pool(self) -> "ProcessPoolExecutor":
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        with self._lock:
+            if self._processes is None:
+                # "spawn": forking a process that runs a Qt event loop is unsafe
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    def active_jobs(self) -> List[ExportJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.state not in JobState.FINAL]
+
+    def job(self, job_id: int) -> Optional[ExportJob]:
+        return self._jobs.get(job_id)
+
+    def submit(self, html: str, path: str, fmt: str,
+               on_done: Optional[Callable[[ExportJob], None]] = None) -> int:
+        """Queue an export; raises RuntimeError when the queue is full."""
+        if len(self.active_jobs()) >= self.max_jobs:
+            raise RuntimeError(f"Очередь экспорта заполнена ({self.max_jobs} задач)")
+        job = ExportJob(next(self._ids), html, path, fmt, on_done)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._set_state(job, JobState.QUEUED)
+        self._progress(job, 0)
+        job.future = self._dispatch.submit(self._run, job)
+        return job.id
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued job now, or discard a running job's output once it ends."""
+        job = self._jobs.get(job_id)
+        if job is None or job.state in JobState.FINAL:
+            return False
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, JobState.CANCELLED, "")
+        return True
+
+    def cancel_all(self) -> int:
+        return sum(1 for job in self.active_jobs() if self.cancel(job.id))
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.cancel_all()
+        self._dispatch.shutdown(wait=wait, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: ExportJob) -> None:
+        from concurrent.futures.process import BrokenProcessPool
+        from core.batch_export import write_document
+        if job.cancel_requested:
+            self._finish(job, JobState.CANCELLED, "")
+            return
+        self._set_state(job, JobState.RUNNING)
+        self._progress(job, 10)
+        tmp = job.path + ".tmp"
+        try:
+            try:
+                if job.fmt == "html":
+                    write_document(job.html, tmp, job.fmt)
+                else:
+                    self._wait(job, self._process_pool().submit(write_document, job.html, tmp, job.fmt))
+                if not job.cancel_requested:
+                    os.replace(tmp, job.path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        except BrokenProcessPool as e:
+            # a crashed worker poisons the pool: start a fresh one for later jobs
+            with self._lock:
+                self._processes = None
+            self._finish(job, JobState.FAILED, str(e))
+            return
+        except Exception as e:
+            self._finish(job, JobState.FAILED, str(e))
+            return
+        if job.cancel_requested:
+            self._finish(job, JobState.CANCELLED, "")
+            return
+        self._finish(job, JobState.DONE, job.path)
+
+    def _wait(self, job: ExportJob, future: Future) -> None:
+        """Wait for a worker, estimating progress from earlier jobs of the same format."""
+        expected = self._durations.get(job.fmt)
+        start = time.monotonic()
+        while True:
+            try:
+                future.result(timeout=self.PROGRESS_INTERVAL)
+                break
+            except FutureTimeoutError:
+                if expected:
+                    self._progress(job, 10 + int(85 * min((time.monotonic() - start) / expected, 1.0)))
+        elapsed = time.monotonic() - start
+        self._durations[job.fmt] = elapsed if expected is None else 0.7 * expected + 0.3 * elapsed
+
+    def _progress(self, job: ExportJob, percent: int) -> None:
+        if percent != job.progress or percent == 0:
+            job.progress = percent
+            self.job_progress.emit(job.id, percent)
+
+    def _set_state(self, job: ExportJob, state: str) -> None:
+        job.state = state
+        self.job_state_changed.emit(job.id, state)
+
+    def _finish(self, job: ExportJob, state: str, detail: str) -> None:
+        with self._lock:
+            if job.state in JobState.FINAL:
+                return
+            job.state = state
+        if state == JobState.FAILED:
+            job.error = detail
+        job.html = ""  # the rendered document is no longer needed
+        self.job_state_changed.emit(job.id, state)
+        self._progress(job, 100)
+        self.job_finished.emit(job.id, state, detail)
+
+    def _run_callback(self, job_id: int, _state: str, _detail: str) -> None:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                pass
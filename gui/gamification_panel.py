@@ -1,51 +1,111 @@
 # quest_master/gui/gamification_panel.py
 from typing import Optional
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QProgressBar, QListWidget, QLabel
-from PyQt6.QtMultimedia import QSoundEffect
-from PyQt6.QtCore import QUrl
-from gamification import Gamification
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QProgressBar, QListWidget, QLabel, QComboBox
+from PyQt6.QtCore import QTimer, QUrl
+from core.profiles import ProfileStore, current_user
 from pathlib import Path
 from datetime import datetime
 
 
 class GamificationPanel(QWidget):
+    # XP events are written to quests.db in batches, at most this late
+    FLUSH_MS = 1000
+
     def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
-        # load persisted gamification state if present
-        self.gamification = Gamification.load()
+        # one profile per user of the machine, stored in quests.db
+        self.store = ProfileStore()
+        try:
+            # a pre-profiles gamification.json becomes the current user's profile
+            self.store.import_json("gamification.json", current_user())
+        except Exception as e:
+            print(f"Не удалось перенести gamification.json: {e}")
+        self.gamification = self.store.profile(current_user())
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(self.FLUSH_MS)
+        self._flush_timer.timeout.connect(self.flush)
         layout = QVBoxLayout()
+        self.profile_combo = QComboBox()
+        self.profile_combo.setEditable(True)
+        self.profile_combo.addItems(self.store.names())
+        self.profile_combo.setCurrentText(self.gamification.name)
+        self.profile_combo.textActivated.connect(self.switch_profile)
+        layout.addWidget(self.profile_combo)
         self.level_label = QLabel()
         layout.addWidget(self.level_label)
         self.progress = QProgressBar()
-        self.progress.setRange(0, 100)
         layout.addWidget(self.progress)
         self.achievements = QListWidget()
         layout.addWidget(self.achievements)
+        layout.addWidget(QLabel("Лучшие игроки"))
+        self.leaderboard = QListWidget()
+        layout.addWidget(self.leaderboard)
         self.setLayout(layout)
 
+        # the XP sound (and QtMultimedia with it) is loaded by the first award
+        self.sound = None
+        self._sound_loaded = False
+
+        self._show_profile()
+
+    def _load_sound(self):
+        self._sound_loaded = True
         # try to load a bundled sound
-        self.sound = QSoundEffect()
         sound_path = Path("assets/sounds/xp.wav")
-        if sound_path.exists():
-            try:
-                self.sound.setSource(QUrl.fromLocalFile(str(sound_path)))
-            except Exception:
-                pass
+        if not sound_path.exists():
+            return
+        try:
+            from PyQt6.QtMultimedia import QSoundEffect
+            self.sound = QSoundEffect(self)
+            self.sound.setSource(QUrl.fromLocalFile(str(sound_path)))
+        except Exception as e:
+            self.sound = None
+            print(f"Звук недоступен: {e}")
 
+    def _show_profile(self):
         # initialize UI from current state
         self._update_ui()
-        # populate achievements list from persisted state
+        # populate achievements list from persisted state (the latest ones)
+        self.achievements.clear()
         try:
             for a in getattr(self.gamification, 'achievements', []):
                 self.achievements.addItem(a)
         except Exception:
             pass
+        self._update_leaderboard()
+
+    def _update_leaderboard(self):
+        self.leaderboard.clear()
+        try:
+            for entry in self.store.leaderboard():
+                self.leaderboard.addItem(f"{entry.rank}. {entry.name} — {entry.xp} XP")
+        except Exception as e:
+            print(f"Не удалось загрузить таблицу лидеров: {e}")
+
+    def switch_profile(self, name: str):
+        name = name.strip()
+        if not name or name == self.gamification.name:
+            return
+        self.flush()
+        try:
+            self.gamification = self.store.profile(name)
+        except Exception as e:
+            print(f"Не удалось открыть профиль {name}: {e}")
+            return
+        self._show_profile()
 
     def _update_ui(self):
-        level = self.gamification.get_level()
-        xp = getattr(self.gamification, "xp", 0)
-        self.level_label.setText(f"{level} — {xp} XP")
-        self.progress.setValue(xp % 100)
+        info = self.gamification.level_info()
+        if info.next_xp is None:
+            self.level_label.setText(f"{info.name} — {info.xp} XP (максимальный уровень)")
+            self.progress.setRange(0, 1)
+            self.progress.setValue(1)
+            return
+        self.level_label.setText(f"{info.name} — {info.xp} XP, до «{info.next_name}» ещё {info.to_next} XP")
+        # the bar covers the current level only, from its threshold to the next
+        self.progress.setRange(0, info.span)
+        self.progress.setValue(info.xp - info.floor)
 
     def add_xp(self, amount: int, reason: str | None = None):
         # forward to logic and update UI
@@ -63,6 +123,8 @@ class GamificationPanel(QWidget):
                 last = f"{ts}  +{amount} XP  ({reason_text})"
             self.achievements.addItem(last)
             # play sound if available
+            if not self._sound_loaded:
+                self._load_sound()
             try:
                 src = None
                 try:
@@ -81,10 +143,17 @@ class GamificationPanel(QWidget):
                         pass
             except Exception:
                 pass
-            # persist state
-            try:
-                self.gamification.save()
-            except Exception:
-                pass
+            # persist with the next batch, not on every event
+            if not self._flush_timer.isActive():
+                self._flush_timer.start()
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+    def flush(self):
+        """Write pending XP events now (the timer and window close call this)."""
+        self._flush_timer.stop()
+        try:
+            if self.store.save(self.gamification):
+                self._update_leaderboard()
+        except Exception as e:
+            print(f"Не удалось сохранить опыт: {e}")
@@ -0,0 +1,47 @@
+# quest_master/gui/lazy_tabs.py
+from typing import Callable, Dict, Optional
+from PyQt6.QtWidgets import QTabWidget, QVBoxLayout, QWidget
+from core import startup
+
+
+class LazyTabWidget(QTabWidget):
+    """Tab widget whose pages are built the first time they are shown.
+
+    Each tab starts as an empty placeholder; its factory runs when the tab
+    becomes current (or when `ensure` asks for the page), and the page is
+    put inside the placeholder, so tab indexes never change.
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self._factories: Dict[int, Callable[[], QWidget]] = {}
+        self._pages: Dict[int, QWidget] = {}
+        self.currentChanged.connect(self._on_current_changed)
+
+    def add_lazy_tab(self, factory: Callable[[], QWidget], label: str) -> int:
+        placeholder = QWidget()
+        layout = QVBoxLayout(placeholder)
+        layout.setContentsMargins(0, 0, 0, 0)
+        # the first tab becomes current inside addTab, so the factory must be known by then
+        index = self.count()
+        self._factories[index] = factory
+        self.addTab(placeholder, label)
+        return index
+
+    def page(self, index: int) -> Optional[QWidget]:
+        """The page of a tab if it has been built, without building it."""
+        return self._pages.get(index)
+
+    def ensure(self, index: int) -> QWidget:
+        page = self._pages.get(index)
+        if page is None:
+            with startup.phase(f"вкладка «{self.tabText(index)}»"):
+                page = self._factories[index]()
+            del self._factories[index]
+            self._pages[index] = page
+            self.widget(index).layout().addWidget(page)
+        return page
+
+    def _on_current_changed(self, index: int):
+        if index in self._factories:
+            self.ensure(index)
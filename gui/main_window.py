@@ -1,19 +1,124 @@
 # quest_master/gui/main_window.py
-from typing import Optional
-from PyQt6.QtWidgets import QMainWindow, QTabWidget
+import threading
+from typing import TYPE_CHECKING, Optional
+from PyQt6.QtWidgets import QMainWindow
+from PyQt6.QtCore import QTimer
+from lazy_tabs import LazyTabWidget
 from quest_wizard import QuestWizard
-from map_editor import MapEditor
+if TYPE_CHECKING:
+    from map_editor import MapEditor
+    from search_panel import SearchPanel
 # Gamification panel removed per user request
 
+
+def prewarm_templates() -> None:
+    # imports Jinja2 and compiles the shipped parchments before the first export
+    try:
+        from core.template_engine import TemplateEngine
+        TemplateEngine.shared().prewarm()
+    except Exception as e:
+        print(f"Не удалось подготовить шаблоны: {e}")
+
+
 class MainWindow(QMainWindow):
-    def __init__(self, parent: Optional[QMainWindow] = None):
+    # templates are compiled in the background this long after the window appears
+    PREWARM_DELAY_MS = 500
+
+    def __init__(self, parent: Optional[QMainWindow] = None, compact_versions: Optional[int] = None):
         super().__init__(parent)
         self.setWindowTitle("Квест-мастер: Генератор приключений")
         self.setGeometry(100, 100, 1200, 800)
-        tab_widget = QTabWidget()
-        self.quest_wizard = QuestWizard(self)
-        tab_widget.addTab(self.quest_wizard, "Генератор квестов")
-        self.map_editor = MapEditor(self)
-        tab_widget.addTab(self.map_editor, "Редактор карт")
+        # tabs are built when first shown: only the quest wizard is built now
+        tab_widget = LazyTabWidget()
+        self.tab_widget = tab_widget
+        self._wizard_tab = tab_widget.add_lazy_tab(self._create_quest_wizard, "Генератор квестов")
+        self._map_tab = tab_widget.add_lazy_tab(self._create_map_editor, "Редактор карт")
+        self._search_tab = tab_widget.add_lazy_tab(self._create_search_panel, "Поиск")
         # gamification tab intentionally omitted
-        self.setCentralWidget(tab_widget)
\ No newline at end of file
+        self.setCentralWidget(tab_widget)
+        self._prewarm_scheduled = False
+        # opt-in (main.py --compact-versions N): thin old autosave versions,
+        # keeping the last N, in small background transactions
+        self.compactor = None
+        if compact_versions is not None:
+            try:
+                from core.retention import RetentionPolicy, start_background_compaction
+                self.compactor = start_background_compaction(
+                    policy=RetentionPolicy(keep_last=compact_versions),
+                    on_done=lambda report: report.rows_deleted and print(f"🧹 Очистка версий: {report}"))
+            except Exception as e:
+                print(f"Не удалось запустить очистку версий: {e}")
+
+    @property
+    def quest_wizard(self) -> QuestWizard:
+        return self.tab_widget.ensure(self._wizard_tab)
+
+    @property
+    def map_editor(self) -> "MapEditor":
+        return self.tab_widget.ensure(self._map_tab)
+
+    @property
+    def search_panel(self) -> "SearchPanel":
+        return self.tab_widget.ensure(self._search_tab)
+
+    def _create_quest_wizard(self) -> QuestWizard:
+        wizard = QuestWizard(self)
+        wizard.quest_changed.connect(self._on_quest_changed)
+        return wizard
+
+    def _create_map_editor(self) -> "MapEditor":
+        from map_editor import MapEditor
+        editor = MapEditor(self)
+        # catch up with the quest the wizard opened before the map was built
+        quest_id = self.quest_wizard.quest_id
+        if quest_id is not None:
+            editor.load_quest(quest_id)
+        return editor
+
+    def _create_search_panel(self) -> "SearchPanel":
+        from search_panel import SearchPanel
+        panel = SearchPanel(self)
+        panel.quest_selected.connect(self.open_quest)
+        return panel
+
+    def _on_quest_changed(self, quest_id: int):
+        # the map shows the markers of whichever quest the wizard has open
+        editor = self.tab_widget.page(self._map_tab)
+        if editor is not None:
+            editor.load_quest(quest_id)
+
+    def open_quest(self, quest_id: int):
+        if self.quest_wizard.load_quest(quest_id):
+            self.tab_widget.setCurrentIndex(self._wizard_tab)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._prewarm_scheduled:
+            self._prewarm_scheduled = True
+            QTimer.singleShot(self.PREWARM_DELAY_MS, self.start_prewarm)
+
+    def start_prewarm(self):
+        threading.Thread(target=prewarm_templates, name="template-prewarm", daemon=True).start()
+
+    def closeEvent(self, event):
+        wizard = self.tab_widget.page(self._wizard_tab)
+        editor = self.tab_widget.page(self._map_tab)
+        # write any autosave still waiting for its quiet period
+        try:
+            wizard.autosaver.shutdown()
+        except Exception:
+            pass
+        try:
+            wizard.export_jobs.shutdown()
+        except Exception:
+            pass
+        try:
+            if editor is not None:
+                editor.exporter.shutdown()
+        except Exception:
+            pass
+        if hasattr(self, "gamification_panel"):
+            self.gamification_panel.flush()
+        if self.compactor is not None:
+            self.compactor.stop(timeout=2)
+        super().closeEvent(event)
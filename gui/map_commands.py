@@ -0,0 +1,134 @@
+# quest_master/gui/map_commands.py
+import time
+from typing import List, Optional
+from PyQt6.QtWidgets import QGraphicsItem, QGraphicsPathItem, QGraphicsTextItem
+import database
+from core.history import Command
+from core.spatial import Location
+
+# item data keys for markers that mirror quest_locations rows
+LOCATION_ID = 0
+PLACED_HERE = 1
+
+# rough per-item cost of a scene item, for the history memory budget
+ITEM_OVERHEAD = 256
+PATH_ELEMENT_BYTES = 24
+
+
+def item_size(item: QGraphicsItem) -> int:
+    if isinstance(item, QGraphicsPathItem):
+        return ITEM_OVERHEAD + item.path().elementCount() * PATH_ELEMENT_BYTES
+    if isinstance(item, QGraphicsTextItem):
+        return ITEM_OVERHEAD + 2 * len(item.toPlainText())
+    return ITEM_OVERHEAD
+
+
+def _pop_item(editor, item: QGraphicsItem) -> None:
+    # commands run in stack order, so the item is normally the newest one
+    if editor.items and editor.items[-1] is item:
+        editor.items.pop()
+    elif item in editor.items:
+        editor.items.remove(item)
+
+
+def _delete_row(location: Location) -> None:
+    try:
+        database.delete_location(location.id)
+    except Exception as e:
+        print(f"Не удалось удалить локацию {location.id}: {e}")
+
+
+def _restore_row(location: Location) -> None:
+    try:
+        database.restore_location(location)
+    except Exception as e:
+        print(f"Не удалось восстановить локацию {location.id}: {e}")
+
+
+class AddItemCommand(Command):
+    """A brush stroke, marker or label the user added to the map.
+
+    `location` is the quest_locations row behind a marker; undo deletes
+    it and redo re-inserts it under the same id.
+    """
+
+    def __init__(self, editor, item: QGraphicsItem, text: str, location: Optional[Location] = None):
+        self.editor = editor
+        self.item = item
+        self.text = text
+        self.location = location
+        self.size = item_size(item)
+        self._row_deleted = False
+
+    def redo(self):
+        editor = self.editor
+        if self.item.scene() is None:
+            editor.scene.addItem(self.item)
+        editor.items.append(self.item)
+        if self.location is not None:
+            if self._row_deleted:
+                _restore_row(self.location)
+                self._row_deleted = False
+            editor.markers[self.location.id] = self.item
+
+    def undo(self):
+        editor = self.editor
+        _pop_item(editor, self.item)
+        if self.item.scene() is editor.scene:
+            editor.scene.removeItem(self.item)
+        if self.location is not None:
+            editor.markers.pop(self.location.id, None)
+            _delete_row(self.location)
+            self._row_deleted = True
+
+
+class EraseCommand(Command):
+    """The eraser: removes the newest item. Erases in quick succession merge."""
+
+    MERGE_SECONDS = 1.0
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.text = "Ластик"
+        # erased items, newest first, with the DB row of each marker
+        self.erased: List[QGraphicsItem] = []
+        self.rows: List[Optional[Location]] = []
+        self.at = time.monotonic()
+
+    def redo(self):
+        editor = self.editor
+        if not self.erased:
+            item = editor.items[-1]
+            self.erased.append(item)
+            self.rows.append(None)
+            self.size = item_size(item)
+        for i, item in enumerate(self.erased):
+            _pop_item(editor, item)
+            if item.scene() is editor.scene:
+                editor.scene.removeItem(item)
+            location_id = item.data(LOCATION_ID)
+            if location_id is not None:
+                editor.markers.pop(location_id, None)
+                try:
+                    self.rows[i] = database.delete_location(location_id) or self.rows[i]
+                except Exception as e:
+                    print(f"Не удалось удалить локацию {location_id}: {e}")
+
+    def undo(self):
+        editor = self.editor
+        for item, row in zip(reversed(self.erased), reversed(self.rows)):
+            editor.scene.addItem(item)
+            editor.items.append(item)
+            if row is not None:
+                _restore_row(row)
+                editor.markers[row.id] = item
+
+    def merge(self, other: Command) -> bool:
+        if not isinstance(other, EraseCommand) or other.at - self.at > self.MERGE_SECONDS:
+            return False
+        # `other` already ran: its items were erased after ours
+        self.erased += other.erased
+        self.rows += other.rows
+        self.size += other.size
+        self.at = other.at
+        return True
@@ -1,15 +1,40 @@
-from typing import Optional
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QGraphicsView, QGraphicsScene, QGraphicsPathItem, QGraphicsEllipseItem, QGraphicsTextItem, QFileDialog
-from PyQt6.QtGui import QPainterPath, QPen, QColor, QFont, QFontDatabase, QImage, QPainter
-from PyQt6.QtCore import Qt
+from typing import Dict, Optional
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QComboBox, QGraphicsScene, QGraphicsPathItem, QGraphicsEllipseItem, QGraphicsTextItem, QFileDialog
+from PyQt6.QtGui import QPainterPath, QPen, QColor, QFont, QFontDatabase, QKeySequence, QPolygonF, QShortcut
+from PyQt6.QtCore import Qt, QPointF, QRectF, QTimer
+import database
+from core import map_format
+from core.history import History
+from core.spatial import Location
+from core.map_format import Label, MapScene, Marker, Stroke
+from core.strokes import DEFAULT_TOLERANCE
+from export_jobs import JobState
+from map_commands import LOCATION_ID, PLACED_HERE, AddItemCommand, EraseCommand
+from map_export import ExportOptions, MapExportJob, MapExportQueue, with_locations
+from stroke_engine import StrokeEngine
+from tiled_view import TiledMapView
+
 
 class MapEditor(QWidget):
+    # markers are read from the R*Tree for the visible area plus this margin
+    # (a fraction of the view size), so short pans need no query at all
+    VIEWPORT_MARGIN = 0.5
+    VIEWPORT_DELAY_MS = 30
+    MAX_LOADED_MARKERS = 5000
+    # brush points closer than this to the simplified line are dropped
+    STROKE_TOLERANCE = DEFAULT_TOLERANCE
+    WORLD_SIZES = ((800, 600), (4000, 3000), (16000, 12000), (40000, 30000))
+    EXPORT_DPIS = (96, 150, 300)
+    EXPORT_QUALITY = 90
+    # estimated memory the undo history may hold before old steps are dropped
+    HISTORY_BUDGET = 32 * 1024 * 1024
+
     def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
         layout = QVBoxLayout()
         self.scene = QGraphicsScene()
-        self.view = QGraphicsView(self.scene)
-        self.scene.setSceneRect(0, 0, 800, 600)
+        self.view = TiledMapView(self.scene)
+        self.scene.setSceneRect(0, 0, *self.WORLD_SIZES[0])
         self.scene.setBackgroundBrush(QColor("#f4e4bc"))
         layout.addWidget(self.view)
         tools = QHBoxLayout()
@@ -31,14 +56,52 @@ class MapEditor(QWidget):
         eraser_btn = QPushButton("Ластик")
         eraser_btn.clicked.connect(self.erase_last)
         tools.addWidget(eraser_btn)
+        self.undo_btn = QPushButton("Отменить")
+        self.undo_btn.clicked.connect(self.undo)
+        tools.addWidget(self.undo_btn)
+        self.redo_btn = QPushButton("Повторить")
+        self.redo_btn.clicked.connect(self.redo)
+        tools.addWidget(self.redo_btn)
+        self.world_combo = QComboBox()
+        for width, height in self.WORLD_SIZES:
+            self.world_combo.addItem(f"{width}×{height}", (width, height))
+        self.world_combo.currentIndexChanged.connect(
+            lambda i: self.set_world_size(*self.world_combo.itemData(i)))
+        tools.addWidget(self.world_combo)
+        tiles_btn = QPushButton("Тайлы")
+        tiles_btn.setCheckable(True)
+        tiles_btn.toggled.connect(lambda on: setattr(self.view, "tiled", on))
+        tools.addWidget(tiles_btn)
+        tiles_export_btn = QPushButton("Экспорт тайлов")
+        tiles_export_btn.clicked.connect(self.export_map_tiles)
+        tools.addWidget(tiles_export_btn)
+        self.dpi_combo = QComboBox()
+        for dpi in self.EXPORT_DPIS:
+            self.dpi_combo.addItem(f"{dpi} dpi", dpi)
+        tools.addWidget(self.dpi_combo)
+        open_btn = QPushButton("Открыть карту")
+        open_btn.clicked.connect(self.open_map)
+        tools.addWidget(open_btn)
         save_btn = QPushButton("Сохранить карту")
         save_btn.clicked.connect(self.save_map)
         tools.addWidget(save_btn)
+        batch_btn = QPushButton("Экспорт карт квестов")
+        batch_btn.clicked.connect(self.export_quest_maps)
+        tools.addWidget(batch_btn)
         layout.addLayout(tools)
         self.setLayout(layout)
         self.mode = ""
         self.items = []
-        self.path: Optional[QPainterPath] = None
+        self.strokes = StrokeEngine(self.scene, self.STROKE_TOLERANCE, self)
+        # every edit goes through the history so undo/redo stay in step with self.items
+        # bumped on every history change; compared with the revision last saved
+        self._revision = self._saved_revision = 0
+        self.history = History(self.HISTORY_BUDGET, on_change=self._on_history_changed)
+        self._update_history_buttons()
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.undo)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.redo)
+        # image export runs on worker threads from scene snapshots
+        self.exporter = MapExportQueue(parent=self)
 
         # try to load custom font and report to console
         font_id = QFontDatabase.addApplicationFont("assets/fonts/UncialAntiqua-Regular.ttf")
@@ -49,71 +112,333 @@ class MapEditor(QWidget):
         self.font = QFont("Uncial Antiqua", 10)
         self.view.mousePressEvent = self.mouse_press
         self.view.mouseMoveEvent = self.mouse_move
+        self.view.mouseReleaseEvent = self.mouse_release
+
+        # quest markers loaded lazily around the viewport: location id -> item
+        self.quest_id: Optional[int] = None
+        self.markers: Dict[int, QGraphicsEllipseItem] = {}
+        self._loaded_rect = QRectF()
+        self._viewport_timer = QTimer(self)
+        self._viewport_timer.setSingleShot(True)
+        self._viewport_timer.setInterval(self.VIEWPORT_DELAY_MS)
+        self._viewport_timer.timeout.connect(self.refresh_markers)
+        self.view.horizontalScrollBar().valueChanged.connect(self._on_viewport_changed)
+        self.view.verticalScrollBar().valueChanged.connect(self._on_viewport_changed)
+        self.view.zoomed.connect(self._on_viewport_changed)
+
+    def set_world_size(self, width: float, height: float):
+        """Grow or shrink the canvas; never below what the items occupy."""
+        self.scene.setSceneRect(QRectF(0, 0, width, height).united(self.scene.itemsBoundingRect()))
+
+    def load_quest(self, quest_id: Optional[int]):
+        """Show the map and markers of `quest_id`; only the visible markers are read now.
+
+        Unsaved edits of the quest being left are saved to its map first. A
+        drawing made before any quest was open is kept for the new quest.
+        """
+        self.finish_stroke()
+        switching = quest_id != self.quest_id
+        if switching and self.quest_id is not None and self.modified:
+            try:
+                print(f"Карта квеста сохранена: {self.save_quest_map()}")
+            except Exception as e:
+                print(f"Не удалось сохранить карту квеста {self.quest_id}: {e}")
+        adopt = self.quest_id is None
+        for item in self.markers.values():
+            if not item.data(PLACED_HERE):
+                self.scene.removeItem(item)
+        self.markers.clear()
+        self._loaded_rect = QRectF()
+        self.quest_id = quest_id
+        if quest_id is None:
+            return
+        if switching:
+            try:
+                reader = map_format.open_quest_map(quest_id)
+                if reader is not None:
+                    # stroke points are read straight from the mapped file
+                    with reader as saved:
+                        self.apply_map(saved)
+            except Exception as e:
+                reader = None
+                print(f"Не удалось открыть карту квеста {quest_id}: {e}")
+            if reader is None and not adopt:
+                self.clear_map()
+        try:
+            bounds = database.location_bounds(quest_id)
+        except Exception:
+            bounds = None
+        if bounds is not None:
+            min_x, min_y, max_x, max_y = bounds
+            self.scene.setSceneRect(self.scene.sceneRect().united(
+                QRectF(min_x - 20, min_y - 20, max_x - min_x + 40, max_y - min_y + 40)))
+        self.refresh_markers()
+
+    def _on_viewport_changed(self, *_args):
+        if self.quest_id is None:
+            return
+        visible = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        if not self._loaded_rect.contains(visible):
+            self._viewport_timer.start()
+
+    def _marker(self, x: float, y: float, color: str) -> QGraphicsEllipseItem:
+        item = QGraphicsEllipseItem(x - 5, y - 5, 10, 10)
+        item.setBrush(QColor(color))
+        self.scene.addItem(item)
+        return item
+
+    def refresh_markers(self):
+        """Load markers around the viewport and drop those far outside it."""
+        if self.quest_id is None:
+            return
+        visible = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        dx, dy = visible.width() * self.VIEWPORT_MARGIN, visible.height() * self.VIEWPORT_MARGIN
+        area = visible.adjusted(-dx, -dy, dx, dy)
+        try:
+            locations = database.locations_in_rect(area.left(), area.top(), area.right(), area.bottom(),
+                                                   quest_id=self.quest_id, limit=self.MAX_LOADED_MARKERS)
+        except Exception as e:
+            print(f"Не удалось загрузить локации: {e}")
+            return
+        wanted = {loc.id for loc in locations}
+        for location_id in [i for i, item in self.markers.items() if i not in wanted and not item.data(PLACED_HERE)]:
+            self.scene.removeItem(self.markers.pop(location_id))
+        for loc in locations:
+            if loc.id not in self.markers:
+                item = self._marker(loc.x, loc.y, loc.type or "green")
+                item.setData(LOCATION_ID, loc.id)
+                self.markers[loc.id] = item
+        self._loaded_rect = area
 
     def mouse_press(self, event):
         pos = self.view.mapToScene(event.pos())
+        self.finish_stroke()
         if self.mode == "brush":
-            self.path = QPainterPath()
-            self.path.moveTo(pos)
-            item = QGraphicsPathItem(self.path)
-            item.setPen(QPen(QColor("brown"), 3))
-            self.scene.addItem(item)
-            self.items.append(item)
+            self.strokes.begin(pos, QPen(QColor("brown"), 3))
         elif self.mode.startswith("marker_"):
             color = self.mode.split("_")[1]
-            item = QGraphicsEllipseItem(pos.x() - 5, pos.y() - 5, 10, 10)
-            item.setBrush(QColor(color))
-            self.scene.addItem(item)
-            self.items.append(item)
-            # persist location to DB if quest_id available
+            item = self._marker(pos.x(), pos.y(), color)
+            location = None
+            # persist location to DB if a quest is open (set via load_quest)
             try:
-                parent = getattr(self, 'parent') and self.parent()
-                quest_id = None
-                if parent is not None and hasattr(parent, 'quest_wizard'):
-                    qw = parent.quest_wizard
-                    quest_id = getattr(qw, 'quest_id', None)
+                quest_id = self.quest_id
                 if quest_id is not None:
-                    import database
-                    conn = database.create_connection()
-                    cur = conn.cursor()
-                    cur.execute(
-                        "INSERT INTO quest_locations (quest_id, x, y, type) VALUES (?, ?, ?, ?)",
-                        (quest_id, float(pos.x()), float(pos.y()), color),
-                    )
-                    conn.commit()
-                    conn.close()
+                    location_id = database.add_location(quest_id, pos.x(), pos.y(), color)
+                    location = Location(location_id, quest_id, pos.x(), pos.y(), color)
+                    item.setData(LOCATION_ID, location_id)
+                    item.setData(PLACED_HERE, True)
                     print(f"Локация сохранена для квеста {quest_id}: ({pos.x():.1f},{pos.y():.1f}) {color}")
             except Exception:
                 pass
+            self.history.push(AddItemCommand(self, item, "Маркер", location))
         elif self.mode == "text":
             item = QGraphicsTextItem("Локация")
             item.setFont(self.font)
             item.setPos(pos)
+            self.history.push(AddItemCommand(self, item, "Текст"))
+
+    def scene_snapshot(self) -> MapScene:
+        """The editor's own items as plain data (DB-backed markers excluded)."""
+        self.finish_stroke()
+        rect = self.scene.sceneRect()
+        snapshot = MapScene((rect.x(), rect.y(), rect.width(), rect.height()),
+                            self.scene.backgroundBrush().color().rgba())
+        for item in self.items:
+            if isinstance(item, QGraphicsPathItem):
+                path = item.path()
+                points = []
+                for i in range(path.elementCount()):
+                    element = path.elementAt(i)
+                    points += (element.x, element.y)
+                pen = item.pen()
+                snapshot.strokes.append(Stroke(points, pen.color().rgba(), pen.widthF()))
+            elif isinstance(item, QGraphicsEllipseItem):
+                if item.data(LOCATION_ID) is not None:
+                    continue
+                r = item.rect()
+                snapshot.markers.append(Marker(r.center().x(), r.center().y(), item.brush().color().rgba(),
+                                               r.width() / 2))
+            elif isinstance(item, QGraphicsTextItem):
+                font = item.font()
+                snapshot.labels.append(Label(item.pos().x(), item.pos().y(), item.toPlainText(),
+                                             item.defaultTextColor().rgba(), font.pointSizeF(), font.family()))
+        return snapshot
+
+    @property
+    def modified(self) -> bool:
+        """True if the canvas changed since it was last loaded or saved."""
+        return self._revision != self._saved_revision
+
+    def _on_history_changed(self):
+        self._revision += 1
+        self._update_history_buttons()
+
+    def clear_map(self):
+        """Empty canvas of the current world size, with no history."""
+        self.history.clear()
+        for item in self.items:
+            if item.scene() is self.scene:
+                self.scene.removeItem(item)
+        self.items = []
+        self.strokes.cancel()
+        self.scene.setSceneRect(0, 0, *self.world_combo.currentData())
+        self.scene.setBackgroundBrush(QColor("#f4e4bc"))
+        self._saved_revision = self._revision
+
+    def apply_map(self, snapshot: MapScene):
+        """Replace the editor's items with those of a saved map."""
+        self.clear_map()
+        self.scene.setSceneRect(QRectF(*snapshot.rect))
+        self.scene.setBackgroundBrush(QColor.fromRgba(snapshot.background))
+        for stroke in snapshot.strokes:
+            path = QPainterPath()
+            path.addPolygon(QPolygonF([QPointF(x, y) for x, y in stroke.xy()]))
+            item = QGraphicsPathItem(path)
+            item.setPen(QPen(QColor.fromRgba(stroke.color), stroke.width))
+            self.scene.addItem(item)
+            self.items.append(item)
+        for marker in snapshot.markers:
+            item = QGraphicsEllipseItem(marker.x - marker.radius, marker.y - marker.radius,
+                                        marker.radius * 2, marker.radius * 2)
+            item.setBrush(QColor.fromRgba(marker.color))
+            self.scene.addItem(item)
+            self.items.append(item)
+        for label in snapshot.labels:
+            item = QGraphicsTextItem(label.text)
+            font = QFont(label.font_family or self.font.family())
+            font.setPointSizeF(label.font_size)
+            item.setFont(font)
+            item.setDefaultTextColor(QColor.fromRgba(label.color))
+            item.setPos(label.x, label.y)
             self.scene.addItem(item)
             self.items.append(item)
+        self._saved_revision = self._revision
+
+    def open_map(self):
+        """Load a .qmap file onto the canvas; it replaces the current drawing."""
+        file = QFileDialog.getOpenFileName(self, "Открыть карту", "", f"Карта (*{map_format.EXTENSION})")[0]
+        if not file:
+            return
+        try:
+            with map_format.MapReader(file) as scene:
+                self.apply_map(scene)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось открыть карту: {e}")
+            return
+        # the imported drawing is not yet saved for the open quest
+        self._saved_revision = -1
+        print(f"Карта открыта: {file}")
+
+    def export_map_tiles(self):
+        """Write the tile pyramid of the map in the background (a 40000×30000 world is ~25k tiles)."""
+        directory = QFileDialog.getExistingDirectory(self, "Папка для тайлов")
+        if not directory:
+            return
+        snapshot = self.scene_snapshot()
+        if self.quest_id is not None:
+            with_locations(snapshot, self.quest_id)
+        self.exporter.submit_tiles(snapshot, directory, on_done=self._on_tiles_done)
+        print(f"Экспорт тайлов начат: {directory}")
+
+    def _on_tiles_done(self, job: MapExportJob):
+        if job.state == JobState.DONE:
+            print(f"Тайлы карты сохранены: {job.tile_count} шт. в {job.directory}")
+        elif job.state == JobState.FAILED:
+            print(f"Не удалось сохранить тайлы: {job.error}")
+
+    def save_quest_map(self) -> Optional[str]:
+        """Save the vector map next to the DB as maps/quest_<id>.qmap."""
+        if self.quest_id is None:
+            return None
+        path = map_format.save_quest_map(self.quest_id, self.scene_snapshot())
+        self._saved_revision = self._revision
+        return path
 
     def mouse_move(self, event):
-        if self.mode == "brush" and self.path:
-            pos = self.view.mapToScene(event.pos())
-            self.path.lineTo(pos)
-            self.items[-1].setPath(self.path)
+        # buffered: the stroke engine redraws at most once per frame
+        if self.strokes.active:
+            self.strokes.add(self.view.mapToScene(event.pos()))
+
+    def mouse_release(self, event):
+        self.finish_stroke()
+
+    def finish_stroke(self):
+        item = self.strokes.finish()
+        if item is not None:
+            self.history.push(AddItemCommand(self, item, "Кисть"))
 
     def erase_last(self):
+        self.finish_stroke()
         if self.items:
-            self.scene.removeItem(self.items.pop())
+            # also deletes the quest_locations row of a marker; undo restores it
+            self.history.push(EraseCommand(self))
             print("Последний объект стерт.")
 
+    def undo(self):
+        self.finish_stroke()
+        self.history.undo()
+
+    def redo(self):
+        self.finish_stroke()
+        self.history.redo()
+
+    def _update_history_buttons(self):
+        self.undo_btn.setEnabled(self.history.can_undo)
+        self.redo_btn.setEnabled(self.history.can_redo)
+
     def save_map(self):
-        file = QFileDialog.getSaveFileName(self, "Сохранить карту", "", "PNG (*.png);;JPG (*.jpg)")[0]
-        if file:
-            image = QImage(800, 600, QImage.Format.Format_ARGB32)
-            painter = QPainter(image)
-            self.scene.render(painter)
-            painter.end()
-            image.save(file)
+        try:
+            saved = self.save_quest_map()
+            if saved:
+                print(f"Карта квеста сохранена: {saved}")
+        except Exception as e:
+            print(f"Не удалось сохранить карту квеста: {e}")
+        file = QFileDialog.getSaveFileName(self, "Сохранить карту", "",
+                                           "PNG (*.png);;JPG (*.jpg);;WebP (*.webp);;Карта (*.qmap)")[0]
+        if file.endswith(map_format.EXTENSION):
+            map_format.write_map(self.scene_snapshot(), file)
             print(f"Карта сохранена: {file}")
+        elif file:
+            try:
+                options = self.export_options(file.rsplit(".", 1)[-1])
+            except ValueError as e:
+                print(f"Не удалось сохранить карту: {e}")
+                return
+            snapshot = self.scene_snapshot()
+            if self.quest_id is not None:
+                # the snapshot skips DB-backed markers; the export includes them
+                with_locations(snapshot, self.quest_id)
+            self.exporter.submit(snapshot, file, options, on_done=self._on_export_done)
+            print(f"Экспорт карты начат: {file}")
+
+    def export_options(self, fmt: str) -> ExportOptions:
+        return ExportOptions(fmt, dpi=self.dpi_combo.currentData(), quality=self.EXPORT_QUALITY)
+
+    def export_quest_maps(self):
+        """Export the saved map of every quest into one folder, in the background."""
+        directory = QFileDialog.getExistingDirectory(self, "Папка для карт квестов")
+        if not directory:
+            return
+        try:
+            self.save_quest_map()
+        except Exception as e:
+            print(f"Не удалось сохранить карту квеста: {e}")
+        quest_ids = map_format.quest_map_ids()
+        self.exporter.submit_quests(quest_ids, directory, self.export_options("png"), on_done=self._on_export_done)
+        print(f"Экспорт карт квестов начат: {len(quest_ids)} шт. в {directory}")
+
+    def _on_export_done(self, job: MapExportJob):
+        if job.state == JobState.DONE:
+            if len(job.paths) == 1:
+                print(f"Карта сохранена: {job.paths[0]}")
+            else:
+                print(f"Сохранено карт: {len(job.paths)}, без карты: {job.skipped}")
+            for path, error in job.errors:
+                print(f"Не удалось сохранить {path}: {error}")
             if hasattr(self.parent(), "gamification_panel"):
                 try:
                     self.parent().gamification_panel.add_xp(5, "SAVE_MAP")
                 except Exception:
-                    pass
\ No newline at end of file
+                    pass
+        elif job.state == JobState.FAILED:
+            print(f"Не удалось сохранить карту: {job.error}")
@@ -0,0 +1,495 @@
+# quest_master/gui/map_export.py
+"""Map rasterization and export outside the GUI thread.
+
+The GUI thread only takes a `MapScene` snapshot (plain data, see
+core.map_format). Workers paint that snapshot with QPainter into a QImage,
+which, unlike QGraphicsScene and widgets, may be used from any thread.
+PNG is streamed band by band (memory bounded by one band); JPG and WebP
+encoders need the whole image, so they are painted into one QImage.
+"""
+import itertools
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from PyQt6.QtCore import QObject, QPointF, QRectF, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QFontMetricsF, QImage, QImageWriter, QPainter, QPen, QPolygonF
+
+import database
+from core import map_format, tiles
+from core.map_format import MapScene, Marker
+from core.tiles import PngStreamWriter
+from export_jobs import JobState
+
+FORMATS = ("png", "jpg", "webp")
+# scene units are screen pixels at 100% zoom
+SCREEN_DPI = 96.0
+# JPG/WebP are encoded from one image: refuse more than 1 GB of pixels
+MAX_IMAGE_PIXELS = 256_000_000
+# QGraphicsTextItem draws its text inside a document margin
+TEXT_MARGIN = 4.0
+MARKER_RADIUS = 5.0
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+@dataclass
+class ExportOptions:
+    fmt: str = "png"
+    dpi: float = SCREEN_DPI
+    # JPG/WebP quality 0-100, -1 for the encoder default
+    quality: int = -1
+    # PNG zlib level 0-9
+    compression: int = 6
+    # off by default, like the editor view: shape antialiasing is ~30x slower
+    antialias: bool = False
+    band_rows: int = tiles.TILE_SIZE
+
+    def __post_init__(self):
+        self.fmt = self.fmt.lower().lstrip(".")
+        if self.fmt == "jpeg":
+            self.fmt = "jpg"
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат '{self.fmt}', ожидается один из {FORMATS}")
+        if self.dpi <= 0:
+            raise ValueError("DPI должно быть положительным")
+
+    @property
+    def scale(self) -> float:
+        return self.dpi / SCREEN_DPI
+
+    def image_size(self, rect: QRectF) -> Tuple[int, int]:
+        return max(1, round(rect.width() * self.scale)), max(1, round(rect.height() * self.scale))
+
+
+class PreparedMap:
+    """A MapScene converted once to Qt geometry, with item bounds for culling."""
+
+    STROKE, MARKER, LABEL = range(3)
+
+    def __init__(self, scene: MapScene):
+        self.rect = QRectF(*scene.rect)
+        self.background = QColor.fromRgba(scene.background)
+        # (bounds, kind, geometry, pen, brush/text)
+        self.items: List[tuple] = []
+        for stroke in scene.strokes:
+            polygon = QPolygonF([QPointF(x, y) for x, y in stroke.xy()])
+            pad = stroke.width / 2 + 1
+            self.items.append((polygon.boundingRect().adjusted(-pad, -pad, pad, pad), self.STROKE, polygon,
+                               QPen(QColor.fromRgba(stroke.color), stroke.width), None))
+        for marker in scene.markers:
+            r = marker.radius
+            ellipse = QRectF(marker.x - r, marker.y - r, 2 * r, 2 * r)
+            self.items.append((ellipse.adjusted(-1, -1, 1, 1), self.MARKER, ellipse, QPen(),
+                               QColor.fromRgba(marker.color)))
+        for label in scene.labels:
+            font = QFont(label.font_family) if label.font_family else QFont()
+            font.setPointSizeF(label.font_size)
+            size = QFontMetricsF(font).size(0, label.text)
+            box = QRectF(label.x + TEXT_MARGIN, label.y + TEXT_MARGIN, size.width() + 1, size.height() + 1)
+            self.items.append((box, self.LABEL, box, QPen(QColor.fromRgba(label.color)), (font, label.text)))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def paint(self, painter: QPainter, source: QRectF) -> None:
+        """Draw the items that intersect `source` (scene units)."""
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        for bounds, kind, geometry, pen, extra in self.items:
+            if not bounds.intersects(source):
+                continue
+            painter.setPen(pen)
+            if kind == self.STROKE:
+                painter.drawPolyline(geometry)
+            elif kind == self.MARKER:
+                painter.setBrush(extra)
+                painter.drawEllipse(geometry)
+                painter.setBrush(Qt.BrushStyle.NoBrush)
+            else:
+                painter.setFont(extra[0])
+                painter.drawText(geometry, int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop), extra[1])
+
+
+def _prepared(scene: Union[MapScene, PreparedMap]) -> PreparedMap:
+    return scene if isinstance(scene, PreparedMap) else PreparedMap(scene)
+
+
+def _begin(image: QImage, prepared: PreparedMap, options: ExportOptions, y: int) -> QPainter:
+    """A painter mapping scene units onto `image`, whose first row is image row `y`."""
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+    if options.antialias:
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.translate(0, -y)
+    painter.scale(options.scale, options.scale)
+    painter.translate(-prepared.rect.left(), -prepared.rect.top())
+    return painter
+
+
+def _band_source(prepared: PreparedMap, options: ExportOptions, y: int, rows: int) -> QRectF:
+    rect, s = prepared.rect, options.scale
+    return QRectF(rect.left(), rect.top() + y / s, rect.width(), rows / s)
+
+
+def _new_image(width: int, height: int, dpi: float) -> QImage:
+    image = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+    if image.isNull():
+        raise MemoryError(f"Не удалось выделить изображение {width}x{height}")
+    dots = round(dpi / 0.0254)
+    image.setDotsPerMeterX(dots)
+    image.setDotsPerMeterY(dots)
+    return image
+
+
+def _paint_band(painter: QPainter, prepared: PreparedMap, options: ExportOptions, y: int, rows: int) -> None:
+    """Background and items of image rows [y, y + rows)."""
+    source = _band_source(prepared, options, y, rows)
+    painter.save()
+    painter.setClipRect(source)
+    # QPainter releases the GIL while filling, QImage.fill() does not:
+    # on a 768 MB image that stalled the GUI thread for ~0.4 s
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+    painter.fillRect(source, prepared.background)
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+    prepared.paint(painter, source)
+    painter.restore()
+
+
+def _check(cancelled: Optional[Callable[[], bool]]) -> None:
+    if cancelled is not None and cancelled():
+        raise ExportCancelled()
+
+
+def rasterize(scene: Union[MapScene, PreparedMap], options: Optional[ExportOptions] = None,
+              progress: Optional[ProgressCallback] = None,
+              cancelled: Optional[Callable[[], bool]] = None) -> QImage:
+    """Paint the whole map into one QImage; safe to call from any thread.
+
+    The image is painted band by band (clipped, culled) so progress and
+    cancellation are checked regularly.
+    """
+    options = options or ExportOptions()
+    prepared = _prepared(scene)
+    width, height = options.image_size(prepared.rect)
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Изображение {width}x{height} слишком большое, уменьшите DPI или сохраните в PNG")
+    image = _new_image(width, height, options.dpi)
+    painter = _begin(image, prepared, options, 0)
+    try:
+        for y in range(0, height, options.band_rows):
+            _check(cancelled)
+            rows = min(options.band_rows, height - y)
+            _paint_band(painter, prepared, options, y, rows)
+            if progress is not None:
+                progress(y + rows, height)
+    finally:
+        painter.end()
+    return image
+
+
+def write_png(scene: Union[MapScene, PreparedMap], stream, options: Optional[ExportOptions] = None,
+              progress: Optional[ProgressCallback] = None,
+              cancelled: Optional[Callable[[], bool]] = None) -> Tuple[int, int]:
+    """Stream the map as PNG into a binary file object, one band in memory at a time."""
+    options = options or ExportOptions()
+    prepared = _prepared(scene)
+    width, height = options.image_size(prepared.rect)
+    writer = PngStreamWriter(stream, width, height, options.compression, options.dpi)
+    for y in range(0, height, options.band_rows):
+        _check(cancelled)
+        rows = min(options.band_rows, height - y)
+        band = _new_image(width, rows, options.dpi)
+        painter = _begin(band, prepared, options, y)
+        _paint_band(painter, prepared, options, y, rows)
+        painter.end()
+        band = band.convertToFormat(QImage.Format.Format_RGBA8888)
+        writer.write_rows(band.constBits().asstring(band.sizeInBytes()), band.bytesPerLine(), rows)
+        if progress is not None:
+            progress(y + rows, height)
+    writer.close()
+    return width, height
+
+
+def export_map(scene: Union[MapScene, PreparedMap], path: str, options: Optional[ExportOptions] = None,
+               progress: Optional[ProgressCallback] = None,
+               cancelled: Optional[Callable[[], bool]] = None) -> str:
+    """Rasterize and write the map to `path` atomically; returns the path."""
+    options = options or ExportOptions()
+    tmp = path + ".tmp"
+    try:
+        if options.fmt == "png":
+            with open(tmp, "wb") as f:
+                write_png(scene, f, options, progress, cancelled)
+        else:
+            image = rasterize(scene, options, progress, cancelled)
+            writer = QImageWriter(tmp, options.fmt.encode())
+            writer.setQuality(options.quality)
+            if options.fmt == "jpg":
+                writer.setOptimizedWrite(True)
+                writer.setProgressiveScanWrite(True)
+            if not writer.write(image):
+                raise OSError(f"Не удалось записать {path}: {writer.errorString()}")
+            del writer
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def export_map_tiles(scene: Union[MapScene, PreparedMap], out_dir: str, levels: Iterable[int] = range(tiles.LEVELS),
+                     options: Optional[ExportOptions] = None, progress: Optional[ProgressCallback] = None,
+                     cancelled: Optional[Callable[[], bool]] = None) -> int:
+    """Write a tile pyramid `<out_dir>/<level>/<col>_<row>.<fmt>`; safe to call from any thread.
+
+    Tiles use the grid of core.tiles (level 0 is full resolution). Returns
+    the number of tiles written.
+    """
+    options = options or ExportOptions()
+    prepared = _prepared(scene)
+    rect = prepared.rect
+    keys = [key for level in levels for key in tiles.tiles_in((rect.left(), rect.top(), rect.right(), rect.bottom()),
+                                                               level)]
+    size = tiles.TILE_SIZE
+    for n, key in enumerate(keys, start=1):
+        _check(cancelled)
+        left, top, right, bottom = tiles.tile_rect(key)
+        source = QRectF(left, top, right - left, bottom - top)
+        image = _new_image(size, size, options.dpi)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+        if options.antialias:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.scale(size / source.width(), size / source.height())
+        painter.translate(-left, -top)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        painter.fillRect(source, prepared.background)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+        prepared.paint(painter, source)
+        painter.end()
+        directory = os.path.join(out_dir, str(key.level))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{key.col}_{key.row}.{options.fmt}")
+        if not image.save(path, quality=options.quality):
+            raise OSError(f"Не удалось записать {path}")
+        if progress is not None:
+            progress(n, len(keys))
+    return len(keys)
+
+
+def with_locations(scene: MapScene, quest_id: int, db_path: str = database.DB_PATH) -> MapScene:
+    """Add the quest's DB markers (quest_locations) to `scene`, growing its rect if needed."""
+    locations = database.get_locations(quest_id, path=db_path)
+    if not locations:
+        return scene
+    left, top, width, height = scene.rect
+    right, bottom = left + width, top + height
+    for x, y, kind in locations:
+        scene.markers.append(Marker(x, y, QColor(kind or "green").rgba(), MARKER_RADIUS))
+        left, top = min(left, x - 20), min(top, y - 20)
+        right, bottom = max(right, x + 20), max(bottom, y + 20)
+    scene.rect = (left, top, right - left, bottom - top)
+    return scene
+
+
+def quest_map_scene(quest_id: int, directory: str = map_format.MAPS_DIR,
+                    db_path: str = database.DB_PATH) -> Optional[MapScene]:
+    """Saved map of a quest plus its DB markers; None if the quest has neither."""
+    scene = map_format.load_quest_map(quest_id, directory)
+    if scene is None:
+        scene = MapScene()
+        if not database.get_locations(quest_id, path=db_path):
+            return None
+    return with_locations(scene, quest_id, db_path)
+
+
+class MapExportJob:
+    def __init__(self, job_id: int, targets: List[Tuple[object, str]], options: ExportOptions,
+                 directory: str, on_done: Optional[Callable[["MapExportJob"], None]] = None):
+        self.id = job_id
+        # (MapScene, or quest id whose map is loaded by the worker, output path)
+        self.targets = targets
+        self.options = options
+        self.directory = directory
+        self.on_done = on_done
+        self.state = JobState.QUEUED
+        self.error: Optional[str] = None
+        self.paths: List[str] = []
+        self.skipped = 0
+        # (output path, error) of failed files in a batch
+        self.errors: List[Tuple[str, str]] = []
+        self.cancel_requested = False
+        self.future: Optional[Future] = None
+        self.percent = 0
+        # set for a tile pyramid job: the zoom levels to write into `directory`
+        self.tile_levels: Optional[Iterable[int]] = None
+        self.tile_count = 0
+
+
+class MapExportQueue(QObject):
+    """Map image exports on worker threads, reported through Qt signals.
+
+    A job is one snapshot or a batch of quest maps. QPainter releases the
+    GIL while it rasterizes, so a thread pool is enough here (no processes).
+    """
+
+    job_state_changed = pyqtSignal(int, str)
+    # job id, percent over the whole job
+    job_progress = pyqtSignal(int, int)
+    # job id, path of a file that has just been written
+    file_exported = pyqtSignal(int, str)
+    # job id, final state, output path (directory for batches) or error message
+    job_finished = pyqtSignal(int, str, str)
+
+    def __init__(self, workers: int = 2, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, MapExportJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="map-export")
+        self.job_finished.connect(self._run_callback)
+
+    def active_jobs(self) -> List[MapExportJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.state not in JobState.FINAL]
+
+    def job(self, job_id: int) -> Optional[MapExportJob]:
+        return self._jobs.get(job_id)
+
+    def _submit(self, targets: List[Tuple[object, str]], options: Optional[ExportOptions],
+                directory: str, on_done, tile_levels: Optional[List[int]] = None) -> int:
+        job = MapExportJob(next(self._ids), targets, options or ExportOptions(), directory, on_done)
+        job.tile_levels = tile_levels
+        with self._lock:
+            self._jobs[job.id] = job
+        self._set_state(job, JobState.QUEUED)
+        self.job_progress.emit(job.id, 0)
+        job.future = self._executor.submit(self._run, job)
+        return job.id
+
+    def submit(self, scene: MapScene, path: str, options: Optional[ExportOptions] = None,
+               on_done: Optional[Callable[[MapExportJob], None]] = None) -> int:
+        """Export one snapshot; the caller must not mutate `scene` afterwards."""
+        return self._submit([(scene, path)], options, "", on_done)
+
+    def submit_quests(self, quest_ids: Iterable[int], out_dir: str, options: Optional[ExportOptions] = None,
+                      directory: str = map_format.MAPS_DIR,
+                      on_done: Optional[Callable[[MapExportJob], None]] = None) -> int:
+        """Export `<out_dir>/quest_<id>.<fmt>` for each quest; quests without a map are skipped."""
+        options = options or ExportOptions()
+        os.makedirs(out_dir, exist_ok=True)
+        targets = [(quest_id, os.path.join(out_dir, f"quest_{quest_id}.{options.fmt}")) for quest_id in quest_ids]
+        return self._submit(targets, options, directory, on_done)
+
+    def submit_tiles(self, scene: MapScene, out_dir: str, levels: Iterable[int] = range(tiles.LEVELS),
+                     options: Optional[ExportOptions] = None,
+                     on_done: Optional[Callable[[MapExportJob], None]] = None) -> int:
+        """Write the tile pyramid of one snapshot into `out_dir` (see export_map_tiles)."""
+        return self._submit([(scene, out_dir)], options, out_dir, on_done, tile_levels=list(levels))
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued job now, or a running one at its next band (or tile)."""
+        job = self._jobs.get(job_id)
+        if job is None or job.state in JobState.FINAL:
+            return False
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, JobState.CANCELLED, "")
+        return True
+
+    def cancel_all(self) -> int:
+        return sum(1 for job in self.active_jobs() if self.cancel(job.id))
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.cancel_all()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _progress(self, job: MapExportJob, index: int, fraction: float) -> None:
+        percent = int((index + fraction) * 100 / max(1, len(job.targets)))
+        if percent != job.percent:
+            job.percent = percent
+            self.job_progress.emit(job.id, percent)
+
+    def _run(self, job: MapExportJob) -> None:
+        self._set_state(job, JobState.RUNNING)
+        if job.tile_levels is not None:
+            self._run_tiles(job)
+            return
+        batch = len(job.targets) != 1 or not isinstance(job.targets[0][0], MapScene)
+        for index, (source, path) in enumerate(job.targets):
+            try:
+                _check(lambda: job.cancel_requested)
+                scene = source if isinstance(source, MapScene) else quest_map_scene(source, job.directory)
+                if scene is None:
+                    job.skipped += 1
+                    continue
+                export_map(scene, path, job.options,
+                           progress=lambda done, total, i=index: self._progress(job, i, done / total),
+                           cancelled=lambda: job.cancel_requested)
+            except ExportCancelled:
+                self._finish(job, JobState.CANCELLED, "")
+                return
+            except Exception as e:
+                if not batch:
+                    self._finish(job, JobState.FAILED, str(e))
+                    return
+                job.errors.append((path, str(e)))
+                continue
+            job.paths.append(path)
+            self.file_exported.emit(job.id, path)
+        if batch and job.errors and not job.paths:
+            self._finish(job, JobState.FAILED, job.errors[0][1])
+        elif batch:
+            self._finish(job, JobState.DONE, os.path.dirname(job.targets[0][1]) if job.targets else "")
+        else:
+            self._finish(job, JobState.DONE, job.paths[0])
+
+    def _run_tiles(self, job: MapExportJob) -> None:
+        scene, out_dir = job.targets[0]
+        try:
+            job.tile_count = export_map_tiles(scene, out_dir, job.tile_levels, job.options,
+                                              progress=lambda done, total: self._progress(job, 0, done / total),
+                                              cancelled=lambda: job.cancel_requested)
+        except ExportCancelled:
+            self._finish(job, JobState.CANCELLED, "")
+            return
+        except Exception as e:
+            self._finish(job, JobState.FAILED, str(e))
+            return
+        job.paths.append(out_dir)
+        self._finish(job, JobState.DONE, out_dir)
+
+    def _set_state(self, job: MapExportJob, state: str) -> None:
+        job.state = state
+        self.job_state_changed.emit(job.id, state)
+
+    def _finish(self, job: MapExportJob, state: str, detail: str) -> None:
+        with self._lock:
+            if job.state in JobState.FINAL:
+                return
+            job.state = state
+        if state == JobState.FAILED:
+            job.error = detail
+        # snapshots can be large: drop them once the job is over
+        job.targets = [(None, path) for _source, path in job.targets]
+        self.job_state_changed.emit(job.id, state)
+        self.job_progress.emit(job.id, 100)
+        self.job_finished.emit(job.id, state, detail)
+
+    def _run_callback(self, job_id: int, _state: str, _detail: str) -> None:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                pass
@@ -2,9 +2,11 @@
 from typing import Dict, Optional
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QComboBox, QSpinBox, QTextEdit, QDateTimeEdit, QPushButton, QMessageBox, QLabel
 from PyQt6.QtGui import QValidator, QPalette, QColor
-from PyQt6.QtCore import Qt, QDateTime
+from PyQt6.QtCore import Qt, QDateTime, pyqtSignal
 from PyQt6.QtGui import QKeySequence
-from database import create_connection, save_quest
+from database import save_quest
+from autosave import AutosaveScheduler
+from export_jobs import ExportJobQueue, JobState
 
 class TitleValidator(QValidator):
     def validate(self, input_text: str, pos: int) -> tuple:
@@ -13,8 +15,16 @@ class TitleValidator(QValidator):
         return QValidator.State.Acceptable, input_text, pos
 
 class QuestWizard(QWidget):
+    # emitted with the quest id whenever the wizard switches to another quest
+    # (opened from search or created by the first autosave)
+    quest_changed = pyqtSignal(int)
+    # quiet period after the last edit before autosave writes to the DB
+    AUTOSAVE_DELAY_MS = 700
+
     def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
+        self.autosaver = AutosaveScheduler(save_quest, self.AUTOSAVE_DELAY_MS, self)
+        self.autosaver.saved.connect(self._on_autosaved)
         layout = QVBoxLayout()
         self.title_edit = QLineEdit()
         self.title_edit.setValidator(TitleValidator())
@@ -54,7 +64,16 @@ class QuestWizard(QWidget):
         export_docx_btn = QPushButton("Экспорт в DOCX")
         export_docx_btn.clicked.connect(self.export_docx)
         te_layout.addWidget(export_docx_btn)
+        cancel_export_btn = QPushButton("Отменить экспорт")
+        cancel_export_btn.clicked.connect(self.cancel_exports)
+        te_layout.addWidget(cancel_export_btn)
         layout.addLayout(te_layout)
+        # background export jobs: the window stays responsive during PDF renders
+        self.export_status = QLabel("")
+        layout.addWidget(self.export_status)
+        self.export_jobs = ExportJobQueue(parent=self)
+        self.export_jobs.job_state_changed.connect(self._update_export_status)
+        self.export_jobs.job_progress.connect(self._on_export_progress)
         try:
             from PyQt6.QtWidgets import QShortcut
             QShortcut(QKeySequence("Ctrl+Return"), self, self.create_quest)
@@ -62,38 +81,76 @@ class QuestWizard(QWidget):
             # QShortcut may be unavailable in some PyQt builds; ignore if so
             pass
         self.setLayout(layout)
-        self.quest_id: Optional[int] = None
 
         # initial styles
         self.clear_error_style(self.title_edit)
         self.clear_error_style(self.description_edit)
 
+    @property
+    def quest_id(self) -> Optional[int]:
+        return self.autosaver.quest_id
+
+    @quest_id.setter
+    def quest_id(self, value: Optional[int]) -> None:
+        self.autosaver.quest_id = value
+
     def autosave(self):
-        data = self.get_data()
+        # only remembers the latest state; the scheduler writes it off the GUI
+        # thread once editing pauses, so typing never waits for the disk
+        self.autosaver.schedule(self.get_data())
+
+    def flush_autosave(self):
         try:
-            prev_id = self.quest_id
-            new_id = save_quest(self.quest_id, data)
-            if new_id is not None:
-                self.quest_id = new_id
-                print(f"✅ Автосохранение: ID {self.quest_id}")
-            # if record was created now (prev_id was None -> new_id assigned), award XP
-            if prev_id is None and self.quest_id is not None:
-                if hasattr(self.parent(), "gamification_panel"):
-                    try:
-                        self.parent().gamification_panel.add_xp(3, "CREATE_QUEST")
-                    except Exception:
-                        pass
+            self.autosaver.flush()
         except Exception:
-            # ignore autosave failures silently (could log)
             pass
 
-    def on_description_changed(self):
+    def _on_autosaved(self, prev_id: Optional[int], new_id: Optional[int]):
+        if new_id is not None:
+            print(f"✅ Автосохранение: ID {new_id}")
+        # if record was created now (prev_id was None -> new_id assigned), award XP
+        if prev_id is None and new_id is not None:
+            self.quest_changed.emit(new_id)
+            if hasattr(self.parent(), "gamification_panel"):
+                try:
+                    self.parent().gamification_panel.add_xp(3, "CREATE_QUEST")
+                except Exception:
+                    pass
+
+    def load_quest(self, quest_id: int) -> bool:
+        """Open an existing quest for editing without triggering an autosave."""
+        from database import get_quest
+        self.flush_autosave()
+        quest = get_quest(quest_id)
+        if quest is None:
+            return False
+        self.quest_id = quest_id
+        widgets = (self.title_edit, self.difficulty_combo, self.reward_spin, self.description_edit, self.deadline_edit)
+        for w in widgets:
+            w.blockSignals(True)
+        try:
+            self.title_edit.setText(quest["title"] or "")
+            self.difficulty_combo.setCurrentText(quest["difficulty"] or "Легкий")
+            self.reward_spin.setValue(int(quest["reward"] or 0))
+            self.description_edit.setPlainText(quest["description"] or "")
+            deadline = QDateTime.fromString(quest["deadline"] or "", Qt.DateFormat.ISODate)
+            if deadline.isValid():
+                self.deadline_edit.setDateTime(deadline)
+        finally:
+            for w in widgets:
+                w.blockSignals(False)
+        self.on_description_changed(autosave=False)
+        self.quest_changed.emit(quest_id)
+        return True
+
+    def on_description_changed(self, autosave: bool = True):
         text = self.description_edit.toPlainText()
         words = len([w for w in text.split() if w.strip()])
         chars = len(text)
         self.counter_label.setText(f"Слова: {words} / 50 — Символы: {chars}")
         # autosave after updating counter
-        self.autosave()
+        if autosave:
+            self.autosave()
 
     def get_data(self) -> Dict[str, str | int]:
         return {
@@ -132,18 +189,11 @@ class QuestWizard(QWidget):
             return
         data = self.get_data()
         try:
-            prev_id = self.quest_id
-            new_id = save_quest(self.quest_id, data)
-            if new_id is not None:
-                self.quest_id = new_id
+            # supersedes the pending autosave; nothing is written if the last
+            # autosave already stored this data. XP for a newly created
+            # record is awarded once, by _on_autosaved
+            self.autosaver.save_now(data)
             QMessageBox.information(self, "Успех", "Квест создан!")
-            # If the quest didn't exist before and wasn't created via autosave,
-            # award XP now (avoid double-award if autosave already did it)
-            if prev_id is None and hasattr(self.parent(), "gamification_panel"):
-                try:
-                    self.parent().gamification_panel.add_xp(3, "CREATE_QUEST")
-                except Exception:
-                    pass
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить квест: {e}")
 
@@ -156,49 +206,87 @@ class QuestWizard(QWidget):
 
     def export_pdf(self):
         from PyQt6.QtWidgets import QFileDialog
+        self.flush_autosave()
         if self.quest_id is None:
             QMessageBox.warning(self, "Внимание", "Сначала создайте квест (сохраните).")
             return
         data = self.get_data()
         te = None
         try:
-            from template_engine import TemplateEngine
-            te = TemplateEngine()
+            from core.template_engine import TemplateEngine
+            te = TemplateEngine.shared()
         except Exception:
             QMessageBox.critical(self, "Ошибка", "TemplateEngine недоступен")
             return
         html = te.render(self.template_combo.currentText(), data)
         # embed QR if possible
         try:
-            url = f"http://example.com/quest/{self.quest_id}"
-            from base64 import b64encode
-            img = te.generate_qr(url)
-            b64 = b64encode(img).decode('ascii')
-            html = f'<img src="data:image/png;base64,{b64}" alt="QR" />' + html
+            html = te.qr_img_tag(self.quest_id) + html
         except Exception:
             pass
         default = self._get_default_parchment_path('pdf')
         path, _ = QFileDialog.getSaveFileName(self, "Сохранить PDF", default, "PDF Files (*.pdf)")
         if path:
-            te.export_pdf(html, path, on_exported=self._on_exported)
+            self._submit_export(html, path, 'pdf')
 
     def export_docx(self):
         from PyQt6.QtWidgets import QFileDialog
+        self.flush_autosave()
         if self.quest_id is None:
             QMessageBox.warning(self, "Внимание", "Сначала создайте квест (сохраните).")
             return
         data = self.get_data()
         try:
-            from template_engine import TemplateEngine
-            te = TemplateEngine()
+            from core.template_engine import TemplateEngine
+            te = TemplateEngine.shared()
         except Exception:
             QMessageBox.critical(self, "Ошибка", "TemplateEngine недоступен")
             return
         html = te.render(self.template_combo.currentText(), data)
+        # Word cannot show SVG, so the DOCX gets the cached PNG QR code
+        try:
+            html = te.qr_img_tag(self.quest_id, "png") + html
+        except Exception:
+            pass
         default = self._get_default_parchment_path('docx')
         path, _ = QFileDialog.getSaveFileName(self, "Сохранить DOCX", default, "Word Files (*.docx)")
         if path:
-            te.export_docx(html, path, on_exported=self._on_exported)
+            self._submit_export(html, path, 'docx')
+
+    def _submit_export(self, html: str, path: str, fmt: str):
+        try:
+            self.export_jobs.submit(html, path, fmt, on_done=self._on_export_job_done)
+        except RuntimeError as e:
+            QMessageBox.warning(self, "Внимание", str(e))
+
+    def _on_export_job_done(self, job):
+        if job.state == JobState.DONE:
+            # report export event (2 XP), as the synchronous export used to
+            print(f"+2 XP (EXPORT_DOC). Файл: {job.path}")
+            self._on_exported(2, "EXPORT_DOC")
+        elif job.state == JobState.FAILED:
+            print(f"Экспорт не удался: {job.error}")
+            self.export_status.setText(f"Ошибка экспорта: {job.error}")
+
+    def _update_export_status(self, _job_id: int, _state: str):
+        active = self.export_jobs.active_jobs()
+        running = [job for job in active if job.state == JobState.RUNNING]
+        if active:
+            progress = f" ({min(job.progress for job in running)}%)" if running else ""
+            self.export_status.setText(
+                f"Экспорт: выполняется {len(running)}{progress}, в очереди {len(active) - len(running)}")
+        elif _state != JobState.FAILED:
+            self.export_status.setText("")
+
+    def _on_export_progress(self, job_id: int, percent: int):
+        # the final 100% comes with the state change, which already updated the label
+        if percent < 100:
+            self._update_export_status(job_id, JobState.RUNNING)
+
+    def cancel_exports(self):
+        cancelled = self.export_jobs.cancel_all()
+        if cancelled:
+            print(f"Отменено задач экспорта: {cancelled}")
 
     def _on_exported(self, xp: int, reason: str):
         if hasattr(self.parent(), 'gamification_panel'):
@@ -0,0 +1,81 @@
+# quest_master/gui/search_panel.py
+from typing import Optional
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QComboBox, QSpinBox, QCheckBox,
+                             QListWidget, QListWidgetItem, QLabel)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+import database
+
+
+class SearchPanel(QWidget):
+    """Search box over quests (FTS5); double-click a result to open it."""
+
+    quest_selected = pyqtSignal(int)
+    SEARCH_DELAY_MS = 200
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        layout = QVBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Поиск квестов…")
+        self.query_edit.textChanged.connect(self.schedule_search)
+        layout.addWidget(self.query_edit)
+        filters = QHBoxLayout()
+        self.difficulty_combo = QComboBox()
+        self.difficulty_combo.addItems(["Любая сложность", "Легкий", "Средний", "Сложный", "Эпический"])
+        self.difficulty_combo.currentTextChanged.connect(self.schedule_search)
+        filters.addWidget(self.difficulty_combo)
+        filters.addWidget(QLabel("Награда от"))
+        self.reward_min = QSpinBox()
+        self.reward_min.setRange(0, 10000)
+        self.reward_min.valueChanged.connect(self.schedule_search)
+        filters.addWidget(self.reward_min)
+        filters.addWidget(QLabel("до"))
+        self.reward_max = QSpinBox()
+        self.reward_max.setRange(0, 10000)
+        self.reward_max.setValue(10000)
+        self.reward_max.valueChanged.connect(self.schedule_search)
+        filters.addWidget(self.reward_max)
+        self.versions_check = QCheckBox("Искать в истории версий")
+        self.versions_check.toggled.connect(self.schedule_search)
+        filters.addWidget(self.versions_check)
+        layout.addLayout(filters)
+        self.results = QListWidget()
+        self.results.itemDoubleClicked.connect(self._on_item_activated)
+        layout.addWidget(self.results)
+        self.setLayout(layout)
+
+        # run the query once typing pauses, not on every keystroke
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.SEARCH_DELAY_MS)
+        self._timer.timeout.connect(self.run_search)
+
+    def schedule_search(self, *_args):
+        self._timer.start()
+
+    def run_search(self):
+        difficulty = self.difficulty_combo.currentText()
+        try:
+            hits = database.search_quests(
+                self.query_edit.text(),
+                difficulty=None if self.difficulty_combo.currentIndex() == 0 else difficulty,
+                reward_min=self.reward_min.value() or None,
+                reward_max=self.reward_max.value() if self.reward_max.value() < 10000 else None,
+                include_versions=self.versions_check.isChecked(),
+                highlight=("«", "»"),
+            )
+        except Exception as e:
+            self.results.clear()
+            self.results.addItem(f"Ошибка поиска: {e}")
+            return
+        self.results.clear()
+        for hit in hits:
+            version = f" (версия {hit.version})" if hit.version else ""
+            item = QListWidgetItem(f"#{hit.quest_id} {hit.title}{version} — {hit.difficulty}, {hit.reward} зол.\n{hit.snippet}")
+            item.setData(Qt.ItemDataRole.UserRole, hit.quest_id)
+            self.results.addItem(item)
+
+    def _on_item_activated(self, item: QListWidgetItem):
+        quest_id = item.data(Qt.ItemDataRole.UserRole)
+        if quest_id is not None:
+            self.quest_selected.emit(int(quest_id))
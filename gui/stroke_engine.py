@@ -0,0 +1,117 @@
+# quest_master/gui/stroke_engine.py
+from typing import List, Optional, Tuple
+from PyQt6.QtWidgets import QGraphicsItem, QGraphicsPathItem, QGraphicsScene
+from PyQt6.QtGui import QPainterPath, QPen, QPolygonF
+from PyQt6.QtCore import QObject, QPointF, QTimer
+from core.strokes import DEFAULT_TOLERANCE, RadialFilter, simplify
+
+
+class StrokeEngine(QObject):
+    """Incremental brush strokes for a QGraphicsScene.
+
+    Mouse points are only buffered; a frame timer appends them to the live
+    item at most once per frame. The live item holds a short tail of the
+    stroke: every SEGMENT_POINTS points it is frozen as-is and a new tail
+    starts, so each update costs the same however long the stroke gets.
+    `finish` replaces the pieces with one simplified, cached item.
+    """
+
+    FRAME_MS = 16
+    SEGMENT_POINTS = 256
+
+    def __init__(self, scene: QGraphicsScene, tolerance: float = DEFAULT_TOLERANCE, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.scene = scene
+        self.tolerance = tolerance
+        self._filter = RadialFilter(tolerance)
+        self._points: List[Tuple[float, float]] = []
+        self._pending: List[Tuple[float, float]] = []
+        self._segments: List[QGraphicsPathItem] = []
+        self._tail: Optional[QGraphicsPathItem] = None
+        self._tail_path: Optional[QPainterPath] = None
+        self._tail_count = 0
+        self._pen = QPen()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.FRAME_MS)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def active(self) -> bool:
+        return self._tail is not None
+
+    def begin(self, pos: QPointF, pen: QPen):
+        # callers finish() the previous stroke first to keep its item
+        self.cancel()
+        self._pen = QPen(pen)
+        self._filter = RadialFilter(self.tolerance)
+        self._filter.accept(pos.x(), pos.y())
+        self._points = [(pos.x(), pos.y())]
+        self._start_tail(pos.x(), pos.y())
+
+    def add(self, pos: QPointF):
+        if self._tail is None or not self._filter.accept(pos.x(), pos.y()):
+            return
+        self._pending.append((pos.x(), pos.y()))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _start_tail(self, x: float, y: float):
+        self._tail_path = QPainterPath()
+        self._tail_path.moveTo(x, y)
+        self._tail = QGraphicsPathItem(self._tail_path)
+        self._tail.setPen(self._pen)
+        self.scene.addItem(self._tail)
+        self._tail_count = 1
+
+    def flush(self):
+        """Draw the buffered points (the frame timer calls this)."""
+        self._timer.stop()
+        if self._tail is None or not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self._points.extend(pending)
+        for x, y in pending:
+            if self._tail_count >= self.SEGMENT_POINTS:
+                self._tail.setPath(self._tail_path)
+                self._segments.append(self._tail)
+                last = self._tail_path.currentPosition()
+                self._start_tail(last.x(), last.y())
+            self._tail_path.lineTo(x, y)
+            self._tail_count += 1
+        self._tail.setPath(self._tail_path)
+
+    def finish(self) -> Optional[QGraphicsPathItem]:
+        """End the stroke; returns the committed item (None if no stroke)."""
+        if self._tail is None:
+            return None
+        self.flush()
+        points = simplify(self._points, self.tolerance)
+        self._remove_pieces()
+        path = QPainterPath()
+        if len(points) == 1:
+            path.moveTo(*points[0])
+        else:
+            path.addPolygon(QPolygonF([QPointF(x, y) for x, y in points]))
+        item = QGraphicsPathItem(path)
+        item.setPen(self._pen)
+        # the finished stroke never changes: repaint it from a pixmap cache
+        item.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.scene.addItem(item)
+        self._points = []
+        return item
+
+    def cancel(self):
+        self._timer.stop()
+        self._pending = []
+        self._points = []
+        self._remove_pieces()
+
+    def _remove_pieces(self):
+        for item in self._segments + ([self._tail] if self._tail is not None else []):
+            if item.scene() is self.scene:
+                self.scene.removeItem(item)
+        self._segments = []
+        self._tail = None
+        self._tail_path = None
+        self._tail_count = 0
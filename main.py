@@ -1,56 +1,85 @@
 # quest_master/main.py
-import sys
+import argparse
 import os
-# Ensure the script directory is on sys.path so local modules import reliably
-sys.path.insert(0, os.path.dirname(__file__) or os.getcwd())
-from PyQt6.QtWidgets import QApplication
-
-# Ensure project root is on sys.path so package imports like `gui.*` resolve
-base_dir = os.path.dirname(__file__) or os.getcwd()
-if base_dir not in sys.path:
-    sys.path.insert(0, base_dir)
-
-# Try to import the window from the `gui` package (preferred).
-try:
-    # Some modules inside `gui/` use bare imports (e.g., `from quest_wizard import ...`).
-    # To support that style, ensure `gui/` directory itself is on sys.path too.
-    gui_dir = os.path.join(base_dir, 'gui')
-    if gui_dir not in sys.path:
-        sys.path.insert(0, gui_dir)
-    from gui.main_window import MainWindow
-except Exception:
-    # Fallback: try to load gui/main_window.py directly from disk.
-    import importlib.util
-    from pathlib import Path
-    base = Path(__file__).resolve().parent
-    mod_path = str(base.joinpath('gui', 'main_window.py'))
-    spec = importlib.util.spec_from_file_location('gui.main_window', mod_path)
-    if spec and spec.loader:
-        mw = importlib.util.module_from_spec(spec)
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# the project root for `core.*`/`gui.*`, and gui/ itself: modules inside gui/
+# use bare imports of each other (e.g. `from quest_wizard import ...`)
+for _path in (os.path.join(BASE_DIR, "gui"), BASE_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from core import startup  # noqa: E402
+
+# heavy modules that must not be imported before the first window
+DEFERRED_MODULES = ("jinja2", "qrcode", "weasyprint", "docx", "PyQt6.QtMultimedia", "map_editor", "search_panel")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Квест-мастер: Генератор приключений")
+    parser.add_argument("--profile-startup", nargs="?", const="", metavar="JSON",
+                        help="вывести время импорта и инициализации (и записать его в JSON, если указан файл)")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="закрыть программу сразу после появления окна")
+    from core.retention import RetentionPolicy
+    parser.add_argument("--compact-versions", nargs="?", type=int, const=RetentionPolicy.keep_last, metavar="N",
+                        help="проредить старые версии квестов в фоне, сохранив N последних "
+                             f"(по умолчанию {RetentionPolicy.keep_last})")
+    # everything else (e.g. -style) is for Qt
+    args, qt_args = parser.parse_known_args(argv[1:])
+    return args, argv[:1] + qt_args
+
+
+def main(argv=None) -> int:
+    argv = sys.argv if argv is None else argv
+    args, qt_argv = parse_args(argv)
+    profiling = args.profile_startup is not None
+    profiler = startup.StartupProfiler()
+    startup.activate(profiler)
+    if profiling:
+        profiler.track_imports()
+
+    with profiler.phase("импорт PyQt6"):
+        from PyQt6.QtCore import QTimer
+        from PyQt6.QtWidgets import QApplication
+    with profiler.phase("импорт главного окна"):
+        from gui.main_window import MainWindow
+    with profiler.phase("QApplication"):
+        app = QApplication(qt_argv)
+    with profiler.phase("тема оформления"):
+        # Try to load an application-wide stylesheet (blue theme)
         try:
-            spec.loader.exec_module(mw)
-            MainWindow = getattr(mw, 'MainWindow')
-        except FileNotFoundError:
-            # As last resort, read-and-exec the file content
-            with open(mod_path, 'r', encoding='utf-8') as f:
-                src = f.read()
-            mw_globals = {}
-            exec(compile(src, mod_path, 'exec'), mw_globals)
-            MainWindow = mw_globals.get('MainWindow')
-            if MainWindow is None:
-                raise
-    else:
-        raise
+            with open("assets/theme_blue.qss", "r", encoding="utf-8") as f:
+                app.setStyleSheet(f.read())
+        except Exception:
+            # fallback: no stylesheet
+            pass
+    with profiler.phase("главное окно"):
+        window = MainWindow(compact_versions=args.compact_versions)
+    with profiler.phase("показ окна"):
+        window.show()
+
+    def on_first_window():
+        # the first event loop turn after show(): the window has been laid out and painted
+        profiler.mark("первое окно")
+        profiler.stop_imports()
+        profiler.info["Отложенные модули"] = [m for m in DEFERRED_MODULES if m not in sys.modules]
+        profiler.info["Загружены до окна"] = [m for m in DEFERRED_MODULES if m in sys.modules]
+        if profiling:
+            print(profiler.report())
+            if args.profile_startup:
+                try:
+                    profiler.write_json(args.profile_startup)
+                except OSError as e:
+                    print(f"Не удалось записать профиль запуска: {e}")
+        if args.exit_after_startup:
+            window.close()
+            app.quit()
+
+    QTimer.singleShot(0, on_first_window)
+    return app.exec()
+
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    # Try to load an application-wide stylesheet (blue theme)
-    try:
-        with open("assets/theme_blue.qss", "r", encoding="utf-8") as f:
-            app.setStyleSheet(f.read())
-    except Exception:
-        # fallback: no stylesheet
-        pass
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(main())
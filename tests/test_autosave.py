@@ -0,0 +1,62 @@
+# autosave scheduler: debounce, unchanged-data skip, flush, save_now, shutdown
+import threading
+import time
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt6.QtCore")
+
+from gui.autosave import AutosaveScheduler  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def saver(app):
+    writes = []
+    lock = threading.Lock()
+
+    def save(quest_id, data):
+        with lock:
+            writes.append((quest_id, data["title"]))
+        return quest_id or 1
+
+    scheduler = AutosaveScheduler(save, delay_ms=30)
+    yield scheduler, writes
+    scheduler.shutdown()
+
+
+def pump(ms):
+    deadline = time.monotonic() + ms / 1000
+    while time.monotonic() < deadline:
+        QtCore.QCoreApplication.processEvents()
+        time.sleep(0.005)
+
+
+def test_debounce_coalesces_and_skips_unchanged(saver):
+    scheduler, writes = saver
+    for title in ("a", "ab", "abc"):
+        scheduler.schedule({"title": title})
+    pump(150)
+    scheduler.wait()
+    assert writes == [(None, "abc")] and scheduler.quest_id == 1
+    scheduler.schedule({"title": "abc"})
+    pump(150)
+    assert writes == [(None, "abc")]
+
+
+def test_flush_save_now_and_shutdown(saver):
+    scheduler, writes = saver
+    scheduler.schedule({"title": "x"})
+    scheduler.flush()
+    assert writes == [(None, "x")]
+    # what create_quest does after an autosave: no second identical version
+    assert scheduler.save_now({"title": "x"}) == 1
+    assert writes == [(None, "x")]
+    assert scheduler.save_now({"title": "y"}) == 1
+    scheduler.schedule({"title": "z"})
+    scheduler.shutdown()
+    assert writes == [(None, "x"), (1, "y"), (1, "z")]
@@ -0,0 +1,72 @@
+# batch export engine: process-pool ordering, per-item errors, progress, document boundaries
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from core import batch_export
+from core.batch_export import (dummy_quests, export_batch, iter_export, stream_render, write_stream_to_archive,
+                                write_stream_to_dir)
+
+
+def test_process_pool_keeps_input_order(tmp_path):
+    ids = [r.quest_id for r in iter_export(dummy_quests(range(1, 21)), out_dir=str(tmp_path), workers=2,
+                                           chunk_size=3, max_pending=1)]
+    assert ids == list(range(1, 21))
+    assert len(list(tmp_path.iterdir())) == 20
+
+
+def test_unordered_yields_finished_chunks_first(tmp_path, monkeypatch):
+    export_chunk = batch_export._export_chunk
+
+    def slow_first(chunk, *args):
+        if chunk[0]["id"] == 1:
+            time.sleep(0.3)
+        return export_chunk(chunk, *args)
+
+    monkeypatch.setattr(batch_export, "_export_chunk", slow_first)
+    with ThreadPoolExecutor(2) as pool:
+        ids = [r.quest_id for r in iter_export(dummy_quests(range(1, 7)), out_dir=str(tmp_path), ordered=False,
+                                               chunk_size=3, executor=pool)]
+    assert ids == [4, 5, 6, 1, 2, 3]
+
+
+def test_errors_are_reported_per_item_and_per_chunk(tmp_path, monkeypatch):
+    quests = list(dummy_quests(range(1, 7)))
+    # its output path points into a directory that does not exist
+    quests[1]["id"] = "нет/2"
+    seen = []
+    report = export_batch(quests, out_dir=str(tmp_path), workers=0, chunk_size=3,
+                          progress=lambda count, result: seen.append((count, result.ok)))
+    assert (report.done, report.failed) == (5, 1) and report.errors[0].quest_id == "нет/2"
+    assert seen == [(1, True), (2, False), (3, True), (4, True), (5, True), (6, True)]
+
+    def broken(chunk, *args):
+        if chunk[0]["id"] == 4:
+            raise RuntimeError("worker died")
+        return [batch_export.ExportResult(q["id"], "ok") for q in chunk]
+
+    monkeypatch.setattr(batch_export, "_export_chunk", broken)
+    with ThreadPoolExecutor(1) as pool:
+        report = export_batch(dummy_quests(range(1, 7)), out_dir=str(tmp_path), chunk_size=3, executor=pool,
+                              progress=lambda count, result: 1 / 0)
+    assert [e.quest_id for e in report.errors] == [4, 5, 6] and "worker died" in report.errors[0].error
+
+
+def test_documents_with_the_same_id_stay_separate(tmp_path):
+    quests = [dict(q, id=None) for q in dummy_quests(range(1, 4))]
+    documents = [(quest_id, "".join(pieces)) for quest_id, pieces in batch_export._documents(stream_render(quests))]
+    assert [quest_id for quest_id, _html in documents] == [None] * 3
+    for quest, (_id, html) in zip(quests, documents):
+        assert html.count("<html") == 1 and html.rstrip().endswith("</html>") and quest["title"] in html
+
+    names = ["quest_None.html", "quest_None_2.html", "quest_None_3.html"]
+    assert write_stream_to_dir(stream_render(quests), str(tmp_path / "dir")) == 3
+    assert sorted(p.name for p in (tmp_path / "dir").iterdir()) == names
+    assert [(tmp_path / "dir" / name).read_text(encoding="utf-8") for name in names] == [d[1] for d in documents]
+    assert write_stream_to_archive(stream_render(quests), str(tmp_path / "a.zip")) == 3
+    with zipfile.ZipFile(tmp_path / "a.zip") as zf:
+        assert zf.namelist() == names
+    write_stream_to_archive(stream_render(quests), str(tmp_path / "a.tar"), "tar")
+    with tarfile.open(tmp_path / "a.tar") as tf:
+        assert tf.getnames() == names
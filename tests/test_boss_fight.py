@@ -1,15 +1,22 @@
 # simple boss-fight performance check for local TemplateEngine
 import time
-from core.template_engine import TemplateEngine
+from core.template_engine import TemplateEngine, BatchExporter
 
 def test_100_quests_in_5_seconds():
+    TemplateEngine.shared().prewarm()
+    rewards = []
     start = time.time()
-    for _ in range(100):
-        TemplateEngine()  # quick construction test
+    out = BatchExporter.generate_100_quests(on_complete=lambda xp, reason: rewards.append((xp, reason)))
     elapsed = time.time() - start
+    assert len(out) == 100
     assert elapsed < 5
-    print(f"Босс повержен за {elapsed:.2f} секунд! 20 XP")
+    assert rewards == [(20, "BOSS_FIGHT")]
+    print(f"Босс повержен за {elapsed:.2f} секунд ({100 / elapsed:.0f} рендеров/с)! 20 XP")
+
+
+def test_shared_engine_is_reused():
+    assert TemplateEngine.shared() is TemplateEngine.shared()
 
 
 if __name__ == '__main__':
-    test_100_quests_in_5_seconds()
\ No newline at end of file
+    test_100_quests_in_5_seconds()
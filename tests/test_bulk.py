@@ -0,0 +1,62 @@
+# bulk import/export: batched upserts by title, JSON Lines / CSV round trips
+import pytest
+
+from core import bulk, database
+from core.template_engine import TemplateEngine
+
+
+@pytest.fixture(autouse=True)
+def _close_pools():
+    yield
+    database.close_pools()
+
+
+@pytest.mark.parametrize("fmt", bulk.FORMATS)
+def test_export_import_round_trip(tmp_path, fmt):
+    source, target = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    report = bulk.save_quests((TemplateEngine.generate_dummy_quest(i) for i in range(250)), batch_size=100, path=source)
+    assert (report.processed, report.failed, report.batches) == (250, 0, 3)
+    dump = str(tmp_path / f"quests.{fmt}")
+    assert bulk.export_quests(dump, path=source) == 250
+    assert bulk.import_quests(dump, path=target).processed == 250
+    strip = lambda q: {k: q[k] for k in bulk.FIELDS}  # noqa: E731
+    assert [strip(q) for q in database.iter_quests(path=target)] == [strip(q) for q in database.iter_quests(path=source)]
+    assert database.search_quests("Автоматический", path=target, limit=300)
+
+
+def test_upsert_by_title_appends_version(tmp_path):
+    path = str(tmp_path / "quests.db")
+    quest = {"title": "Дракон", "difficulty": "Сложный", "reward": 500, "description": "первая", "deadline": ""}
+    quest_id = database.save_quest(None, quest, path=path)
+    report = bulk.save_quests([dict(quest, description="вторая"), {"title": "Плохой", "difficulty": "Никакой"}],
+                              path=path)
+    assert (report.processed, report.failed) == (1, 1)
+    assert database.get_quest(quest_id, path=path)["description"] == "вторая"
+    assert [database.get_version(quest_id, n, path=path)["description"] for n in (1, 2)] == ["первая", "вторая"]
+    assert database.search_quests("вторая", path=path)[0].quest_id == quest_id
+
+
+def test_insert_only_skips_existing_titles(tmp_path):
+    path = str(tmp_path / "quests.db")
+    quest = {"title": "Дракон", "difficulty": "Сложный", "reward": 500, "description": "первая", "deadline": ""}
+    quest_id = database.save_quest(None, quest, path=path)
+    report = bulk.save_quests([dict(quest, description="ИГНОР"), dict(quest, title="Новый"),
+                               dict(quest, title="Новый", description="повтор")], upsert=False, path=path)
+    assert (report.processed, report.skipped) == (1, 2)
+    assert database.get_quest(quest_id, path=path)["description"] == "первая"
+    assert [v["version"] for v in database.list_versions(quest_id, path=path)] == [1]
+    new_id = database.search_quests("Новый", path=path)[0].quest_id
+    assert database.get_version(new_id, 1, path=path)["description"] == "первая"
+    assert database.get_version(new_id, 2, path=path) is None
+
+
+def test_repeated_title_in_one_batch_keeps_the_index_sound(tmp_path):
+    path = str(tmp_path / "quests.db")
+    quest = {"title": "Дракон", "difficulty": "Сложный", "reward": 500, "description": "альфа", "deadline": ""}
+    report = bulk.save_quests([quest, dict(quest, description="бета")], path=path)
+    assert report.processed == 2 and not report.errors
+    with database.connection(path) as conn:
+        conn.execute("INSERT INTO quests_fts(quests_fts) VALUES ('integrity-check')")
+    hits = database.search_quests("бета", path=path)
+    assert len(hits) == 1 and not database.search_quests("альфа", path=path)
+    assert database.get_quest(hits[0].quest_id, path=path)["description"] == "бета"
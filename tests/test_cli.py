@@ -0,0 +1,50 @@
+# headless CLI: `python -m core` end to end, in an interpreter where Qt cannot be imported
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+from core.cli import parse_ids
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# runs `python -m core <args>` with PyQt6 made unimportable
+NO_QT = ("import runpy, sys; sys.modules['PyQt6'] = None; "
+         "runpy.run_module('core', run_name='__main__', alter_sys=True)")
+
+
+def run_cli(cwd, *args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run([sys.executable, "-c", NO_QT, *args], cwd=cwd, env=env,
+                          capture_output=True, text=True, encoding="utf-8", timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    return [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+
+
+def test_parse_ids():
+    assert parse_ids("5-9") == range(5, 10)
+    assert parse_ids("3, 5,10-12") == [3, 5, 10, 11, 12]
+
+
+def test_generate_render_export_stats_without_qt(tmp_path):
+    db = str(tmp_path / "quests.db")
+    templates = os.path.join(ROOT, "templates")
+
+    events = run_cli(tmp_path, "generate", "40", "--db", db, "--json")
+    assert events[0] == {"event": "start", "command": "generate", "total": 40}
+    assert events[-1]["event"] == "done" and events[-1]["done"] == 40
+
+    events = run_cli(tmp_path, "render", "royal_decree.html", "--db", db, "--ids", "1-10",
+                     "--archive", "scrolls.zip", "--templates", templates, "--json")
+    assert events[-1]["done"] == 10
+    with zipfile.ZipFile(tmp_path / "scrolls.zip") as zf:
+        assert len(zf.namelist()) == 10
+
+    events = run_cli(tmp_path, "export", "--format", "html", "--db", db, "--ids", "1,2,39-40",
+                     "--templates", templates, "--jobs", "2", "--out-dir", "out", "--json")
+    assert (events[-1]["done"], events[-1]["failed"]) == (4, 0)
+    assert sorted(os.listdir(tmp_path / "out")) == [f"quest_{i}.html" for i in (1, 2, 39, 40)]
+
+    stats = run_cli(tmp_path, "stats", "--db", db, "--json")[0]
+    assert stats["quests"] == 40 and sum(stats["by_difficulty"].values()) == 40
+    assert stats["schema_version"] > 0
@@ -0,0 +1,51 @@
+# structured DOCX: headings, runs and the embedded QR of a rendered parchment; multi-quest bundles
+import pytest
+
+docx = pytest.importorskip("docx")
+
+from core.batch_export import dummy_quests, export_docx_bundle  # noqa: E402
+from core.docx_export import build_document, write_many  # noqa: E402
+from core.template_engine import TemplateEngine  # noqa: E402
+
+
+def _parchment(quest_id, qr_tag=None):
+    engine = TemplateEngine.shared()
+    html = engine.render("ancient_scroll.html", TemplateEngine.generate_dummy_quest(quest_id))
+    return (qr_tag if qr_tag is not None else engine.qr_img_tag(quest_id, "png")) + html
+
+
+def test_parchment_structure_and_qr():
+    document = build_document([_parchment(7)])
+    paragraphs = [(p.style.name, p.text) for p in document.paragraphs]
+    assert ("Heading 1", "Древний свиток — Печать #7") in paragraphs
+    assert ("Normal", "Название: Автоматический квест #7") in paragraphs
+    description = next(p for p in document.paragraphs if p.text.startswith("Это автоматически"))
+    assert description.text.count("сгенерированное описание") == 10
+    label = next(p for p in document.paragraphs if p.text.startswith("Название"))
+    assert label.runs[0].bold
+    assert len(document.inline_shapes) == 1
+
+
+@pytest.mark.parametrize("src", ["data:image/png;base64,@@@", "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAA",
+                                 "data:image/jpeg;base64,aGVsbG8="])
+def test_broken_images_are_skipped(src):
+    document = build_document([_parchment(3, f'<img src="{src}" />')])
+    assert len(document.inline_shapes) == 0
+    assert document.paragraphs[0].style.name == "Heading 1"
+
+
+def test_bundle_has_one_section_heading_and_qr_per_quest(tmp_path):
+    path = str(tmp_path / "bundle.docx")
+    assert export_docx_bundle(dummy_quests(range(1, 4)), path) == 3
+    document = docx.Document(path)
+    assert len(document.sections) == 3
+    headings = [p.text for p in document.paragraphs if p.style.name == "Heading 1"]
+    assert headings == [f"Древний свиток — Печать #{i}" for i in range(1, 4)]
+    assert len(document.inline_shapes) == 3
+
+    # strings and chunk iterables mix; without QR tags there are no pictures
+    path = str(tmp_path / "plain.docx")
+    html = TemplateEngine.shared().render("ancient_scroll.html", TemplateEngine.generate_dummy_quest(4))
+    assert write_many([html, iter([html])], path) == 2
+    document = docx.Document(path)
+    assert len(document.sections) == 2 and len(document.inline_shapes) == 0
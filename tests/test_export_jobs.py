@@ -0,0 +1,78 @@
+# wizard export queue: ordering, queue limit, cancellation and failures keep existing files
+import threading
+import time
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt6.QtCore")
+
+from core import batch_export  # noqa: E402
+from gui.export_jobs import ExportJobQueue, JobState  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def gated(monkeypatch):
+    """HTML jobs block in the writer until `release` is set; 'boom' fails."""
+    release, started = threading.Event(), threading.Event()
+    write = batch_export.write_document
+
+    def write_document(html, path, fmt):
+        started.set()
+        release.wait(5)
+        if html == "boom":
+            raise OSError("диск заполнен")
+        return write(html, path, fmt)
+
+    monkeypatch.setattr(batch_export, "write_document", write_document)
+    return release, started
+
+
+def finished(queue, job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job.state not in JobState.FINAL and time.monotonic() < deadline:
+        QtCore.QCoreApplication.processEvents()
+        time.sleep(0.005)
+    QtCore.QCoreApplication.processEvents()
+    return job.state
+
+
+def test_jobs_run_in_order_and_queue_is_bounded(app, tmp_path, gated):
+    release, _started = gated
+    queue = ExportJobQueue(workers=1, max_jobs=2)
+    done = []
+    try:
+        jobs = [queue.job(queue.submit(f"<p>{i}</p>", str(tmp_path / f"{i}.html"), "html",
+                                       on_done=lambda job: done.append(job.id))) for i in range(2)]
+        with pytest.raises(RuntimeError):
+            queue.submit("<p>3</p>", str(tmp_path / "3.html"), "html")
+        release.set()
+        assert [finished(queue, job) for job in jobs] == [JobState.DONE, JobState.DONE]
+        assert done == [job.id for job in jobs] and jobs[1].progress == 100
+        assert (tmp_path / "1.html").read_text(encoding="utf-8") == "<p>1</p>"
+    finally:
+        queue.shutdown(wait=True)
+
+
+def test_cancel_and_failure_keep_the_existing_file(app, tmp_path, gated):
+    release, started = gated
+    target = tmp_path / "quest.html"
+    target.write_text("старый файл", encoding="utf-8")
+    queue = ExportJobQueue(workers=1)
+    try:
+        running = queue.job(queue.submit("<p>новый</p>", str(target), "html"))
+        queued = queue.job(queue.submit("<p>ещё</p>", str(target), "html"))
+        assert started.wait(5) and queue.cancel(queued.id) and queued.state == JobState.CANCELLED
+        assert queue.cancel(running.id)
+        release.set()
+        assert finished(queue, running) == JobState.CANCELLED
+        failing = queue.job(queue.submit("boom", str(target), "html"))
+        assert finished(queue, failing) == JobState.FAILED and "диск заполнен" in failing.error
+        assert target.read_text(encoding="utf-8") == "старый файл"
+        assert [p.name for p in tmp_path.iterdir()] == ["quest.html"]
+    finally:
+        queue.shutdown(wait=True)
@@ -0,0 +1,56 @@
+# XP persistence: snapshot + journal replay, torn tails, crash between steps
+import json
+
+from core import gamification
+from core.gamification import Gamification, journal_path
+
+
+def test_flush_appends_and_load_replays(tmp_path, monkeypatch):
+    monkeypatch.setattr(gamification, "SNAPSHOT_EVERY", 5)
+    path = tmp_path / "gamification.json"
+    g = Gamification()
+    for i in range(3):
+        g.add_xp(10, f"E{i}")
+    assert g.flush(path, fsync=False) == 3 and g.flush(path, fsync=False) == 0
+    assert not path.exists() and len(journal_path(path).read_text(encoding="utf-8").splitlines()) == 3
+    loaded = Gamification.load(path)
+    assert (loaded.xp, loaded.achievements, loaded.seq) == (30, g.achievements, 3)
+
+    # the batch that reaches SNAPSHOT_EVERY becomes a snapshot and empties the journal
+    for i in range(3, 6):
+        loaded.add_xp(1, f"E{i}")
+    loaded.flush(path, fsync=False)
+    assert json.loads(path.read_text(encoding="utf-8"))["xp"] == 33
+    assert journal_path(path).read_text(encoding="utf-8") == ""
+    assert Gamification.load(path).achievements == loaded.achievements
+
+
+def test_recovers_from_torn_tail_and_stale_journal(tmp_path):
+    path = tmp_path / "gamification.json"
+    g = Gamification()
+    g.add_xp(5, "A")
+    g.add_xp(7, "B")
+    g.flush(path, fsync=False)
+    journal = journal_path(path)
+    stale = journal.read_bytes()
+    with open(journal, "ab") as f:
+        f.write(b'{"seq": 3, "ts": "x", "amo')
+    loaded = Gamification.load(path)
+    assert loaded.xp == 12 and journal.read_bytes() == stale
+    loaded.add_xp(1, "C")
+    loaded.flush(path, fsync=False)
+    assert Gamification.load(path).xp == 13
+
+    # crash after the snapshot was replaced but before the journal was reset
+    loaded.snapshot(path, fsync=False)
+    journal.write_bytes(stale)
+    assert Gamification.load(path).xp == 13
+
+
+def test_reads_legacy_file(tmp_path):
+    path = tmp_path / "gamification.json"
+    path.write_text(json.dumps({"xp": 40, "achievements": ["old"]}), encoding="utf-8")
+    g = Gamification.load(path)
+    g.add_xp(2, "NEW")
+    g.flush(path, fsync=False)
+    assert Gamification.load(path).achievements[0] == "old" and Gamification.load(path).xp == 42
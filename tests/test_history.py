@@ -0,0 +1,57 @@
+# undo/redo history: stack order, merging and the memory budget
+from core.history import Command, History
+
+
+class Append(Command):
+    def __init__(self, doc, value, size=10):
+        self.doc, self.value, self.size = doc, value, size
+        self.discarded = False
+
+    def redo(self):
+        self.doc.append(self.value)
+
+    def undo(self):
+        assert self.doc.pop() == self.value
+
+    def merge(self, other):
+        if not (isinstance(other, Append) and isinstance(self.value, str) and isinstance(other.value, str)):
+            return False
+        # the merged command owns both appends
+        self.doc.pop()
+        self.doc[-1] += other.value
+        self.value += other.value
+        self.size += other.size
+        return True
+
+    def discard(self):
+        self.discarded = True
+
+
+def test_undo_redo_and_new_edit_drops_redo():
+    doc, history = [], History()
+    first, second, third = Append(doc, 1), Append(doc, 2), Append(doc, 3)
+    for command in (first, second):
+        history.push(command)
+    assert history.undo() is second and doc == [1]
+    assert history.redo() is second and doc == [1, 2]
+    history.undo()
+    history.push(third)
+    assert doc == [1, 3] and not history.can_redo and second.discarded
+    assert history.memory == 20
+    assert history.undo() is third and history.undo() is first and history.undo() is None
+    assert doc == []
+
+
+def test_merge_and_budget():
+    doc, history = [], History(budget=35)
+    history.push(Append(doc, "a"))
+    history.push(Append(doc, "b"))
+    assert doc == ["ab"] and len(history) == 1 and history.memory == 20
+    oldest = history._undo[0]
+    for value in (1, 2):
+        history.push(Append(doc, value))
+    # over budget: the oldest step is dropped, the document keeps its effect
+    assert oldest.discarded and len(history) == 2 and history.memory == 20
+    history.undo()
+    history.undo()
+    assert not history.can_undo and doc == ["ab"]
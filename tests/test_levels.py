@@ -0,0 +1,34 @@
+# level curves: bisect lookup, progress within a level, config loading
+import json
+
+import pytest
+
+from core.gamification import Gamification
+from core.levels import LevelCurve, load_curve
+
+
+def test_lookup_and_progress():
+    curve = LevelCurve.from_mapping(Gamification.LEVELS)
+    assert [curve.name(xp) for xp in (0, 49, 50, 99, 100, 10_000)] == [
+        "Ученик", "Ученик", "Мастер пергаментов", "Мастер пергаментов", "Архимаг документов", "Архимаг документов"]
+    info = curve.info(60)
+    assert (info.floor, info.next_xp, info.to_next, info.next_name) == (50, 100, 40, "Архимаг документов")
+    assert info.progress == pytest.approx(0.2)
+    top = curve.info(150)
+    assert top.next_xp is None and top.to_next == 0 and top.progress == 1.0
+    assert curve.indexes([-5, 0, 75, 1000]) == [0, 0, 1, 2]
+
+
+def test_formula_curve_and_config(tmp_path):
+    curve = LevelCurve.formula(5000, base=10, exponent=0.5)
+    assert len(curve) == 5000
+    assert all(a < b for a, b in zip(curve.thresholds, curve.thresholds[1:]))
+    assert curve.index(curve.thresholds[1234]) == 1234 and curve.index(curve.thresholds[1234] - 1) == 1233
+
+    path = tmp_path / "levels.json"
+    path.write_text(json.dumps({"levels": [{"name": "B", "xp": 10}, {"name": "A", "xp": 0}]}), encoding="utf-8")
+    assert load_curve(str(path)).names == ["A", "B"]
+    assert load_curve(str(path)) is load_curve(str(path))
+    assert load_curve(str(tmp_path / "missing.json")) is None
+    with pytest.raises(ValueError):
+        LevelCurve([("A", 0), ("B", 0)])
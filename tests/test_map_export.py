@@ -0,0 +1,145 @@
+# map export: options, rasterization, PNG/JPG/WebP files, tiles and the export queue
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt6.QtCore")
+QtGui = pytest.importorskip("PyQt6.QtGui")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules inside gui/ use bare imports of each other, as main.py arranges
+if os.path.join(ROOT, "gui") not in sys.path:
+    sys.path.insert(0, os.path.join(ROOT, "gui"))
+
+from core import database, map_format, tiles  # noqa: E402
+from core.map_format import MapScene, Marker, Stroke  # noqa: E402
+import map_export  # noqa: E402
+from map_export import ExportCancelled, ExportOptions, MapExportQueue, export_map, export_map_tiles, rasterize  # noqa: E402
+from export_jobs import JobState  # noqa: E402
+
+BACKGROUND = 0xFFF4E4BC
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def scene(width=100, height=50):
+    return MapScene(rect=(0.0, 0.0, float(width), float(height)), background=BACKGROUND,
+                    strokes=[Stroke([5.0, 5.0, width - 5.0, height - 5.0], 0xFF000000, 2.0)],
+                    markers=[Marker(width / 2, height / 2, 0xFF00FF00, 3.0)])
+
+
+def finished(queue, job, timeout=10):
+    # the queue forgets a job once its on_done callback has run on this thread
+    deadline = time.monotonic() + timeout
+    while queue.job(job.id) is not None and time.monotonic() < deadline:
+        QtCore.QCoreApplication.processEvents()
+        time.sleep(0.005)
+    return job.state
+
+
+def test_options_are_validated():
+    assert ExportOptions("JPEG").fmt == "jpg" and ExportOptions(".webp").fmt == "webp"
+    with pytest.raises(ValueError):
+        ExportOptions("bmp")
+    with pytest.raises(ValueError):
+        ExportOptions(dpi=0)
+    assert ExportOptions(dpi=192).image_size(QtCore.QRectF(0, 0, 100, 50)) == (200, 100)
+
+
+def test_rasterize_size_dpi_progress_and_cancel(app):
+    steps = []
+    image = rasterize(scene(), ExportOptions(dpi=192, band_rows=16), progress=lambda done, total: steps.append(done))
+    assert (image.width(), image.height()) == (200, 100)
+    assert image.dotsPerMeterX() == round(192 / 0.0254)
+    assert image.pixel(1, 1) == BACKGROUND and image.pixel(100, 50) != BACKGROUND
+    assert steps == [16, 32, 48, 64, 80, 96, 100]
+    with pytest.raises(ExportCancelled):
+        rasterize(scene(), cancelled=lambda: True)
+    with pytest.raises(ValueError):
+        rasterize(scene(20000, 20000), ExportOptions("jpg"))
+
+
+@pytest.mark.parametrize("fmt", map_export.FORMATS)
+def test_export_formats(app, tmp_path, fmt):
+    if fmt.replace("jpg", "jpeg").encode() not in [bytes(f) for f in QtGui.QImageWriter.supportedImageFormats()]:
+        pytest.skip(f"Qt без поддержки {fmt}")
+    path = str(tmp_path / f"map.{fmt}")
+    assert export_map(scene(), path, ExportOptions(fmt, dpi=144, quality=80)) == path
+    image = QtGui.QImage(path)
+    assert (image.width(), image.height()) == (150, 75)
+    if fmt == "png":
+        assert image.dotsPerMeterX() == round(144 / 0.0254)
+    assert os.listdir(tmp_path) == [f"map.{fmt}"]
+
+
+def test_failed_export_keeps_the_old_file(app, tmp_path):
+    path = tmp_path / "map.png"
+    path.write_bytes(b"old")
+    for fmt in ("png", "jpg"):
+        with pytest.raises(ExportCancelled):
+            export_map(scene(), str(path), ExportOptions(fmt), cancelled=lambda: True)
+    assert path.read_bytes() == b"old" and os.listdir(tmp_path) == ["map.png"]
+
+
+def test_tiles(app, tmp_path):
+    snapshot = scene(600, 300)
+    count = export_map_tiles(snapshot, str(tmp_path), levels=[0, 1])
+    expected = {level: len(list(tiles.tiles_in((0, 0, 600, 300), level))) for level in (0, 1)}
+    assert count == sum(expected.values()) and expected[0] > expected[1]
+    for level, n in expected.items():
+        names = os.listdir(tmp_path / str(level))
+        assert len(names) == n
+        assert QtGui.QImage(str(tmp_path / str(level) / names[0])).size() == QtCore.QSize(256, 256)
+    with pytest.raises(ExportCancelled):
+        export_map_tiles(snapshot, str(tmp_path / "cancelled"), cancelled=lambda: True)
+
+
+def test_batch_reports_skipped_and_errors(app, tmp_path, monkeypatch):
+    # quest_map_scene reads the markers from ./quests.db
+    monkeypatch.chdir(tmp_path)
+    maps, out = str(tmp_path / "maps"), tmp_path / "out"
+    for quest_id in (1, 3):
+        map_format.save_quest_map(quest_id, scene(), maps)
+    out.mkdir()
+    (out / "quest_3.png").mkdir()  # cannot be replaced by a file
+    queue = MapExportQueue(workers=1)
+    done = []
+    try:
+        job = queue.job(queue.submit_quests([1, 2, 3], str(out), directory=maps, on_done=done.append))
+        assert finished(queue, job) == JobState.DONE
+        assert job.paths == [str(out / "quest_1.png")] and job.skipped == 1
+        assert [path for path, _error in job.errors] == [str(out / "quest_3.png")]
+        assert done == [job] and job.percent == 100
+        assert QtGui.QImage(str(out / "quest_1.png")).width() == 100
+    finally:
+        queue.shutdown(wait=True)
+        database.close_pools()
+
+
+def test_cancel_queued_and_running_jobs(app, tmp_path, monkeypatch):
+    release, started = threading.Event(), threading.Event()
+    export = map_export.export_map
+
+    def gated(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return export(*args, **kwargs)
+
+    monkeypatch.setattr(map_export, "export_map", gated)
+    queue = MapExportQueue(workers=1)
+    try:
+        running = queue.job(queue.submit(scene(), str(tmp_path / "a.png")))
+        queued = queue.job(queue.submit(scene(), str(tmp_path / "b.png")))
+        assert started.wait(5) and queue.cancel(queued.id) and queued.state == JobState.CANCELLED
+        assert queue.cancel(running.id)
+        release.set()
+        assert finished(queue, running) == JobState.CANCELLED
+        assert os.listdir(tmp_path) == []
+    finally:
+        queue.shutdown(wait=True)
@@ -0,0 +1,57 @@
+# .qmap round trips: copied, memory-mapped and corrupted files
+import pytest
+
+from core import map_format
+from core.map_format import Label, MapScene, Marker, Stroke
+
+
+def _scene():
+    strokes = [Stroke([float(i % 800) + 0.5 * j for i in range(2 * (j + 2))], 0xFF8B4513, 2.0 + j) for j in range(5)]
+    return MapScene((0.0, 0.0, 4000.0, 3000.0), 0xFFF4E4BC, strokes,
+                    [Marker(10.0, 20.5, 0xFFFF0000), Marker(-3.0, 7.0, 0xFF00FF00, 8.0)],
+                    [Label(1.0, 2.0, "Логово «Дракона»", font_family="Uncial Antiqua"), Label(5.0, 6.0, "")])
+
+
+def _plain(scene):
+    return (scene.rect, scene.background, [(list(s.points), s.color, s.width) for s in scene.strokes],
+            scene.markers, scene.labels)
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip_is_lossless(tmp_path, use_mmap, compress):
+    scene = _scene()
+    path = map_format.save_quest_map(7, scene, directory=str(tmp_path), compress=compress)
+    assert path.endswith("quest_7.qmap")
+    assert _plain(map_format.read_map(path, use_mmap=use_mmap)) == _plain(scene)
+    with map_format.MapReader(path) as mapped:
+        assert list(mapped.strokes[3].xy()) == list(scene.strokes[3].xy())
+    assert map_format.load_quest_map(8, directory=str(tmp_path)) is None
+
+
+def test_rejects_foreign_and_truncated_files():
+    for compress in (True, False):
+        data = map_format.dumps(_scene(), compress)
+        with pytest.raises(ValueError):
+            map_format.loads(b"PNG" + data[3:])
+        with pytest.raises(ValueError):
+            map_format.loads(data[:60])
+        with pytest.raises(ValueError):
+            map_format.loads(data[:-40])
+
+
+def test_quest_map_ids(tmp_path):
+    assert map_format.quest_map_ids(str(tmp_path / "missing")) == []
+    for quest_id in (12, 3):
+        map_format.save_quest_map(quest_id, MapScene(), str(tmp_path))
+    (tmp_path / "quest_x.qmap").write_bytes(b"")
+    (tmp_path / "quest_5.png").write_bytes(b"")
+    assert map_format.quest_map_ids(str(tmp_path)) == [3, 12]
+
+
+def test_quest_maps_are_read_in_place(tmp_path):
+    map_format.save_quest_map(4, _scene(), directory=str(tmp_path))
+    with map_format.open_quest_map(4, directory=str(tmp_path)) as mapped:
+        assert all(isinstance(s.points, memoryview) for s in mapped.strokes)
+        assert _plain(mapped) == _plain(_scene())
+    assert map_format.open_quest_map(5, directory=str(tmp_path)) is None
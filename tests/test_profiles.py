@@ -0,0 +1,45 @@
+# player profiles in quests.db: import from JSON, leaderboard, cache invalidation
+import json
+
+from core import database
+from core.profiles import ProfileStore
+
+
+def test_profiles_leaderboard_and_cache(tmp_path):
+    store = ProfileStore(str(tmp_path / "quests.db"), levels_path=str(tmp_path / "levels.json"))
+    try:
+        for name, xp in (("anna", 30), ("boris", 50), ("vera", 30), ("gleb", 10)):
+            store.award(name, xp, "START")
+        assert [(e.rank, e.name, e.xp) for e in store.leaderboard()] == [
+            (1, "boris", 50), (2, "anna", 30), (2, "vera", 30), (4, "gleb", 10)]
+        assert [(e.rank, e.name) for e in store.leaderboard(2, offset=2)] == [(2, "vera"), (4, "gleb")]
+
+        # a batched save through the cached object invalidates the pages
+        gleb = store.profile("gleb")
+        assert store.profile("gleb") is gleb
+        for _ in range(3):
+            gleb.add_xp(20, "SAVE_MAP")
+        assert store.leaderboard()[0].name == "boris"
+        assert store.save(gleb) == 3 and not gleb.pending
+        assert store.leaderboard()[0].name == "gleb" and store.rank("gleb") == 1
+
+        fresh = ProfileStore(store.path).profile("gleb")
+        assert fresh.xp == 70 and fresh.achievements == gleb.achievements and fresh.get_level() == "Мастер пергаментов"
+    finally:
+        database.close_pools()
+
+
+def test_import_legacy_json_once(tmp_path):
+    legacy = tmp_path / "gamification.json"
+    legacy.write_text(json.dumps({"xp": 12, "achievements": [
+        "2025-01-02 10:00:00  +5 XP  (SAVE_MAP)", "2025-01-03 11:00:00  +3 XP  (CREATE_QUEST)"]}), encoding="utf-8")
+    store = ProfileStore(str(tmp_path / "quests.db"))
+    try:
+        assert store.import_json(str(legacy), "anna") is not None
+        assert store.import_json(str(legacy), "anna") is None
+        anna = store.profile("anna")
+        # the file total wins: 4 XP were earned before entries were recorded
+        assert anna.xp == 12
+        assert anna.achievements == ["2025-01-02 10:00:00  +5 XP  (SAVE_MAP)", "2025-01-03 11:00:00  +3 XP  (CREATE_QUEST)"]
+    finally:
+        database.close_pools()
@@ -0,0 +1,57 @@
+# QR cache: memory LRU, private disk store, checked entries, size limit
+import os
+import sys
+
+import pytest
+
+from core import qr_cache
+from core.qr_cache import QRCache
+
+URLS = [qr_cache.quest_url(i) for i in range(4)]
+
+
+def test_memory_lru_evicts_oldest():
+    cache = QRCache(capacity=2, directory=None)
+    for url in URLS[:3]:
+        cache.get(url)
+    cache.get(URLS[2])
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.get(URLS[0])
+    assert cache.misses == 4
+
+
+def test_disk_round_trip_and_corrupt_entries(tmp_path):
+    directory = str(tmp_path / "qr")
+    svg = QRCache(directory=directory).get(URLS[0], "svg")
+    warm = QRCache(directory=directory)
+    assert warm.get(URLS[0], "svg") == svg and warm.misses == 0
+    if sys.platform != "win32":
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    # a planted or damaged file is dropped and rendered again
+    path = os.path.join(directory, QRCache.key(URLS[0], "svg", 10, 4) + ".svg")
+    with open(path, "wb") as f:
+        f.write(b"\0" * 32 + b'<svg onload="alert(1)"/>')
+    cold = QRCache(directory=directory)
+    assert cold.get(URLS[0], "svg") == svg and cold.misses == 1
+    assert QRCache(directory=directory)._read_disk(QRCache.key(URLS[0], "svg", 10, 4), "svg") == svg
+
+
+def test_disk_store_is_bounded(tmp_path):
+    directory = str(tmp_path / "qr")
+    cache = QRCache(capacity=1, directory=directory, disk_limit=2000)
+    for url in URLS:
+        cache.get(url, "png")
+    assert sum(e.stat().st_size for e in os.scandir(directory)) <= 2000
+    assert len(os.listdir(directory)) < len(URLS)
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_shared_directory_is_not_trusted(tmp_path):
+    directory = tmp_path / "qr"
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    cache = QRCache(directory=str(directory))
+    cache.get(URLS[0])
+    # still ours, so it is closed to other users before being used
+    assert os.stat(directory).st_mode & 0o777 == 0o700 and os.listdir(directory)
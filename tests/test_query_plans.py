@@ -0,0 +1,80 @@
+# EXPLAIN QUERY PLAN regression suite: hot queries must keep using indexes
+import re
+
+import pytest
+
+from core import database, migrations
+from core.profiles import ProfileStore
+
+BASE_TABLES = ("quests", "quest_versions", "quest_locations", "profiles", "achievements")
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "quests.db")
+    data = {"title": "", "difficulty": "Легкий", "reward": 10, "description": "", "deadline": ""}
+    for i in range(30):
+        data.update(title=f"Квест {i}", difficulty=["Легкий", "Средний"][i % 2], deadline=f"2026-01-{i % 28 + 1:02d}")
+        quest_id = database.save_quest(None, data, path=path)
+        for j in range(5):
+            data["description"] = "описание " * j
+            database.save_quest(quest_id, data, path=path)
+        database.add_location(quest_id, i, i, "green", path=path)
+    with database.connection(path) as conn:
+        conn.execute("ANALYZE")
+    yield path
+    database.close_pools()
+
+
+def _traced_selects(path, action):
+    statements = []
+    with database.connection(path) as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        action()
+    finally:
+        with database.connection(path) as conn:
+            conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def _full_scans(path, sql):
+    with database.connection(path) as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    details = [row[3] for row in plan]
+    return [d for d in details if any(re.fullmatch(rf"SCAN {t}( .*)?", d) for t in BASE_TABLES)
+            and "USING" not in d]
+
+
+HOT_PATHS = {
+    "version chain (save)": lambda p: database.save_quest(3, {"title": "Квест 2", "difficulty": "Легкий", "reward": 1,
+                                                              "description": "новое", "deadline": ""}, path=p),
+    "get_version": lambda p: database.get_version(3, 4, path=p),
+    "list_versions": lambda p: database.list_versions(3, path=p),
+    "get_quest": lambda p: database.get_quest(3, path=p),
+    "iter_quests range": lambda p: list(database.iter_quests(range(5, 15), path=p)),
+    "iter_quests ids": lambda p: list(database.iter_quests([7, 3, 9], path=p)),
+    "list_quests difficulty": lambda p: database.list_quests(difficulty="Средний", path=p),
+    "list_quests deadline": lambda p: database.list_quests(deadline_before="2026-01-10", path=p),
+    "get_locations": lambda p: database.get_locations(3, path=p),
+    "locations_in_rect": lambda p: database.locations_in_rect(0, 0, 10, 10, quest_id=3, path=p),
+    "nearest_locations": lambda p: database.nearest_locations(500, 500, 2, quest_id=3, path=p),
+    "search": lambda p: database.search_quests("Квест", difficulty="Легкий", path=p),
+    "load profile": lambda p: ProfileStore(p).profile("игрок"),
+    "leaderboard page": lambda p: ProfileStore(p).leaderboard(10, offset=5),
+    "rank": lambda p: ProfileStore(p).rank("игрок"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_PATHS))
+def test_hot_query_uses_index(db, name):
+    selects = _traced_selects(db, lambda: HOT_PATHS[name](db))
+    assert selects, f"{name}: no SELECT was traced"
+    for sql in selects:
+        assert not _full_scans(db, sql), f"{name}: full table scan in {sql}"
+
+
+def test_schema_is_versioned(db):
+    with database.connection(db) as conn:
+        assert migrations.current_version(conn) == migrations.LATEST
+        assert migrations.migrate(conn) == []
@@ -0,0 +1,77 @@
+# full-text search: bm25 order, prefixes, snippets, filters and the opt-in version index
+import pytest
+
+from core import database, search
+
+BASE = {"difficulty": "Легкий", "reward": 100, "deadline": "2026-06-01T00:00:00"}
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "quests.db")
+    quests = [
+        ("Логово: дракон", "В горах спит старый зверь.", "Сложный", "2026-03-01T00:00:00"),
+        ("Пропавший караван", "Караван видели у моста, где живёт дракон.", "Средний", "2026-07-01T00:00:00"),
+        ("Дракон и дракончик", "Дракон зовёт: дракон, дракон, лети к дракону!", "Легкий", "2026-09-01T00:00:00"),
+        ("Ярмарка", "Торговцы ждут охрану.", "Легкий", "2026-05-01T00:00:00"),
+    ]
+    ids = {}
+    for title, description, difficulty, deadline in quests:
+        ids[title] = database.save_quest(None, dict(BASE, title=title, description=description,
+                                                    difficulty=difficulty, deadline=deadline), path=path)
+    yield path, ids
+    database.close_pools()
+
+
+def test_bm25_ranks_title_and_frequency_first(db):
+    path, ids = db
+    hits = database.search_quests("дракон", path=path, prefix=False)
+    # title matches weigh 5x; the quest naming the dragon most often wins
+    assert [h.quest_id for h in hits] == [ids["Дракон и дракончик"], ids["Логово: дракон"], ids["Пропавший караван"]]
+    assert hits[0].rank < hits[1].rank < hits[2].rank
+
+
+def test_prefix_queries_and_snippets(db):
+    path, ids = db
+    assert database.search_quests("ярмар", path=path, prefix=False) == []
+    hit, = database.search_quests("ярмар", path=path)
+    assert hit.quest_id == ids["Ярмарка"] and hit.snippet == "[Ярмарка]"
+    hit, = database.search_quests("караван моста", path=path)
+    assert "[Караван]" in hit.snippet and "[моста]" in hit.snippet
+    hit, = database.search_quests("охрану", path=path, highlight=("<b>", "</b>"))
+    assert hit.snippet == "Торговцы ждут <b>охрану</b>."
+
+
+def test_filters_apply_to_the_quest_row(db):
+    path, ids = db
+    assert [h.quest_id for h in database.search_quests("дракон", path=path, difficulty="Средний")] == \
+        [ids["Пропавший караван"]]
+    found = database.search_quests("дракон", path=path, deadline_after="2026-04-01", deadline_before="2026-08-01")
+    assert [h.quest_id for h in found] == [ids["Пропавший караван"]]
+
+
+def test_version_index_is_opt_in_and_windowed(db):
+    path, ids = db
+    quest_id = ids["Ярмарка"]
+    data = dict(BASE, title="Ярмарка", description="Первым делом найти единорога.")
+    database.save_quest(quest_id, data, path=path)
+    database.save_quest(quest_id, dict(data, description="Торговцы ждут охрану."), path=path)
+    assert database.search_quests("единорога", path=path, include_versions=True) == []
+    with database.connection(path) as conn:
+        assert search.enable_version_index(conn) == 6
+    hit, = database.search_quests("единорога", path=path, include_versions=True)
+    assert (hit.quest_id, hit.version) == (quest_id, 2)
+    assert database.search_quests("единорога", path=path) == []
+
+    # ten newer versions elsewhere also mention it: with a window of 5 the
+    # old match is out of reach, ranking the whole set finds it again
+    other = ids["Логово: дракон"]
+    for i in range(10):
+        database.save_quest(other, dict(BASE, title="Логово: дракон", description=f"Слухи {i} про единорога."),
+                            path=path)
+    database.save_quest(other, dict(BASE, title="Логово: дракон", description="В горах спит старый зверь."),
+                        path=path)
+    windowed = database.search_quests("единорога", path=path, include_versions=True, version_window=5)
+    assert [h.quest_id for h in windowed] == [other]
+    everything = database.search_quests("единорога", path=path, include_versions=True, version_window=None)
+    assert sorted(h.quest_id for h in everything) == sorted([other, quest_id])
@@ -0,0 +1,124 @@
+# render service: routes, ETags from quest versions, keep-alive
+import asyncio
+import http.client
+import json
+import os
+
+import pytest
+
+from core import database
+from core.server import BackgroundServer, RenderService, etag_matches
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUEST = {"title": "Дракон у моста", "difficulty": "Сложный", "reward": 300,
+         "description": "Прогнать дракона от моста через реку.", "deadline": "2026-12-01T00:00:00"}
+
+
+@pytest.fixture
+def service(tmp_path):
+    db = str(tmp_path / "quests.db")
+    quest_id = database.save_quest(None, QUEST, path=db)
+    server = BackgroundServer(RenderService(db, os.path.join(ROOT, "templates"), jobs=1)).start()
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=30)
+    yield conn, db, quest_id
+    conn.close()
+    server.stop(timeout=5)
+
+
+def get(conn, path, etag=None):
+    conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+    response = conn.getresponse()
+    return response.status, response.getheader("ETag"), response.read()
+
+
+def test_etag_follows_quest_versions(service):
+    conn, db, quest_id = service
+    status, etag, body = get(conn, f"/quests/{quest_id}")
+    assert status == 200 and json.loads(body)["version"] == 1
+    # every request below reuses the same keep-alive connection
+    assert get(conn, f"/quests/{quest_id}", etag)[:2] == (304, etag)
+
+    status, render_etag, html = get(conn, f"/render/ancient_scroll.html/{quest_id}")
+    assert status == 200 and "Дракон у моста" in html.decode("utf-8")
+    assert get(conn, f"/render/ancient_scroll.html/{quest_id}", render_etag)[0] == 304
+
+    database.save_quest(quest_id, dict(QUEST, title="Дракон ушёл"), path=db)
+    status, new_etag, html = get(conn, f"/render/ancient_scroll.html/{quest_id}", render_etag)
+    assert status == 200 and new_etag != render_etag and "Дракон ушёл" in html.decode("utf-8")
+    assert get(conn, f"/quests/{quest_id}", etag)[0] == 200
+
+
+def test_qr_and_errors(service):
+    conn, _db, quest_id = service
+    status, etag, png = get(conn, f"/qr/{quest_id}")
+    assert status == 200 and png.startswith(b"\x89PNG")
+    assert get(conn, f"/qr/{quest_id}", etag)[0] == 304
+    assert get(conn, "/quests/999")[0] == 404
+    assert get(conn, f"/render/missing.html/{quest_id}")[0] == 404
+    assert get(conn, f"/render/ancient_scroll.html/{quest_id}?format=odt")[0] == 400
+    assert get(conn, "/quests/abc")[0] == 400
+
+
+def test_etag_matching():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"x"')
+    assert not etag_matches('"a"', '"b"') and not etag_matches(None, '"b"')
+
+
+def test_quest_markup_is_escaped(service):
+    conn, db, quest_id = service
+    database.save_quest(quest_id, dict(QUEST, description="<script>alert(1)</script>"), path=db)
+    conn.request("GET", f"/render/ancient_scroll.html/{quest_id}?qr=svg")
+    response = conn.getresponse()
+    html = response.read().decode("utf-8")
+    assert "<script>" not in html and "&lt;script&gt;" in html and "<img" in html
+    assert "default-src 'none'" in response.getheader("Content-Security-Policy")
+
+
+def test_etag_covers_included_templates(tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "base.html").write_text("<p>{{ quest.title }}</p>", encoding="utf-8")
+    (templates / "page.html").write_text('{% include "base.html" %}', encoding="utf-8")
+    db = str(tmp_path / "quests.db")
+    quest_id = database.save_quest(None, QUEST, path=db)
+    # a zero TTL rescans the folder on every request
+    server = BackgroundServer(RenderService(db, str(templates), jobs=1, templates_ttl=0)).start()
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=30)
+    try:
+        _status, etag, _html = get(conn, f"/render/page.html/{quest_id}")
+        base = templates / "base.html"
+        base.write_text("<h1>{{ quest.title }}</h1>", encoding="utf-8")
+        os.utime(base, ns=(base.stat().st_atime_ns, base.stat().st_mtime_ns + 10**9))
+        status, new_etag, html = get(conn, f"/render/page.html/{quest_id}", etag)
+        assert status == 200 and new_etag != etag and html.startswith(b"<h1>")
+    finally:
+        conn.close()
+        server.stop(timeout=5)
+
+
+def test_templates_are_scanned_once_per_ttl(tmp_path):
+    db = str(tmp_path / "quests.db")
+    quest_id = database.save_quest(None, QUEST, path=db)
+    service = RenderService(db, os.path.join(ROOT, "templates"), jobs=1)
+    scans = []
+    scan = service._scan_templates
+    service._scan_templates = lambda: scans.append(1) or scan()
+
+    async def run():
+        return [(await service.respond("GET", f"/render/ancient_scroll.html/{quest_id}", {})).status
+                for _ in range(3)]
+
+    try:
+        assert asyncio.run(run()) == [200] * 3 and len(scans) == 1
+    finally:
+        service.close()
+
+
+def test_negative_content_length_is_rejected(service):
+    conn, _db, _quest_id = service
+    conn.putrequest("GET", "/health")
+    conn.putheader("Content-Length", "-5")
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == 400 and "Content-Length" in json.loads(response.read())["error"]
@@ -0,0 +1,47 @@
+# R*Tree-backed location queries agree with brute force
+import math
+import random
+
+from core import database
+
+
+def test_bbox_and_nearest_match_brute_force(tmp_path):
+    path = str(tmp_path / "quests.db")
+    rng = random.Random(7)
+    try:
+        points = [(q, rng.uniform(-500, 500), rng.uniform(-500, 500)) for q in (1, 2) for _ in range(400)]
+        ids = [database.add_location(q, x, y, "green", path=path) for q, x, y in points]
+        rows = dict(zip(ids, points))
+        for _ in range(20):
+            x0, y0 = rng.uniform(-600, 400), rng.uniform(-600, 400)
+            x1, y1 = x0 + rng.uniform(0, 300), y0 + rng.uniform(0, 300)
+            got = {loc.id for loc in database.locations_in_rect(x0, y0, x1, y1, quest_id=2, path=path)}
+            assert got == {i for i, (q, x, y) in rows.items() if q == 2 and x0 <= x <= x1 and y0 <= y <= y1}
+            px, py = rng.uniform(-700, 700), rng.uniform(-700, 700)
+            near = [loc.id for loc in database.nearest_locations(px, py, 3, path=path)]
+            assert near == sorted(rows, key=lambda i: math.hypot(rows[i][1] - px, rows[i][2] - py))[:3]
+
+        # the index follows updates and deletes through triggers
+        moved, gone = ids[0], ids[1]
+        with database.connection(path) as conn:
+            conn.execute("UPDATE quest_locations SET x = 9000, y = 9000 WHERE id = ?", (moved,))
+            conn.execute("DELETE FROM quest_locations WHERE id = ?", (gone,))
+        assert [loc.id for loc in database.locations_in_rect(8999, 8999, 9001, 9001, path=path)] == [moved]
+        assert gone not in {loc.id for loc in database.locations_in_rect(-600, -600, 600, 600, path=path)}
+        assert database.nearest_locations(0, 0, 1, quest_id=3, path=path) == []
+    finally:
+        database.close_pools()
+
+
+def test_delete_and_restore_location_keep_the_index(tmp_path):
+    path = str(tmp_path / "quests.db")
+    try:
+        location_id = database.add_location(4, 10, 20, "red", path=path)
+        row = database.delete_location(location_id, path=path)
+        assert (row.id, row.quest_id, row.x, row.y, row.type) == (location_id, 4, 10, 20, "red")
+        assert database.locations_in_rect(0, 0, 50, 50, path=path) == []
+        assert database.delete_location(location_id, path=path) is None
+        assert database.restore_location(row, path=path) == location_id
+        assert database.locations_in_rect(0, 0, 50, 50, path=path) == [row]
+    finally:
+        database.close_pools()
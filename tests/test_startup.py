@@ -0,0 +1,49 @@
+# startup: profiler bookkeeping and what main.py loads before the first window
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from core.startup import StartupProfiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_profiler_times_phases_and_new_imports(tmp_path, monkeypatch):
+    (tmp_path / "startup_probe_pkg").mkdir()
+    (tmp_path / "startup_probe_pkg" / "__init__.py").write_text("")
+    (tmp_path / "startup_probe_pkg" / "leaf.py").write_text("import time\ntime.sleep(0.02)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    profiler = StartupProfiler()
+    profiler.track_imports()
+    try:
+        with profiler.phase("outer"):
+            with profiler.phase("inner"):
+                from startup_probe_pkg import leaf  # noqa: F401
+    finally:
+        profiler.stop_imports()
+        for name in ("startup_probe_pkg", "startup_probe_pkg.leaf"):
+            sys.modules.pop(name, None)
+    assert [name for name, _t in profiler.phases] == ["outer", "inner"]
+    assert profiler.phases[0][1] >= profiler.phases[1][1] >= 0.02
+    record = next(r for r in profiler.imports if r.name == "startup_probe_pkg.leaf")
+    assert record.own >= 0.02
+    assert dict(profiler.packages())["startup_probe_pkg"] >= 0.02
+    assert "startup_probe_pkg.leaf" in profiler.report()
+
+
+def test_first_window_defers_heavy_modules(tmp_path):
+    pytest.importorskip("PyQt6.QtWidgets")
+    report = tmp_path / "startup.json"
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    # cwd is a scratch directory: the window opens ./quests.db
+    subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--profile-startup", str(report),
+                    "--exit-after-startup"], cwd=tmp_path, env=env, timeout=120, check=True, capture_output=True)
+    profile = json.loads(report.read_text(encoding="utf-8"))
+    # about 0.1 s on a developer machine; wall-clock time is too noisy on shared
+    # runners to assert, so it is only reported (pytest -s)
+    print(f"первое окно: {profile['marks_ms']['первое окно']:.0f} мс")
+    # templates, QR codes, PDF/DOCX writers, sound and the other tabs load later
+    assert profile["info"]["Загружены до окна"] == []
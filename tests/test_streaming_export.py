@@ -0,0 +1,52 @@
+# streaming export must keep peak memory flat regardless of batch size
+import os
+import tarfile
+import tracemalloc
+import zipfile
+
+from core.batch_export import dummy_quests, stream_render, write_stream_to_archive, write_stream_to_dir
+from core.template_engine import TemplateEngine
+
+
+def _peak(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_export_memory_is_flat(tmp_path):
+    TemplateEngine.shared().prewarm()
+
+    def run(n, target):
+        stream = stream_render(dummy_quests(range(1, n + 1)))
+        if target == "dir":
+            return lambda: write_stream_to_dir(stream, str(tmp_path / f"d{n}"))
+        return lambda: write_stream_to_archive(stream, str(tmp_path / f"a{n}.tar"), "tar")
+
+    for target in ("dir", "tar"):
+        small = _peak(run(100, target))
+        large = _peak(run(3000, target))
+        # 30x more documents, yet the peak stays in the same ballpark
+        assert large < small * 1.5 + 64 * 1024, target
+
+
+def test_stream_to_zip(tmp_path):
+    path = str(tmp_path / "p.zip")
+    assert write_stream_to_archive(stream_render(dummy_quests(range(1, 301))), path) == 300
+    with zipfile.ZipFile(path) as zf:
+        assert len(zf.namelist()) == 300
+        html = zf.read("quest_42.html").decode("utf-8")
+    assert "Автоматический квест #42" in html
+    assert html.rstrip().endswith("</html>")
+
+
+def test_stream_to_dir_and_tar(tmp_path):
+    quests = list(dummy_quests(range(1, 6)))
+    assert write_stream_to_dir(stream_render(quests, "royal_decree.html"), str(tmp_path / "out")) == 5
+    assert sorted(os.listdir(tmp_path / "out"))[0] == "quest_1.html"
+    assert write_stream_to_archive(stream_render(quests), str(tmp_path / "p.tar"), "tar") == 5
+    with tarfile.open(tmp_path / "p.tar") as tf:
+        assert len(tf.getnames()) == 5
@@ -0,0 +1,33 @@
+# brush stroke simplification (Ramer–Douglas–Peucker + radial filter)
+import math
+
+from core.strokes import RadialFilter, simplify
+
+
+def _distance_to_polyline(p, line):
+    best = math.inf
+    for (ax, ay), (bx, by) in zip(line, line[1:]):
+        dx, dy = bx - ax, by - ay
+        t = 0.0 if dx == dy == 0 else max(0.0, min(1.0, ((p[0] - ax) * dx + (p[1] - ay) * dy) / (dx * dx + dy * dy)))
+        best = min(best, math.hypot(p[0] - ax - t * dx, p[1] - ay - t * dy))
+    return best
+
+
+def test_simplify_stays_within_tolerance():
+    points = [(i * 0.1, 50 * math.sin(i / 200) + (0.2 if i % 2 else -0.2)) for i in range(10_000)]
+    simplified = simplify(points, 0.75)
+    assert simplified[0] == points[0] and simplified[-1] == points[-1]
+    assert len(simplified) < len(points) // 20
+    assert all(_distance_to_polyline(p, simplified) <= 0.75 + 1e-9 for p in points[::37])
+
+
+def test_simplify_edge_cases():
+    assert simplify([(0, 0), (1, 0), (2, 0), (3, 0)], 0.5) == [(0, 0), (3, 0)]
+    loop = [(0, 0), (10, 0), (10, 10), (0, 0)]
+    assert simplify(loop, 0.5) == loop
+    assert simplify([(1, 1)], 0.5) == [(1, 1)]
+
+
+def test_radial_filter_drops_jitter():
+    f = RadialFilter(1.0)
+    assert [f.accept(x, 0) for x in (0, 0.5, 0.9, 1.2, 1.5, 2.3)] == [True, False, False, True, False, True]
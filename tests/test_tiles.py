@@ -0,0 +1,81 @@
+# tile grid math, tile LRU and the band-by-band PNG writer
+import io
+import struct
+import zlib
+
+import pytest
+
+from core import tiles
+from core.tiles import LRUCache, PngStreamWriter, TileKey
+
+
+def test_tile_grid():
+    assert tiles.level_for_scale(2.0) == 0
+    assert tiles.level_for_scale(0.5) == 1
+    assert tiles.level_for_scale(0.3) == 1
+    assert tiles.level_for_scale(0.001) == tiles.LEVELS - 1
+    keys = list(tiles.tiles_in((0, 0, 600, 256), level=0))
+    assert keys == [TileKey(0, 0, 0), TileKey(0, 1, 0), TileKey(0, 2, 0)]
+    assert list(tiles.tiles_in((-10, -10, 10, 10), level=1)) == [
+        TileKey(1, -1, -1), TileKey(1, 0, -1), TileKey(1, -1, 0), TileKey(1, 0, 0)]
+    assert tiles.tile_rect(TileKey(2, 1, 0)) == (1024, 0, 2048, 1024)
+
+
+def test_lru_evicts_least_recent_and_invalidates():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    assert cache.discard_if(lambda key: key == "c") == 1
+    assert len(cache) == 1
+
+
+def _decode(png, chunks=None):
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, idat, header = 8, b"", None
+    while pos < len(png):
+        (length,), kind = struct.unpack(">I", png[pos:pos + 4]), png[pos + 4:pos + 8]
+        data = png[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", png[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + data)
+        if chunks is not None:
+            chunks[kind] = data
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", data)
+        elif kind == b"IDAT":
+            idat += data
+        pos += 12 + length
+    return header, zlib.decompress(idat)
+
+
+def test_png_stream_writer_bands():
+    width, height = 5, 7
+    rows = [bytes((x * 4 + y + c) % 256 for x in range(width) for c in range(4)) for y in range(height)]
+    out = io.BytesIO()
+    writer = PngStreamWriter(out, width, height)
+    # bands of 3 rows with 4 bytes of padding per line
+    for start in range(0, height, 3):
+        band = rows[start:start + 3]
+        writer.write_rows(b"".join(r + b"\xff" * 4 for r in band), width * 4 + 4, len(band))
+    writer.close()
+    header, raw = _decode(out.getvalue())
+    assert header[:4] == (width, height, 8, 6)
+    assert raw == b"".join(b"\x00" + r for r in rows)
+
+
+def test_png_stream_writer_dpi():
+    out = io.BytesIO()
+    writer = PngStreamWriter(out, 1, 1, dpi=254)
+    writer.write_rows(b"\x00" * 4, 4, 1)
+    writer.close()
+    chunks = {}
+    _decode(out.getvalue(), chunks)
+    assert struct.unpack(">IIB", chunks[b"pHYs"]) == (10000, 10000, 1)
+
+
+def test_png_stream_writer_checks_row_count():
+    writer = PngStreamWriter(io.BytesIO(), 1, 2)
+    writer.write_rows(b"\x00" * 4, 4, 1)
+    with pytest.raises(ValueError):
+        writer.close()
@@ -0,0 +1,99 @@
+# round-trip checks for the delta-encoded quest_versions store
+import sqlite3
+
+from core import database, version_store
+
+
+def _legacy_db(path, texts):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE quest_versions (id INTEGER PRIMARY KEY AUTOINCREMENT, quest_id INTEGER, title TEXT, "
+        "difficulty TEXT, reward INTEGER, description TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.executemany(
+        "INSERT INTO quest_versions (quest_id, title, difficulty, reward, description) VALUES (1, 't', 'Легкий', 10, ?)",
+        [(t,) for t in texts],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_migrate_and_append_round_trip(tmp_path):
+    path = str(tmp_path / "quests.db")
+    texts = ["Описание квеста. " * 10 + "x" * i for i in range(40)]
+    _legacy_db(path, texts)
+    try:
+        for n, text in enumerate(texts, start=1):
+            assert database.get_version(1, n, path=path)["description"] == text
+        data = {"title": "t", "difficulty": "Легкий", "reward": 10, "description": texts[-1] + " конец", "deadline": ""}
+        database.save_quest(1, data, path=path)
+        assert database.get_version(1, len(texts) + 1, path=path)["description"] == data["description"]
+        assert database.get_version(1, len(texts) + 2, path=path) is None
+    finally:
+        database.close_pools()
+
+
+def test_replay_is_bounded():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE quest_versions (id INTEGER PRIMARY KEY AUTOINCREMENT, quest_id INTEGER, title TEXT, "
+        "difficulty TEXT, reward INTEGER, description TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, "
+        "version INTEGER, kind INTEGER, payload BLOB)"
+    )
+    text = "a" * 500
+    for i in range(100):
+        text += str(i)
+        version_store.append_version(conn, 7, {"title": "t", "difficulty": "Легкий", "reward": 1, "description": text})
+    assert len(version_store._chain_rows(conn, 7, 100)) <= version_store.SNAPSHOT_INTERVAL
+    assert version_store.get_version(conn, 7, 100)["description"] == text
+
+
+def test_retention_keeps_chain_readable(tmp_path):
+    from core import retention
+
+    path = str(tmp_path / "quests.db")
+    data = {"title": "t", "difficulty": "Легкий", "reward": 10, "description": "", "deadline": ""}
+    try:
+        for i in range(60):
+            data["description"] = "текст " * 20 + str(i)
+            database.save_quest(None if i == 0 else 1, data, path=path)
+        database.tag_version(1, 3, "важная", path=path)
+        with database.connection(path) as conn:
+            # all versions fall in one minute, two hours ago: thinning keeps one of them
+            conn.execute("UPDATE quest_versions SET created_at = datetime('now', '-2 hours')")
+        report = retention.compact(path, retention.RetentionPolicy(keep_last=10), vacuum=True)
+        assert report.rows_deleted == 60 - 10 - 1 - 1
+        assert database.get_version(1, 3, path=path)["description"] == "текст " * 20 + "2"
+        assert database.get_version(1, 60, path=path)["description"] == "текст " * 20 + "59"
+        assert database.get_version(1, 30, path=path) is None
+    finally:
+        database.close_pools()
+
+
+def test_compaction_replans_when_an_autosave_interleaves(tmp_path, monkeypatch):
+    from core import retention
+
+    path = str(tmp_path / "quests.db")
+    data = {"title": "t", "difficulty": "Легкий", "reward": 10, "description": "", "deadline": ""}
+    plan = retention._plan
+    calls = []
+
+    def plan_then_autosave(chain, policy, now):
+        calls.append(len(chain))
+        if len(calls) == 1:
+            # lands between planning (no lock) and the write transaction
+            database.save_quest(1, dict(data, description="после плана"), path=path)
+        return plan(chain, policy, now)
+
+    try:
+        for i in range(20):
+            database.save_quest(None if i == 0 else 1, dict(data, description=f"версия {i}"), path=path)
+        monkeypatch.setattr(retention, "_plan", plan_then_autosave)
+        # one bucket for all of history: the last 5 plus the newest older version survive
+        report = retention.compact(path, retention.RetentionPolicy(keep_last=5, tiers=((0, 10 ** 9),)))
+        assert calls == [20, 21] and report.rows_deleted == 15 and not report.errors
+        assert [v["version"] for v in database.list_versions(1, path=path)] == [16, 17, 18, 19, 20, 21]
+        assert database.get_version(1, 21, path=path)["description"] == "после плана"
+        assert database.get_version(1, 16, path=path)["description"] == "версия 15"
+    finally:
+        database.close_pools()